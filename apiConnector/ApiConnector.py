@@ -1,13 +1,85 @@
+import json
+import gzip
+import threading
 import requests
-from typing import List, Tuple
+import time
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Tuple
+from apiConnector.JsonStream import iter_json_array
+from apiConnector.ResponseCache import ResponseCache
 from configs import NewsConfig as config
+from metrics.Instruments import HTTP_LATENCY, HTTP_FAILURES
 from apiConnector.models.rawNewsModel import model as rawModel
 from apiConnector.models.summarizedNewsModel import model as summarizedModel
 
+_SHARED_SESSION = None
+_SHARED_SESSION_LOCK = threading.Lock()
+
+def shared_session(pool_size:int = 32) -> requests.Session:
+    """Get requests.Session that shared by every ApiConnector, connections to New-sREST are kept alive and reused
+
+    Parameters
+    ----------
+    pool_size : int, optional
+        max number of kept alive connections per host, used only when the session is created, by default 32
+
+    Returns
+    -------
+    requests.Session
+        shared session
+    """
+    global _SHARED_SESSION
+    with _SHARED_SESSION_LOCK:
+        if _SHARED_SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SHARED_SESSION = session
+        return _SHARED_SESSION
+
 class ApiConnector:
     ''' Used for call a New-s summarize API '''
-    def __init__(self, token:str = '') -> 'ApiConnector':
-        self.__API_URL = config.APIUrl
+    def __init__(
+        self,
+        token:str = '',
+        session:requests.Session = None,
+        api_url:str = '',
+        gzip_threshold:int = None,
+        concurrency:int = 8,
+        bulk:bool = None,
+        timeout:float = 30.,
+        cache:ResponseCache = None
+        ) -> 'ApiConnector':
+        """Constructor of ApiConnector class
+
+        Parameters
+        ----------
+        token : str, optional
+            token to access all summarized news services, by default token in config
+        session : requests.Session, optional
+            session used to send requests e.g. replay.RecordingSession or replay.ReplaySession, by default shared_session()
+        api_url : str, optional
+            base url of New-sREST api, by default APIUrl in config
+        gzip_threshold : int, optional
+            request body larger than this number of bytes is sent gzip compressed, negative value disable compression,
+            by default GzipThreshold in config or -1 when it is not set
+        concurrency : int, optional
+            max number of concurrent requests of get_many, and of post_many and put_many when bulk endpoint is not available, by default 8
+        bulk : bool, optional
+            whether or not to use bulk endpoint of services, None detect it on first use, by default None
+        timeout : float, optional
+            timeout in seconds of each request, by default 30.
+        cache : ResponseCache, optional
+            cache of get responses, responses of a model are invalidated by writes of any connector that share the cache,
+            by default None no cache
+        """        
+        self.__API_URL = api_url or config.APIUrl
+        self.__session = session if session is not None else shared_session()
+        self.__timeout = timeout
+        self.__cache = cache
         self.__SERVICES = {
             "raw" : config.RawNewsServices,
             "summarized" : config.SummarizedNewsServices
@@ -15,6 +87,10 @@ class ApiConnector:
         self.__RAW_MODEL = rawModel
         self.__SUMMARIZED_MODEL = summarizedModel
         self.__PASS_STATUS = {200:'OK', 201:'Created', 204:'No content return'}
+        self.__UNSUPPORTED_STATUS = (404, 405, 501)
+        self.__gzip_threshold = gzip_threshold if gzip_threshold is not None else config.GzipThreshold
+        self.__concurrency = max(1, concurrency)
+        self.__bulk_supported = {model: bulk for model in self.__SERVICES}
         self.__point2model = self.__RAW_MODEL
         self.__token = token or config.Token
         self.__headers = {'Content-Type': 'application/json',
@@ -133,6 +209,26 @@ class ApiConnector:
             if k not in self.__point2model.keys():
                 raise Exception('Invalid payload')
 
+    def __encode(self, payload:Any) -> Tuple[bytes, dict]:
+        """Encode request body as json, body larger than gzip threshold is compressed
+
+        Parameters
+        ----------
+        payload : Any
+            request object
+
+        Returns
+        -------
+        Tuple[bytes, dict]
+            encoded body, request headers
+        """        
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = self.__headers
+        if 0 <= self.__gzip_threshold < len(data):
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        return data, headers
+
     def __returnRes(self, response: requests.models.Response) -> Tuple[int, str]:
         """Return post request to API services according to current model
         
@@ -152,6 +248,126 @@ class ApiConnector:
             res_data = response.text
         return response.status_code, res_data
 
+    def _prepare(self, method:str, id:str = None, payload:dict = None) -> Tuple[str, dict, dict, bytes]:
+        """Validate parameters and build a request to API services according to current model,
+        the request can be sent by any http client e.g. AsyncApiConnector
+
+        Parameters
+        ----------
+        method : str
+            http method, ['GET', 'POST', 'PUT', 'DELETE']
+        id : str, optional
+            mongoDb object id, required by 'PUT' and 'DELETE', by default None
+        payload : dict, optional
+            request parameters of 'GET' or request object of 'POST' and 'PUT', by default None
+
+        Returns
+        -------
+        Tuple[str, dict, dict, bytes]
+            url, query parameters, headers, body
+
+        Raises
+        ------
+        Exception 'Model not found'
+            raise this exception when can't find suit model for given payload
+        """        
+        reqUrl = self.__API_URL+self.__SERVICES[self.current_model()]
+        if method == 'GET':
+            if self.__point2model is self.__SUMMARIZED_MODEL:
+                self.__verifyParams(payload=payload, empty=True)
+                return reqUrl, payload, None, None
+            elif self.__point2model is self.__RAW_MODEL:
+                self.__verifyParams(token=True, payload=payload, empty=True)
+                return reqUrl, payload, self.__headers, None
+            raise Exception('Model not found')
+        if method == 'POST':
+            self.__verifyParams(payload=payload, token=True)
+            data, headers = self.__encode(payload)
+            return reqUrl, None, headers, data
+        if method == 'PUT':
+            self.__verifyParams(token=True, payload=payload)
+            data, headers = self.__encode(payload)
+            return reqUrl+'/'+id, None, headers, data
+        self.__verifyParams(token=True)
+        return reqUrl+'/'+id, None, self.__headers, None
+
+    def __http(self, method:str, url:str, **kwargs) -> requests.Response:
+        """Send a request with connector session, latency is recorded by host and service so object ids do not split the target
+
+        Parameters
+        ----------
+        method : str
+            http method
+        url : str
+            request url
+        **kwargs
+            keyword arguments of requests.Session.request
+
+        Returns
+        -------
+        requests.Response
+            response of request
+        """        
+        segments = url[len(self.__API_URL):].split('/')
+        target = urlsplit(self.__API_URL).netloc+'/'+'/'.join(segments[:2] if segments[1:2] == ['bulk'] else segments[:1])
+        started = time.perf_counter()
+        try:
+            response = self.__session.request(method, url, timeout=self.__timeout, **kwargs)
+        except requests.RequestException:
+            HTTP_FAILURES.inc(target=target)
+            raise
+        HTTP_LATENCY.observe(time.perf_counter()-started, target=target, method=method)
+        if response.status_code == 429 or response.status_code >= 500:
+            HTTP_FAILURES.inc(target=target)
+        return response
+
+    def __request(self, method:str, id:str = None, payload:dict = None) -> Tuple[int, Any]:
+        reqUrl, params, headers, data = self._prepare(method, id, payload)
+        if method == 'GET' and self.__cache is not None:
+            return self.__cached_get(reqUrl, params, headers)
+        response = self.__http(method, reqUrl, params=params, data=data, headers=headers)
+        if method != 'GET' and self.__cache is not None:
+            self.__cache.invalidate(self.current_model())
+        return self.__returnRes(response)
+
+    def __cached_get(self, reqUrl:str, params:dict, headers:dict) -> Tuple[int, Any]:
+        """Serve get request from cache, expired response is revalidated with its ETag
+
+        Parameters
+        ----------
+        reqUrl : str
+            request url
+        params : dict
+            request parameters
+        headers : dict
+            request headers
+
+        Returns
+        -------
+        Tuple[int, Any]
+            status_code, response_in_json or status_description
+        """        
+        key = ResponseCache.key(self.current_model(), reqUrl, params, self.__token)
+        entry = self.__cache.get(key)
+        if entry is not None and entry.fresh:
+            return self.__decodeText(entry.status_code, entry.text)
+        if entry is not None and entry.etag is not None:
+            headers = dict(headers or {}, **{'If-None-Match': entry.etag})
+        response = self.__http('GET', reqUrl, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.__cache.refresh(key)
+            return self.__decodeText(entry.status_code, entry.text)
+        if response.status_code == 200:
+            self.__cache.put(key, response.status_code, response.text, response.headers.get('ETag'))
+        return self.__returnRes(response)
+
+    @staticmethod
+    def __decodeText(status_code:int, text:str) -> Tuple[int, Any]:
+        try:
+            return status_code, json.loads(text)
+        except ValueError:
+            return status_code, text
+
     def post(self, payload: dict) -> Tuple[int, str]:
         """Send post request to API services according to current model
         
@@ -165,10 +381,7 @@ class ApiConnector:
         Tuple[int, str]
             status_code, response_in_json or status_description
         """        
-        self.__verifyParams(payload=payload, token=True)
-        reqUrl = self.__API_URL+self.__SERVICES[self.current_model()]
-        response = requests.post(reqUrl, json=payload, headers=self.__headers)
-        return self.__returnRes(response)
+        return self.__request('POST', payload=payload)
     
     def get(self, payload:dict) -> Tuple[int, List[dict]]:
         """Send get request to API services according to current model
@@ -188,16 +401,59 @@ class ApiConnector:
         Exception 'Model not found'
             raise this exception when can't find suit model for given payload
         """        
-        reqUrl = self.__API_URL+self.__SERVICES[self.current_model()]
-        if self.__point2model is self.__SUMMARIZED_MODEL:
-            self.__verifyParams(payload=payload, empty=True)
-            response = requests.get(reqUrl, params=payload)
-        elif self.__point2model is self.__RAW_MODEL:
-            self.__verifyParams(token=True, payload=payload, empty=True)
-            response = requests.get(reqUrl, params=payload, headers=self.__headers)
-        else:
-            raise Exception('Model not found')
-        return self.__returnRes(response)
+        return self.__request('GET', payload=payload)
+
+    def get_many(self, payloads:Iterable[dict]) -> List[Tuple[int, Any]]:
+        """Send many get requests to API services according to current model, services have no bulk read
+        so requests are sent concurrently over kept alive connections
+
+        Parameters
+        ----------
+        payloads : Iterable[dict]
+            list of request parameters
+
+        Returns
+        -------
+        List[Tuple[int, Any]]
+            status_code, response_in_json or status_description of each request in given order
+        """        
+        payloads = list(payloads)
+        if len(payloads) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.__concurrency, len(payloads))) as executor:
+            return list(executor.map(self.get, payloads))
+
+    def iter_get(self, payload:dict, chunk_size:int = 64*1024) -> Iterator[dict]:
+        """Send get request to API services according to current model and decode the response while it is downloaded,
+        only one record is held in memory at a time
+
+        Parameters
+        ----------
+        payload : dict
+            request parameters
+        chunk_size : int, optional
+            number of bytes that read from connection at a time, by default 64*1024
+
+        Yields
+        -------
+        Iterator[dict]
+            records in response order
+
+        Raises
+        ------
+        Exception 'Bad status code'
+            raise this exception when API return a non pass status code
+        ValueError
+            error when response is not a json array or the connection is closed before the array end
+        """        
+        reqUrl, params, headers, data = self._prepare('GET', payload=payload)
+        response = self.__http('GET', reqUrl, params=params, headers=headers, stream=True)
+        try:
+            if not response.status_code in self.__PASS_STATUS:
+                raise Exception('Bad status code {}'.format(response.status_code))
+            yield from iter_json_array(response.iter_content(chunk_size))
+        finally:
+            response.close()
 
     def put(self, id: str, payload: dict) -> Tuple[int, str]:
         """Send put request to API services according to current model
@@ -214,10 +470,7 @@ class ApiConnector:
         Tuple[int, str]
             status_code, response_in_json or status_description
         """        
-        self.__verifyParams(token=True, payload=payload)
-        reqUrl = self.__API_URL+self.__SERVICES[self.current_model()]+'/'+id
-        response = requests.put(reqUrl, json=payload, headers=self.__headers)
-        return self.__returnRes(response)
+        return self.__request('PUT', id, payload)
     
     def delete(self, id: str) -> Tuple[int, str]:
         """Send delete request to API services according to current model
@@ -232,7 +485,117 @@ class ApiConnector:
         Tuple[int, str]
             status_code, response_in_json or status_description
         """        
-        self.__verifyParams(token=True)
-        reqUrl = self.__API_URL+self.__SERVICES[self.current_model()]+'/'+id
-        response = requests.delete(reqUrl, headers=self.__headers)
-        return self.__returnRes(response)
\ No newline at end of file
+        return self.__request('DELETE', id)
+
+    def __send_bulk(self, method:str, model:str, payloads:List[dict]) -> List[Tuple[int, Any]]:
+        """Send a batch to bulk endpoint of given model
+
+        Parameters
+        ----------
+        method : str
+            http method, 'POST' or 'PUT'
+        model : str
+            name of model
+        payloads : List[dict]
+            list of request objects
+
+        Returns
+        -------
+        List[Tuple[int, Any]]
+            status_code and response of each item, None status_code when the bulk response is malformed,
+            None when bulk endpoint has not been confirmed and the batch is rejected so it should be sent as single requests
+        """        
+        reqUrl = self.__API_URL+self.__SERVICES[model]+'/bulk'
+        data, headers = self.__encode(payloads)
+        status_code, res_data = self.__returnRes(self.__http(method, reqUrl, data=data, headers=headers))
+        if self.__cache is not None:
+            self.__cache.invalidate(model)
+        if status_code in self.__PASS_STATUS:
+            if isinstance(res_data, list) and len(res_data) == len(payloads):
+                self.__bulk_supported[model] = True
+                return [(item.get('status', status_code), item.get('data')) if isinstance(item, dict) else (status_code, item) for item in res_data]
+            # items may have been written so they are not sent again as single requests, every item is failed to retry later
+            return [(None, 'Malformed bulk response')]*len(payloads)
+        if not self.__bulk_supported[model]:
+            # bulk endpoint is confirmed only by a successful batch, until then any rejected batch is sent as single requests
+            if status_code in self.__UNSUPPORTED_STATUS:
+                self.__bulk_supported[model] = False
+            return None
+        return [(status_code, res_data)]*len(payloads)
+
+    def __send_many(self, method:str, items:List[Any], batch_size:int) -> List[Tuple[int, Any]]:
+        """Send items in batches to bulk endpoint, fallback to concurrent single requests when bulk endpoint is not available
+
+        Parameters
+        ----------
+        method : str
+            http method, 'POST' or 'PUT'
+        items : List[Any]
+            request objects of post or (id, request object) of put
+        batch_size : int
+            max number of items in each bulk request
+
+        Returns
+        -------
+        List[Tuple[int, Any]]
+            status_code and response of each item in given order
+        """        
+        model = self.current_model()
+        results = []
+        start = 0
+        while start < len(items) and self.__bulk_supported[model] is not False:
+            batch = items[start:start+batch_size]
+            payloads = batch if method == 'POST' else [dict(payload, _id=id) for id, payload in batch]
+            batch_results = self.__send_bulk(method, model, payloads)
+            if batch_results is None:
+                break
+            results.extend(batch_results)
+            start += len(batch)
+        remains = items[start:]
+        if len(remains) != 0:
+            send = self.post if method == 'POST' else lambda item: self.put(*item)
+            with ThreadPoolExecutor(max_workers=min(self.__concurrency, len(remains))) as executor:
+                results.extend(executor.map(send, remains))
+        return results
+
+    def post_many(self, payloads:Iterable[dict], batch_size:int = 50) -> List[Tuple[int, Any]]:
+        """Send many post requests to API services according to current model,
+        items are sent in batches when the service has a bulk endpoint otherwise they are sent concurrently
+
+        Parameters
+        ----------
+        payloads : Iterable[dict]
+            list of request objects
+        batch_size : int, optional
+            max number of items in each bulk request, by default 50
+
+        Returns
+        -------
+        List[Tuple[int, Any]]
+            status_code, response_in_json or status_description of each item in given order
+        """        
+        payloads = list(payloads)
+        for payload in payloads:
+            self.__verifyParams(payload=payload, token=True)
+        return self.__send_many('POST', payloads, batch_size)
+
+    def put_many(self, updates:Iterable[Tuple[str, dict]], batch_size:int = 50) -> List[Tuple[int, Any]]:
+        """Send many put requests to API services according to current model,
+        items are sent in batches when the service has a bulk endpoint otherwise they are sent concurrently
+
+        Parameters
+        ----------
+        updates : Iterable[Tuple[str, dict]]
+            list of mongoDb object id and object to be replace e.g. [(id, {"summarizeStatus": 'true'})]
+        batch_size : int, optional
+            max number of items in each bulk request, by default 50
+
+        Returns
+        -------
+        List[Tuple[int, Any]]
+            status_code, response_in_json or status_description of each item in given order
+        """        
+        updates = list(updates)
+        for _, payload in updates:
+            self.__verifyParams(token=True, payload=payload)
+        return self.__send_many('PUT', updates, batch_size)
@@ -0,0 +1,151 @@
+import json
+import asyncio
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+from apiConnector.ApiConnector import ApiConnector, shared_session
+
+try:
+    import aiohttp
+except ImportError: # aiohttp is optional, requests are sent from a thread pool without it
+    aiohttp = None
+
+class AsyncApiConnector:
+    ''' Used for call a New-s summarize API from asyncio, requests are sent over a pool of kept alive connections '''
+    def __init__(
+        self,
+        token:str = '',
+        api_url:str = '',
+        concurrency:int = 16,
+        timeout:float = 30.,
+        gzip_threshold:int = None,
+        session:requests.Session = None
+        ) -> 'AsyncApiConnector':
+        """Constructor of AsyncApiConnector class
+
+        Parameters
+        ----------
+        token : str, optional
+            token to access all summarized news services, by default token in config
+        api_url : str, optional
+            base url of New-sREST api, by default APIUrl in config
+        concurrency : int, optional
+            max number of concurrent requests and kept alive connections, by default 16
+        timeout : float, optional
+            timeout in seconds of each request, by default 30.
+        gzip_threshold : int, optional
+            request body larger than this number of bytes is sent gzip compressed, negative value disable compression,
+            by default GzipThreshold in config or -1 when it is not set
+        session : requests.Session, optional
+            session that send requests from a thread pool instead of aiohttp e.g. replay.ReplaySession,
+            by default aiohttp when it is installed otherwise shared_session()
+        """
+        if session is None and aiohttp is None:
+            session = shared_session(concurrency)
+        self.__connector = ApiConnector(token=token, session=session, api_url=api_url, gzip_threshold=gzip_threshold, timeout=timeout)
+        self.__session = session
+        self.__concurrency = max(1, concurrency)
+        self.__timeout = timeout
+        self.__client = None
+        self.__executor = None
+        self.__semaphore = None
+
+    @property
+    def PASS_STATUS(self) -> dict:
+        return self.__connector.PASS_STATUS
+
+    @property
+    def MODEL_LISTS(self) -> List[str]:
+        return self.__connector.MODEL_LISTS
+
+    def setModel(self, model:str) -> 'AsyncApiConnector':
+        """Set API payload model, see ApiConnector.setModel
+
+        Returns
+        -------
+        AsyncApiConnector
+            return self
+        """
+        self.__connector.setModel(model)
+        return self
+
+    def setToken(self, token:str) -> 'AsyncApiConnector':
+        """Set API token, see ApiConnector.setToken
+
+        Returns
+        -------
+        AsyncApiConnector
+            return self
+        """
+        self.__connector.setToken(token)
+        return self
+
+    def current_model(self) -> str:
+        return self.__connector.current_model()
+
+    def __open(self) -> None:
+        """Create http client and concurrency limit on running event loop"""
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__concurrency)
+        if self.__session is not None:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=self.__concurrency, thread_name_prefix='api')
+        elif self.__client is None:
+            self.__client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.__concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.__timeout))
+
+    @staticmethod
+    def __decode(status_code:int, text:str) -> Tuple[int, Any]:
+        try:
+            return status_code, json.loads(text)
+        except ValueError:
+            return status_code, text
+
+    def __send(self, method:str, reqUrl:str, params:dict, headers:dict, data:bytes) -> Tuple[int, Any]:
+        response = self.__session.request(method, reqUrl, params=params, data=data, headers=headers, timeout=self.__timeout)
+        return self.__decode(response.status_code, response.text)
+
+    async def __request(self, method:str, id:str = None, payload:dict = None) -> Tuple[int, Any]:
+        reqUrl, params, headers, data = self.__connector._prepare(method, id, payload)
+        self.__open()
+        async with self.__semaphore:
+            if self.__session is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.__executor, self.__send, method, reqUrl, params, headers, data)
+            if params is not None:
+                # aiohttp only accept str, int and float values, bool is formatted the same way as requests
+                params = {key: str(value) if isinstance(value, bool) else value for key, value in params.items()}
+            async with self.__client.request(method, reqUrl, params=params, headers=headers, data=data) as response:
+                return self.__decode(response.status, await response.text())
+
+    async def post(self, payload:dict) -> Tuple[int, Any]:
+        """Send post request to API services according to current model, see ApiConnector.post"""
+        return await self.__request('POST', payload=payload)
+
+    async def get(self, payload:dict) -> Tuple[int, List[dict]]:
+        """Send get request to API services according to current model, see ApiConnector.get"""
+        return await self.__request('GET', payload=payload)
+
+    async def put(self, id:str, payload:dict) -> Tuple[int, Any]:
+        """Send put request to API services according to current model, see ApiConnector.put"""
+        return await self.__request('PUT', id, payload)
+
+    async def delete(self, id:str) -> Tuple[int, Any]:
+        """Send delete request to API services according to current model, see ApiConnector.delete"""
+        return await self.__request('DELETE', id)
+
+    async def close(self) -> None:
+        """Close kept alive connections, the shared session is left open for other connectors"""
+        if self.__client is not None:
+            await self.__client.close()
+            self.__client = None
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    async def __aenter__(self) -> 'AsyncApiConnector':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,220 @@
+import time
+import threading
+import collections
+from typing import Iterable, List
+from apiConnector.ApiConnector import ApiConnector
+
+class ChangeFeed:
+    ''' Incremental reader of news that were inserted after a cursor, each news is transferred once
+
+    The server should support 'from' as an inclusive lower bound of insertDt, 'sort=insertDt' in ascending order
+    and 'limit'. Once a page is not in insertDt order the server is taken as ignoring sort, every later poll read
+    all news after the read position without limit and sort them on client. Read position moves on at every poll
+    while the cursor moves past a batch only after it is committed, every batch that is committed before it must
+    be committed too, rewind read again from the cursor '''
+    def __init__(
+        self,
+        connector:ApiConnector,
+        params:dict = None,
+        limit:int = 24,
+        since:str = None,
+        since_ids:Iterable[str] = None,
+        long_poll:float = 0,
+        idle_min:float = 1.,
+        idle_max:float = 60.
+        ) -> 'ChangeFeed':
+        """Constructor of ChangeFeed class
+
+        Parameters
+        ----------
+        connector : ApiConnector
+            connector that point to the model to read
+        params : dict, optional
+            filter parameters of every request e.g. {'summarizeStatus': 'false'}, by default None
+        limit : int, optional
+            max number of news in each request, by default 24
+        since : str, optional
+            insertDt cursor, only news inserted at or after it are read, by default None read from the oldest news
+        since_ids : Iterable[str], optional
+            ids of news inserted at since cursor that have been read e.g. cursor_ids of a previous feed, by default None
+        long_poll : float, optional
+            seconds that server may hold a request until new news are inserted, server must support 'wait' parameter
+            e.g. replay.StandInServer, 0 disable long polling, by default 0
+        idle_min : float, optional
+            first delay in seconds before polling again when there is no new news, by default 1.
+        idle_max : float, optional
+            max delay in seconds before polling again, the delay is doubled on every empty poll, by default 60.
+        """
+        self.__connector = connector
+        self.__params = dict(params or {})
+        self.__limit = limit
+        self.__page = limit
+        self.__sorted = True
+        self.__cursor = since
+        self.__cursor_ids = set(since_ids or ()) if since is not None else set()
+        self.__read_cursor = self.__cursor
+        self.__read_ids = set(self.__cursor_ids)
+        # polled batches in read order, each is [batch, cursor after batch, cursor ids after batch, committed]
+        self.__pending = collections.deque()
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.__long_poll = long_poll
+        self.__idle_min = idle_min
+        self.__idle_max = idle_max
+        self.__idle = idle_min
+
+    @property
+    def cursor(self) -> str:
+        """insertDt of the latest committed news
+
+        Returns
+        -------
+        str
+            insertDt cursor, None when nothing has been read
+        """
+        return self.__cursor
+
+    @property
+    def cursor_ids(self) -> List[str]:
+        """Ids of committed news that were inserted at the cursor, a feed resumed with since and since_ids skip them
+
+        Returns
+        -------
+        List[str]
+            news ids
+        """
+        with self.__lock:
+            return sorted(self.__cursor_ids)
+
+    @property
+    def server_sort(self) -> bool:
+        """Whether server is still trusted to sort pages, False once a page that is not in insertDt order was read
+
+        Returns
+        -------
+        bool
+            False when every poll read all news after the read position
+        """
+        return self.__sorted
+
+    def __read(self, cursor:str, cursor_ids:set, wait:float) -> List[dict]:
+        """Read news after given read position, the page is widened while it only holds news that have been read"""
+        while True:
+            params = dict(self.__params)
+            if self.__sorted:
+                params.update(limit=self.__page, sort='insertDt')
+            if cursor is not None:
+                params['from'] = cursor
+            if wait > 0:
+                params['wait'] = wait
+            status_code, news = self.__connector.get(params)
+            if not status_code in self.__connector.PASS_STATUS or not isinstance(news, list):
+                raise Exception('Bad status code {}'.format(status_code))
+            insert_dts = [x.get('insertDt', '') for x in news]
+            if self.__sorted and any(previous > current for previous, current in zip(insert_dts, insert_dts[1:])):
+                # a limited page in another order may skip news that are older than its last news
+                print('Change feed page is not sorted by insertDt, read every news after the cursor from now on')
+                self.__sorted = False
+                continue
+            news.sort(key=lambda x: (x.get('insertDt', ''), x.get('_id', '')))
+            # 'from' is inclusive, news that were inserted at the cursor are returned again
+            fresh = [x for x in news if cursor is None or x.get('insertDt', '') > cursor
+                or (x.get('insertDt') == cursor and x.get('_id') not in cursor_ids)]
+            if not self.__sorted:
+                # the rest are read again by the next poll
+                return fresh[:self.__limit]
+            if len(fresh) != 0 or len(news) < self.__page:
+                return fresh
+            # a whole page of news inserted at the cursor has been read, widen the page to get past it
+            self.__page *= 2
+
+    def poll(self, wait:float = 0) -> List[dict]:
+        """Send one request and return news after read position, the batch should be committed once it is handled
+
+        Parameters
+        ----------
+        wait : float, optional
+            seconds that server may hold the request until new news are inserted, by default 0
+
+        Returns
+        -------
+        List[dict]
+            new news in insertDt order
+
+        Raises
+        ------
+        Exception 'Bad status code'
+            raise this exception when API return a non pass status code
+        """
+        while True:
+            with self.__lock:
+                generation, cursor, cursor_ids = self.__generation, self.__read_cursor, set(self.__read_ids)
+            fresh = self.__read(cursor, cursor_ids, wait)
+            with self.__lock:
+                if generation != self.__generation:
+                    continue # rewound while reading, read again from the cursor
+                if len(fresh) != 0:
+                    latest = fresh[-1].get('insertDt', self.__read_cursor)
+                    if latest != self.__read_cursor:
+                        self.__read_cursor = latest
+                        self.__read_ids = set()
+                    self.__read_ids.update(x.get('_id') for x in fresh if x.get('insertDt') == latest)
+                    self.__pending.append([fresh, self.__read_cursor, set(self.__read_ids), False])
+                    self.__page = self.__limit
+                return fresh
+
+    def commit(self, news:List[dict]) -> None:
+        """Mark a polled batch as handled e.g. published or scheduled to retry, the cursor moves past it
+        once every batch that was polled before it has been committed
+
+        Parameters
+        ----------
+        news : List[dict]
+            batch that was returned by poll or next, other lists are ignored
+        """
+        with self.__lock:
+            for entry in self.__pending:
+                if entry[0] is news:
+                    entry[3] = True
+                    break
+            while len(self.__pending) != 0 and self.__pending[0][3]:
+                _, self.__cursor, self.__cursor_ids, _ = self.__pending.popleft()
+
+    def rewind(self) -> None:
+        """Forget batches that have not been committed, the next poll read again from the cursor"""
+        with self.__lock:
+            self.__pending.clear()
+            self.__read_cursor = self.__cursor
+            self.__read_ids = set(self.__cursor_ids)
+            self.__generation += 1
+
+    def next(self, run_event:threading.Event = None) -> List[dict]:
+        """Wait for new news, long poll when enabled otherwise back off exponentially while there is nothing new
+
+        Parameters
+        ----------
+        run_event : threading.Event, optional
+            return an empty list when this event is cleared, by default None wait forever
+
+        Returns
+        -------
+        List[dict]
+            new news in insertDt order
+        """
+        while run_event is None or run_event.is_set():
+            started = time.monotonic()
+            try:
+                news = self.poll(self.__long_poll)
+            except Exception as e:
+                print('Failed to poll change feed', e)
+                news = None
+            if news:
+                self.__idle = self.__idle_min
+                return news
+            if news is not None and self.__long_poll > 0 and time.monotonic()-started >= self.__long_poll/2:
+                continue # server held the request, poll again immediately
+            deadline = time.monotonic()+self.__idle
+            while (run_event is None or run_event.is_set()) and time.monotonic() < deadline:
+                time.sleep(min(1., deadline-time.monotonic()))
+            self.__idle = min(self.__idle_max, self.__idle*2)
+        return []
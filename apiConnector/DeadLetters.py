@@ -0,0 +1,38 @@
+import json
+import argparse
+from datetime import datetime
+from apiConnector.Outbox import Outbox
+
+def main(argv:list = None) -> None:
+    """Inspect or replay dead letters of an outbox file e.g. `python -m apiConnector.DeadLetters configs/outbox.sqlite3 list`
+
+    Parameters
+    ----------
+    argv : list, optional
+        command line arguments, by default None sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Inspect and replay dead letters of New-s outbox')
+    parser.add_argument('db_path', help='SQLite file of outbox')
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help='list dead letters, the oldest first')
+    list_parser.add_argument('--kind', choices=['write', 'summarize'])
+    list_parser.add_argument('--limit', type=int, default=100)
+    list_parser.add_argument('--payload', action='store_true', help='print payload of each dead letter')
+    replay_parser = commands.add_parser('replay', help='queue dead letters again, a running system send them on its next flush')
+    replay_parser.add_argument('ids', type=int, nargs='*', help='ids of dead letters, every dead letters when omitted')
+    args = parser.parse_args(argv)
+    outbox = Outbox(args.db_path)
+    try:
+        if args.command == 'list':
+            for letter in outbox.dead_letters(args.kind, args.limit):
+                print('{id:>6} {kind:<9} {model:<10} {method!s:<6} {target!s:<24} attempts={attempts} buried={buried} error={error}'.format(
+                    buried=datetime.fromtimestamp(letter['buried_at']).isoformat(timespec='seconds'), **letter))
+                if args.payload:
+                    print(json.dumps(letter['payload'], ensure_ascii=False))
+        else:
+            print('{} dead letters are replayed'.format(outbox.replay(args.ids or None)))
+    finally:
+        outbox.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import re
+import json
+import codecs
+from typing import Any, Iterable, Iterator
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+STRUCTURE_PATTERN = re.compile(r'["\[\]{},\s]')
+STRING_PATTERN = re.compile(r'["\\]')
+DECODER = json.JSONDecoder()
+
+def iter_json_array(chunks:Iterable[bytes], encoding:str = 'utf-8') -> Iterator[Any]:
+    """Incrementally decode a json array, each item is yielded as soon as its last byte is read
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        chunks of json array e.g. requests.Response.iter_content()
+    encoding : str, optional
+        text encoding of chunks, by default 'utf-8'
+
+    Yields
+    -------
+    Iterator[Any]
+        decoded items in array order
+
+    Raises
+    ------
+    ValueError
+        error when chunks are not a json array or the array is truncated
+    """
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    started = False
+    pos = 0 # start of the current item or of the text that has not been read
+    scan = None # position that the current item has been scanned up to, None between items
+    depth = 0
+    in_string = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        while True:
+            if scan is None:
+                pos = WHITESPACE_PATTERN.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                char = buffer[pos]
+                if not started:
+                    if char != '[':
+                        raise ValueError('Response is not a json array')
+                    started = True
+                    pos += 1
+                    continue
+                if char == ']':
+                    return
+                if char == ',':
+                    pos += 1
+                    continue
+                scan, depth, in_string = pos, 0, False
+            # find the end of the item, scanning resume where the previous chunk stopped so each byte is scanned once
+            end = None
+            while end is None:
+                match = (STRING_PATTERN if in_string else STRUCTURE_PATTERN).search(buffer, scan)
+                if match is None:
+                    scan = len(buffer)
+                    break
+                scan = match.start()
+                char = buffer[scan]
+                if in_string:
+                    if char == '\\':
+                        if scan+1 == len(buffer):
+                            break # escaped character is in the next chunk
+                        scan += 2
+                        continue
+                    in_string = False
+                    scan += 1
+                    if depth == 0:
+                        end = scan
+                elif char == '"':
+                    in_string = True
+                    scan += 1
+                elif char in '[{':
+                    depth += 1
+                    scan += 1
+                elif char in ']}' and depth > 0:
+                    depth -= 1
+                    scan += 1
+                    if depth == 0:
+                        end = scan
+                elif depth == 0:
+                    end = scan # a number or literal ends at a delimiter
+                else:
+                    scan += 1
+            if end is None:
+                break # item is not complete, read the next chunk
+            item, item_end = DECODER.raw_decode(buffer, pos)
+            if item_end != end:
+                raise ValueError('Invalid json array item at {}'.format(pos))
+            pos, scan = end, None
+            yield item
+        # only the incomplete tail is kept, buffer never hold more than one item and a chunk
+        buffer = buffer[pos:]
+        if scan is not None:
+            scan -= pos
+        pos = 0
+    raise ValueError('Truncated json array')
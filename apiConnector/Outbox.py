@@ -0,0 +1,427 @@
+import json
+import time
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from apiConnector.ApiConnector import ApiConnector
+from metrics.Instruments import POSTED, FAILED, STAGE_LATENCY
+from metrics.Tracer import Tracer
+
+# fields that a server may ignore on insert, a posted document that lost them is followed by a put
+STATUS_FIELDS = ('summarizeStatus',)
+
+class Outbox:
+    ''' Durable write-behind queue of New-sREST writes, backed by SQLite in WAL mode and drained by a background flusher '''
+    def __init__(
+        self,
+        db_path:str,
+        connector_factory:Callable[[], ApiConnector] = ApiConnector,
+        batch_size:int = 50,
+        flush_interval:float = 1.,
+        backoff_base:float = 1.,
+        backoff_max:float = 300.,
+        max_attempts:int = 10,
+        tracer:Tracer = None
+        ):
+        """Constructor of Outbox class
+
+        Parameters
+        ----------
+        db_path : str
+            path of SQLite database file, ':memory:' keep the queue in memory only
+        connector_factory : Callable[[], ApiConnector], optional
+            function that return a new ApiConnector, one connector is created for each model, by default ApiConnector
+        batch_size : int, optional
+            max number of writes that are sent in one bulk request, by default 50
+        flush_interval : float, optional
+            seconds between flushes when there is nothing to send, by default 1.
+        backoff_base : float, optional
+            base delay in seconds before a failed write is retried, the delay is doubled on every failure, by default 1.
+        backoff_max : float, optional
+            max delay in seconds before a failed write is retried, by default 300.
+        max_attempts : int, optional
+            number of attempts that a write rejected by api is moved to dead letter queue after, writes that failed
+            because api is unreachable, overloaded or unauthorized are retried until they are sent, by default 10
+        tracer : Tracer, optional
+            tracer that sent writes of traced articles are marked in as '<method>_<model>' stage, by default None
+        """
+        self.__connector_factory = connector_factory
+        self.__batch_size = max(1, batch_size)
+        self.__flush_interval = flush_interval
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+        self.__max_attempts = max(1, max_attempts)
+        self.__connectors = {}
+        self.__tracer = tracer if tracer is not None else Tracer()
+        self.__traces = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        self.__wakeup = threading.Event()
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, method TEXT NOT NULL, target TEXT, '
+            'payload TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, '
+            'created_at REAL NOT NULL, last_error TEXT)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS outbox_next_attempt_index ON outbox (next_attempt_at)')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, model TEXT NOT NULL, method TEXT, target TEXT, '
+            'payload TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT, created_at REAL NOT NULL, buried_at REAL NOT NULL)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS dead_letter_target_index ON dead_letter (model, target)')
+        self.__pending = {}
+        for model, target in self.__connection.execute("SELECT model, target FROM outbox WHERE method = 'PUT'"):
+            self.__pending[(model, target)] = self.__pending.get((model, target), 0)+1
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__connection.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def __enqueue(self, model:str, method:str, target:str, payload:dict, trace:str, finish:bool) -> int:
+        now = time.time()
+        with self.__lock:
+            id = self.__connection.execute(
+                'INSERT INTO outbox (model, method, target, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (model, method, target, json.dumps(payload, ensure_ascii=False), now, now)).lastrowid
+            if trace is not None and self.__tracer.enabled:
+                self.__traces[id] = (trace, finish)
+                # traces that the tracer has dropped are not kept either, their writes are sent untraced
+                while len(self.__traces) > self.__tracer.max_open:
+                    self.__traces.popitem(last=False)
+            if method == 'PUT':
+                self.__pending[(model, target)] = self.__pending.get((model, target), 0)+1
+        self.__wakeup.set()
+        return id
+
+    def post(self, model:str, payload:dict, trace:str = None, finish:bool = False) -> int:
+        """Queue a post request, the request is committed before this method return and sent later by flusher
+
+        Parameters
+        ----------
+        model : str
+            name of model, ['raw', 'summarized']
+        payload : dict
+            request object
+        trace : str, optional
+            key of traced article, by default None
+        finish : bool, optional
+            whether or not the trace is completed when this write is sent, by default False
+
+        Returns
+        -------
+        int
+            id of queued write
+        """
+        return self.__enqueue(model, 'POST', None, payload, trace, finish)
+
+    def put(self, model:str, id:str, payload:dict, trace:str = None, finish:bool = False) -> int:
+        """Queue a put request, the request is committed before this method return and sent later by flusher
+
+        Parameters
+        ----------
+        model : str
+            name of model, ['raw', 'summarized']
+        id : str
+            mongoDb object id
+        payload : dict
+            object to be replace
+        trace : str, optional
+            key of traced article, by default None
+        finish : bool, optional
+            whether or not the trace is completed when this write is sent, by default False
+
+        Returns
+        -------
+        int
+            id of queued write
+        """
+        return self.__enqueue(model, 'PUT', id, payload, trace, finish)
+
+    def pending(self, model:str, id:str) -> bool:
+        """Check whether or not a put request of given object is waiting to be sent
+
+        Parameters
+        ----------
+        model : str
+            name of model
+        id : str
+            mongoDb object id
+
+        Returns
+        -------
+        bool
+            True if a put request is queued
+        """
+        return (model, id) in self.__pending
+
+    def bury(self, kind:str, model:str, method:str, target:str, payload:dict, attempts:int, error:str) -> int:
+        """Move an item that has run out of attempts into dead letter queue
+
+        Parameters
+        ----------
+        kind : str
+            kind of failure, 'write' for a write that is rejected by api or 'summarize' for a news that can not be summarized
+        model : str
+            name of model
+        method : str
+            http method of write, None for summarize failure
+        target : str
+            mongoDb object id, None when item has no id
+        payload : dict
+            request object or news
+        attempts : int
+            number of failed attempts
+        error : str
+            last error
+
+        Returns
+        -------
+        int
+            id of dead letter
+        """
+        now = time.time()
+        with self.__lock:
+            id = self.__connection.execute(
+                'INSERT INTO dead_letter (kind, model, method, target, payload, attempts, error, created_at, buried_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, model, method, target, json.dumps(payload, ensure_ascii=False), attempts, str(error)[:500], now, now)).lastrowid
+        return id
+
+    def buried(self, model:str, id:str) -> bool:
+        """Check whether or not given object is in dead letter queue
+
+        Parameters
+        ----------
+        model : str
+            name of model
+        id : str
+            mongoDb object id
+
+        Returns
+        -------
+        bool
+            True if the object has a dead letter
+        """
+        with self.__lock:
+            return self.__connection.execute(
+                'SELECT 1 FROM dead_letter WHERE model = ? AND target = ? LIMIT 1', (model, id)).fetchone() is not None
+
+    def dead_letters(self, kind:str = None, limit:int = 100) -> List[dict]:
+        """List dead letters, the oldest first
+
+        Parameters
+        ----------
+        kind : str, optional
+            only dead letters of given kind, by default None every kinds
+        limit : int, optional
+            max number of dead letters, by default 100
+
+        Returns
+        -------
+        List[dict]
+            list of dead letters
+        """
+        query = 'SELECT id, kind, model, method, target, payload, attempts, error, created_at, buried_at FROM dead_letter'
+        params = ()
+        if kind is not None:
+            query += ' WHERE kind = ?'
+            params = (kind,)
+        with self.__lock:
+            rows = self.__connection.execute(query+' ORDER BY id LIMIT ?', params+(limit,)).fetchall()
+        columns = ('id', 'kind', 'model', 'method', 'target', 'payload', 'attempts', 'error', 'created_at', 'buried_at')
+        return [dict(zip(columns, row[:5]+(json.loads(row[5]),)+row[6:])) for row in rows]
+
+    def replay(self, ids:Iterable[int] = None) -> int:
+        """Queue dead letters again with a fresh attempt count, a rejected write is queued as it was and a news that
+        could not be summarized is posted as unsummarized raw news, raw news that has an id is unsummarized on api already
+        and it is summarized again on the next start of summarizer
+
+        Parameters
+        ----------
+        ids : Iterable[int], optional
+            ids of dead letters, by default None every dead letters
+
+        Returns
+        -------
+        int
+            number of replayed dead letters
+        """
+        query = 'SELECT id, kind, model, method, target, payload, created_at FROM dead_letter'
+        with self.__lock:
+            if ids is None:
+                rows = self.__connection.execute(query).fetchall()
+            else:
+                rows = [row for id in ids for row in self.__connection.execute(query+' WHERE id = ?', (id,))]
+            now = time.time()
+            with self.__connection:
+                self.__connection.execute('BEGIN')
+                for id, kind, model, method, target, payload, created_at in rows:
+                    if kind == 'write':
+                        self.__connection.execute(
+                            'INSERT INTO outbox (model, method, target, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                            (model, method, target, payload, now, created_at))
+                        if method == 'PUT':
+                            self.__pending[(model, target)] = self.__pending.get((model, target), 0)+1
+                    elif target is None:
+                        self.__connection.execute(
+                            'INSERT INTO outbox (model, method, target, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                            ('raw', 'POST', None, json.dumps(dict(json.loads(payload), summarizeStatus='false'), ensure_ascii=False), now, now))
+                    self.__connection.execute('DELETE FROM dead_letter WHERE id = ?', (id,))
+        self.__wakeup.set()
+        return len(rows)
+
+    @staticmethod
+    def __unkept_status(payload:dict, response:Any) -> Optional[dict]:
+        """Status fields of a posted payload that are different in the inserted document, None when every field is kept"""
+        if not isinstance(response, dict) or not isinstance(response.get('_id'), str):
+            return None
+        changes = {key: payload[key] for key in STATUS_FIELDS if key in payload and str(response.get(key)).lower() != str(payload[key]).lower()}
+        return changes if len(changes) != 0 else None
+
+    def __permanent(self, status_code:int) -> bool:
+        """Check whether or not a failed write is rejected by api, so sending it again gives the same result"""
+        return isinstance(status_code, int) and 400 <= status_code < 500 and status_code not in (401, 403, 408, 429)
+
+    def __connector(self, model:str) -> ApiConnector:
+        if model not in self.__connectors:
+            self.__connectors[model] = self.__connector_factory().setModel(model)
+        return self.__connectors[model]
+
+    def __send(self, model:str, method:str, writes:List[tuple]) -> List[Tuple[int, Any]]:
+        connector = self.__connector(model)
+        try:
+            if method == 'POST':
+                return connector.post_many([payload for _, _, payload in writes], batch_size=self.__batch_size)
+            return connector.put_many([(target, payload) for _, target, payload in writes], batch_size=self.__batch_size)
+        except Exception as err:
+            return [(None, str(err))]*len(writes)
+
+    def flush(self) -> int:
+        """Send due writes once, sent writes are removed and failed writes are scheduled to retry with backoff
+
+        Returns
+        -------
+        int
+            number of sent writes
+        """
+        with self.__flush_lock:
+            with self.__lock:
+                rows = self.__connection.execute(
+                    'SELECT id, model, method, target, payload, attempts, created_at FROM outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT ?',
+                    (time.time(), self.__batch_size*4)).fetchall()
+            groups = {}
+            for id, model, method, target, payload, _, _ in rows:
+                groups.setdefault((model, method), []).append((id, target, json.loads(payload)))
+            attempts = {row[0]: row[5] for row in rows}
+            created_at = {row[0]: row[6] for row in rows}
+            sent = 0
+            for (model, method), writes in groups.items():
+                results = self.__send(model, method, writes)
+                pass_status = self.__connector(model).PASS_STATUS
+                done = []
+                failed = []
+                dead = []
+                unkept = []
+                now = time.time()
+                for (id, target, payload), (status_code, status_text) in zip(writes, results):
+                    if status_code in pass_status:
+                        done.append((id, target))
+                        if method == 'POST':
+                            changes = self.__unkept_status(payload, status_text)
+                            if changes is not None:
+                                unkept.append((status_text['_id'], changes))
+                        continue
+                    error = str(status_code if status_code is not None else status_text)[:500]
+                    if self.__permanent(status_code) and attempts[id]+1 >= self.__max_attempts:
+                        dead.append((id, target, error))
+                        continue
+                    delay = min(self.__backoff_max, self.__backoff_base*(2**attempts[id]))*random.uniform(.5, 1)
+                    failed.append((now+delay, error, id))
+                with self.__lock:
+                    with self.__connection:
+                        self.__connection.execute('BEGIN')
+                        self.__connection.executemany('DELETE FROM outbox WHERE id = ?', [(id,) for id, _ in done])
+                        self.__connection.executemany(
+                            'UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?', failed)
+                        self.__connection.executemany(
+                            "INSERT INTO dead_letter (kind, model, method, target, payload, attempts, error, created_at, buried_at) "
+                            "SELECT 'write', model, method, target, payload, attempts + 1, ?, created_at, ? FROM outbox WHERE id = ?",
+                            [(error, now, id) for id, _, error in dead])
+                        self.__connection.executemany('DELETE FROM outbox WHERE id = ?', [(id,) for id, _, _ in dead])
+                    for id, target, *_ in done+dead:
+                        if method == 'PUT':
+                            count = self.__pending.pop((model, target), 1)-1
+                            if count > 0:
+                                self.__pending[(model, target)] = count
+                for target, changes in unkept:
+                    # server ignored status fields on insert, set them explicitly
+                    self.put(model, target, changes)
+                for id, _ in done:
+                    STAGE_LATENCY.observe(now-created_at[id], stage='post')
+                    trace, finish = self.__traces.pop(id, (None, False))
+                    if trace is not None:
+                        stage = '{}_{}'.format(method.lower(), model)
+                        if finish:
+                            self.__tracer.finish(trace, stage)
+                        else:
+                            self.__tracer.mark(trace, stage)
+                for id, _, error in dead:
+                    print('Write {} {} is moved to dead letter queue :'.format(method, model), error)
+                    trace, _ = self.__traces.pop(id, (None, False))
+                    if trace is not None:
+                        self.__tracer.finish(trace, '{}_{}'.format(method.lower(), model), error=error)
+                POSTED.inc(len(done), model=model, method=method)
+                FAILED.inc(len(failed)+len(dead), stage='post')
+                FAILED.inc(len(dead), stage='dead_letter')
+                sent += len(done)
+            return sent
+
+    def __run(self) -> None:
+        while True:
+            try:
+                sent = self.flush()
+            except Exception as e:
+                print('Some error occur in outbox flusher', e)
+                sent = 0
+            if self.__stopped.is_set():
+                break
+            if sent == 0:
+                self.__wakeup.wait(self.__flush_interval)
+                self.__wakeup.clear()
+
+    def start(self) -> 'Outbox':
+        """Drain queued writes in a background thread
+
+        Returns
+        -------
+        Outbox
+            return self
+        """
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='outbox', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self, timeout:float = 30.) -> None:
+        """Stop background flusher after a last flush, unsent writes are kept for next start
+
+        Parameters
+        ----------
+        timeout : float, optional
+            seconds to wait for the last flush, by default 30.
+        """
+        self.__stopped.set()
+        self.__wakeup.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def close(self) -> None:
+        self.stop()
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,123 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from metrics.Instruments import CACHE_REQUESTS
+
+class CacheEntry:
+    ''' Cached GET response '''
+    __slots__ = ('status_code', 'text', 'etag', 'expires_at')
+
+    def __init__(self, status_code:int, text:str, etag:Optional[str], expires_at:float):
+        self.status_code = status_code
+        self.text = text
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+class ResponseCache:
+    ''' Thread-safe LRU cache of GET responses with time to live, can be shared by many ApiConnector '''
+    def __init__(self, max_entries:int = 256, ttl:float = 60.):
+        """Constructor of ResponseCache class
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            max number of cached responses, the least recently used response is evicted, by default 256
+        ttl : float, optional
+            seconds that a response is served without asking the server, expired response that has an ETag
+            is revalidated with If-None-Match, by default 60.
+        """
+        self.__max_entries = max(1, max_entries)
+        self.__ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def key(model:str, url:str, params:dict, token:str = '') -> Tuple[str, str, str, tuple]:
+        """Build cache key of a request, parameters are normalized so their order and value types do not matter
+
+        Parameters
+        ----------
+        model : str
+            name of model
+        url : str
+            request url
+        params : dict
+            request parameters
+        token : str, optional
+            access token of the request, responses are not shared between tokens, only its hash is kept, by default ''
+
+        Returns
+        -------
+        Tuple[str, str, str, tuple]
+            cache key
+        """
+        token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest() if token else ''
+        return model, url, token_hash, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key:tuple) -> Optional[CacheEntry]:
+        """Get cached response, a fresh response is counted as a hit
+
+        Parameters
+        ----------
+        key : tuple
+            cache key
+
+        Returns
+        -------
+        Optional[CacheEntry]
+            cached response that may be expired, None when nothing is cached
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            if entry is not None and entry.fresh:
+                self.hits += 1
+                CACHE_REQUESTS.inc(result='hit')
+            else:
+                self.misses += 1
+                CACHE_REQUESTS.inc(result='miss')
+            return entry
+
+    def put(self, key:tuple, status_code:int, text:str, etag:Optional[str] = None) -> None:
+        with self.__lock:
+            self.__entries[key] = CacheEntry(status_code, text, etag, time.monotonic()+self.__ttl)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def refresh(self, key:tuple) -> None:
+        """Extend time to live of a revalidated response"""
+        with self.__lock:
+            self.revalidations += 1
+            CACHE_REQUESTS.inc(result='revalidated')
+            entry = self.__entries.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic()+self.__ttl
+
+    def invalidate(self, model:str = None) -> None:
+        """Remove cached responses of given model
+
+        Parameters
+        ----------
+        model : str, optional
+            name of model, by default None remove every responses
+        """
+        with self.__lock:
+            if model is None:
+                self.__entries.clear()
+                return
+            for key in [key for key in self.__entries if key[0] == model]:
+                del self.__entries[key]
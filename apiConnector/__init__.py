@@ -1 +1,5 @@
-from apiConnector.ApiConnector import *
\ No newline at end of file
+from apiConnector.ApiConnector import *
+from apiConnector.AsyncApiConnector import *
+from apiConnector.Outbox import *
+from apiConnector.ChangeFeed import *
+from apiConnector.ResponseCache import *
\ No newline at end of file
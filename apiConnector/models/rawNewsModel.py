@@ -12,5 +12,7 @@ model = {
     "from": "",
     "to": "",
     "limit": "",
+    "wait": "",
+    "sort": "",
     "summarizeStatus": ""
 }
\ No newline at end of file
@@ -11,5 +11,7 @@ model = {
     "publishAt": "",
     "from": "",
     "to": "",
-    "limit": ""
+    "limit": "",
+    "wait": "",
+    "sort": ""
 }
\ No newline at end of file
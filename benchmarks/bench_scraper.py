@@ -0,0 +1,78 @@
+''' Benchmark of scraper hot path on saved Sanook payloads
+
+Usage: python -m benchmarks.bench_scraper [payload_dir] [repeat]
+'''
+import sys
+import re
+import json
+import glob
+import timeit
+from os import path
+from bs4 import BeautifulSoup
+from newsScraper.utils import html_to_text
+from newsScraper.scraper.Scraper import ISO8601_PATTERN
+from newsScraper.ScraperRegistry import SCRAPERS
+
+PAYLOAD_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'tests', 'fixtures', 'sanook')
+
+def load_bodies(payload_dir:str) -> list:
+    bodies = []
+    for file_path in sorted(glob.glob(path.join(payload_dir, '*.json'))):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)['data']['entry']
+        bodies += entry['body']
+    return bodies
+
+def soup_text(bodies:list) -> None:
+    for body in bodies:
+        BeautifulSoup(body, features='html.parser').getText()
+
+def fast_text(bodies:list) -> None:
+    for body in bodies:
+        html_to_text(body)
+
+def regex_filter(data:str) -> str:
+    ''' Publisher filter before the route table, kept for comparison '''
+    sanook_matcher = re.compile(r'^(http://|https://|https://www\.|http://www\.)sanook\.com/news/[0-9]{7}(/|)$').match
+    if bool(sanook_matcher(data)):
+        return 'sanook'
+    return ''
+
+def regex_route(urls:list) -> None:
+    for url in urls:
+        regex_filter(url)
+
+def table_route(urls:list) -> None:
+    for url in urls:
+        SCRAPERS.match(url)
+
+def regex_validate(n:int) -> None:
+    for _ in range(n):
+        re.compile(r'^(-?(?:[1-9][0-9]*)?[0-9]{4})-(1[0-2]|0[1-9])-(3[01]|0[1-9]|[12][0-9])T(2[0-3]|[01][0-9]):([0-5][0-9]):([0-5][0-9])(\.[0-9]+)?(Z|[+-](?:2[0-3]|[01][0-9]):[0-5][0-9])?$').match('2020-04-10T06:30:00Z')
+
+def iso_validate(n:int) -> None:
+    for _ in range(n):
+        ISO8601_PATTERN.match('2020-04-10T06:30:00Z')
+
+def report(name:str, func, repeat:int) -> float:
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f'{name:<28}{seconds*1000:>10.3f} ms')
+    return seconds
+
+if __name__ == '__main__':
+    payload_dir = sys.argv[1] if len(sys.argv) > 1 else PAYLOAD_DIR
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    bodies = load_bodies(payload_dir) * 50
+    if len(bodies) == 0:
+        sys.exit(f'No payload found in {payload_dir}')
+    urls = [f'https://www.sanook.com/news/{8000000+i}/' for i in range(5000)]
+    print(f'{len(bodies)} bodies, {len(urls)} urls, best of {repeat}')
+    before = report('BeautifulSoup getText', lambda: soup_text(bodies), repeat)
+    after = report('html_to_text', lambda: fast_text(bodies), repeat)
+    print(f'{"speed up":<28}{before/after:>10.2f} x')
+    before = report('regex compile per url', lambda: regex_route(urls), repeat)
+    after = report('route table', lambda: table_route(urls), repeat)
+    print(f'{"speed up":<28}{before/after:>10.2f} x')
+    before = report('publishAt regex per call', lambda: regex_validate(5000), repeat)
+    after = report('publishAt compiled', lambda: iso_validate(5000), repeat)
+    print(f'{"speed up":<28}{before/after:>10.2f} x')
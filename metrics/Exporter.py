@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics.Registry import MetricsRegistry, REGISTRY
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    ''' Request handler that serve metrics in Prometheus text format at /metrics and as json at /metrics.json '''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip('/')
+        if path in ('', '/metrics'):
+            data = self.server.registry.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            data = json.dumps(self.server.registry.snapshot(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class MetricsServer(ThreadingHTTPServer):
+    ''' Lightweight local http endpoint that can be scraped by Prometheus '''
+    daemon_threads = True
+
+    def __init__(self, host:str = '127.0.0.1', port:int = 9464, registry:MetricsRegistry = REGISTRY):
+        """Constructor of MetricsServer class
+
+        Parameters
+        ----------
+        host : str, optional
+            host to bind, by default '127.0.0.1'
+        port : int, optional
+            port to bind, 0 pick a free port, by default 9464
+        registry : MetricsRegistry, optional
+            registry of exported metrics, by default REGISTRY
+        """
+        super().__init__((host, port), MetricsHandler)
+        self.registry = registry
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def start(self) -> 'MetricsServer':
+        """Serve requests in a background thread
+
+        Returns
+        -------
+        MetricsServer
+            return self
+        """
+        self.__thread = threading.Thread(target=self.serve_forever, name='metrics', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+class JsonDumper:
+    ''' Periodically write a json snapshot of metrics into a file '''
+    def __init__(self, path:str, interval:float = 60., registry:MetricsRegistry = REGISTRY):
+        """Constructor of JsonDumper class
+
+        Parameters
+        ----------
+        path : str
+            path of json file, the file is replaced atomically so readers never see a partial snapshot
+        interval : float, optional
+            seconds between snapshots, by default 60.
+        registry : MetricsRegistry, optional
+            registry of dumped metrics, by default REGISTRY
+        """
+        self.__path = path
+        self.__interval = interval
+        self.__registry = registry
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def dump(self) -> None:
+        snapshot = {'timestamp': time.time(), 'metrics': self.__registry.snapshot()}
+        tmp_path = self.__path+'.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.__path)
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(self.__interval):
+            try:
+                self.dump()
+            except Exception as e:
+                print('Failed to dump metrics', e)
+
+    def start(self) -> 'JsonDumper':
+        """Dump metrics in a background thread
+
+        Returns
+        -------
+        JsonDumper
+            return self
+        """
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='metrics-dump', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop background thread after a last dump"""
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        try:
+            self.dump()
+        except Exception as e:
+            print('Failed to dump metrics', e)
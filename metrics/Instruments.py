@@ -0,0 +1,25 @@
+from metrics.Registry import REGISTRY
+
+# news pipeline
+TRACED = REGISTRY.counter('news_traced_total', 'News urls traced by publisher')
+SCRAPED = REGISTRY.counter('news_scraped_total', 'News scraped by publisher')
+POSTED = REGISTRY.counter('news_posted_total', 'Writes sent to New-sREST by model and method')
+SUMMARIZED = REGISTRY.counter('news_summarized_total', 'News summarized by worker processes')
+FAILED = REGISTRY.counter('news_failed_total', 'Failures by stage')
+STAGE_LATENCY = REGISTRY.histogram('news_stage_duration_seconds', 'Duration of pipeline stages, trace and scrape per call, summarize per news, post from queued to sent')
+BACKLOG = REGISTRY.gauge('news_backlog', 'Items waiting by queue')
+
+# http
+HTTP_LATENCY = REGISTRY.histogram('http_request_duration_seconds', 'Latency of http requests by target')
+HTTP_FAILURES = REGISTRY.counter('http_request_failures_total', 'Http requests that failed with connection error, 429 or 5xx status by target')
+CIRCUIT_OPEN = REGISTRY.gauge('scraper_circuit_open', '1 while circuit breaker of scraper target is open')
+PROXY_POOL_SIZE = REGISTRY.gauge('scraper_proxy_pool_size', 'Number of proxies in the latest proxy list of scraper, 0 when requests are sent without proxy')
+
+# response cache
+CACHE_REQUESTS = REGISTRY.counter('api_cache_requests_total', 'Cached get requests by result, hit, miss or revalidated')
+CACHE_HIT_RATIO = REGISTRY.gauge('api_cache_hit_ratio', 'Ratio of cached get requests that were served without asking the server')
+CACHE_HIT_RATIO.set_function(lambda: CACHE_REQUESTS.value(result='hit')/max(1, CACHE_REQUESTS.value(result='hit')+CACHE_REQUESTS.value(result='miss')))
+
+# memory
+RESIDENT_MEMORY = REGISTRY.gauge('process_resident_memory_bytes', 'Resident memory of main process and of the latest summarize worker by process')
+WORKERS_RECYCLED = REGISTRY.counter('summarize_workers_recycled_total', 'Summarize worker pools that were replaced by reason, articles, memory or crash')
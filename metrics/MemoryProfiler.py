@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import tracemalloc
+from typing import List
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+def rss_bytes() -> int:
+    """Resident memory of current process, peak resident memory where current one is not readable
+
+    Returns
+    -------
+    int
+        resident memory in bytes, 0 when it is unknown
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak*1024 # bytes on macOS, kilobytes elsewhere
+    return 0
+
+class MemoryProfiler:
+    ''' Periodic tracemalloc snapshots, every snapshot is compared with the previous one and allocation sites
+    that grew the most are printed, only the previous snapshot is kept '''
+    def __init__(self, interval:float = 600., top:int = 10, frames:int = 1):
+        """Constructor of MemoryProfiler class
+
+        Parameters
+        ----------
+        interval : float, optional
+            seconds between snapshots, by default 600.
+        top : int, optional
+            number of allocation sites that are printed, by default 10
+        frames : int, optional
+            number of stack frames that are stored per allocation, more frames cost more memory and time, by default 1
+        """
+        self.__interval = interval
+        self.__top = max(1, top)
+        self.__frames = max(1, frames)
+        self.__previous = None
+        self.__started_tracing = False
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def __snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')))
+
+    def diff(self) -> List[str]:
+        """Take a snapshot and compare it with the previous snapshot
+
+        Returns
+        -------
+        List[str]
+            the top growing allocation sites, empty on the first snapshot
+        """
+        snapshot = self.__snapshot()
+        previous, self.__previous = self.__previous, snapshot
+        if previous is None:
+            return []
+        key_type = 'traceback' if self.__frames > 1 else 'lineno'
+        stats = [x for x in snapshot.compare_to(previous, key_type) if x.size_diff > 0]
+        return [str(x) for x in stats[:self.__top]]
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(self.__interval):
+            try:
+                growth = self.diff()
+            except Exception as e:
+                print('Failed to take memory snapshot', e)
+                continue
+            if len(growth) != 0:
+                print('Memory growth since the previous snapshot, resident memory {:.1f} MB :'.format(rss_bytes()/1024/1024))
+                for line in growth:
+                    print('  '+line)
+
+    def start(self) -> 'MemoryProfiler':
+        """Start tracemalloc and take snapshots in a background thread
+
+        Returns
+        -------
+        MemoryProfiler
+            return self
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.__frames)
+            self.__started_tracing = True
+        self.__previous = self.__snapshot()
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='memory-profiler', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop background thread and tracemalloc when it was started by this profiler"""
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__previous = None
+        if self.__started_tracing:
+            tracemalloc.stop()
+            self.__started_tracing = False
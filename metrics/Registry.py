@@ -0,0 +1,250 @@
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30., 60., 120.)
+
+def _labels_key(labels:dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+def _format_labels(key:Tuple[Tuple[str, str], ...], extra:Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key+extra
+    if len(pairs) == 0:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, v in pairs)
+    return '{'+','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped))+'}'
+
+def _format_value(value:float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric(ABC):
+    ''' Base class of metrics, each metric keeps one value per set of labels '''
+    TYPE = 'untyped'
+
+    def __init__(self, name:str, help:str = ''):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        """Current samples of metric
+
+        Yields
+        -------
+        Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]
+            sample name, labels and value
+        """
+        pass
+
+class Counter(Metric):
+    ''' Monotonically increasing counter '''
+    TYPE = 'counter'
+
+    def __init__(self, name:str, help:str = ''):
+        super().__init__(name, help)
+        self.__values = {}
+
+    def inc(self, amount:float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError('Counter can only be increased')
+        key = _labels_key(labels)
+        with self._lock:
+            self.__values[key] = self.__values.get(key, 0)+amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self.__values.get(_labels_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self.__values.items())
+        for key, value in values:
+            yield self.name, key, value
+
+class Gauge(Metric):
+    ''' Value that can go up and down, a function can be bound to a gauge so its value is read on every scrape '''
+    TYPE = 'gauge'
+
+    def __init__(self, name:str, help:str = ''):
+        super().__init__(name, help)
+        self.__values = {}
+        self.__functions = {}
+
+    def set(self, value:float, **labels) -> None:
+        with self._lock:
+            self.__values[_labels_key(labels)] = value
+
+    def inc(self, amount:float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self.__values[key] = self.__values.get(key, 0)+amount
+
+    def dec(self, amount:float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function:Callable[[], float], **labels) -> None:
+        """Read value of gauge from a function on every scrape
+
+        Parameters
+        ----------
+        function : Callable[[], float]
+            function that return current value, None remove the function
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            if function is None:
+                self.__functions.pop(key, None)
+            else:
+                self.__functions[key] = function
+
+    def value(self, **labels) -> float:
+        key = _labels_key(labels)
+        with self._lock:
+            function = self.__functions.get(key)
+            value = self.__values.get(key, 0)
+        return function() if function is not None else value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self.__values)
+            functions = list(self.__functions.items())
+        for key, function in functions:
+            try:
+                values[key] = function()
+            except Exception:
+                continue # owner of function has gone, e.g. a closed outbox
+        for key, value in values.items():
+            yield self.name, key, value
+
+class Histogram(Metric):
+    ''' Distribution of observed values in cumulative buckets, e.g. latency in seconds '''
+    TYPE = 'histogram'
+
+    def __init__(self, name:str, help:str = '', buckets:Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.__buckets = tuple(sorted(buckets))
+        self.__values = {}
+
+    def observe(self, value:float, **labels) -> None:
+        key = _labels_key(labels)
+        index = bisect.bisect_left(self.__buckets, value)
+        with self._lock:
+            counts, total = self.__values.get(key, ([0]*(len(self.__buckets)+1), 0.))
+            counts[index] += 1
+            self.__values[key] = (counts, total+value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe seconds spent in a with block, time is observed even when the block raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter()-started, **labels)
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """Count, sum and cumulative bucket counts of given labels
+
+        Returns
+        -------
+        Dict[str, float]
+            dictionary with 'count', 'sum' and 'buckets' that is a dictionary of upper bound and cumulative count
+        """
+        with self._lock:
+            counts, total = self.__values.get(_labels_key(labels), ([0]*(len(self.__buckets)+1), 0.))
+            counts = list(counts)
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.__buckets+(float('inf'),), counts):
+            cumulative += count
+            buckets[_format_value(bound)] = cumulative
+        return {'count': cumulative, 'sum': total, 'buckets': buckets}
+
+    def labels(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(key) for key in self.__values]
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.__values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.__buckets+(float('inf'),), counts):
+                cumulative += count
+                yield self.name+'_bucket', key+(('le', _format_value(bound)),), cumulative
+            yield self.name+'_count', key, cumulative
+            yield self.name+'_sum', key, total
+
+class MetricsRegistry:
+    ''' Thread-safe collection of metrics, metrics are created on their first use and shared by name '''
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, cls:type, name:str, help:str, **kwargs) -> Metric:
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise Exception(f'Metric {name} is already registered as {metric.TYPE}')
+            return metric
+
+    def counter(self, name:str, help:str = '') -> Counter:
+        return self.__get(Counter, name, help)
+
+    def gauge(self, name:str, help:str = '') -> Gauge:
+        return self.__get(Gauge, name, help)
+
+    def histogram(self, name:str, help:str = '', buckets:Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.__get(Histogram, name, help, buckets=buckets)
+
+    @property
+    def metrics(self) -> List[Metric]:
+        with self.__lock:
+            return list(self.__metrics.values())
+
+    def render(self) -> str:
+        """Render every metrics in Prometheus text exposition format
+
+        Returns
+        -------
+        str
+            metrics in text format version 0.0.4
+        """
+        lines = []
+        for metric in sorted(self.metrics, key=lambda x: x.name):
+            if metric.help:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.TYPE}')
+            for name, key, value in metric.samples():
+                extra = ()
+                if len(key) > 0 and key[-1][0] == 'le' and name.endswith('_bucket'):
+                    key, extra = key[:-1], key[-1:]
+                lines.append(f'{name}{_format_labels(key, extra)} {_format_value(value)}')
+        return '\n'.join(lines)+'\n'
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current value of every metrics, histograms are summarized by count, sum and buckets
+
+        Returns
+        -------
+        Dict[str, dict]
+            dictionary of metric name and dictionary with 'type', 'help' and 'values' list of labels and value
+        """
+        snapshot = {}
+        for metric in self.metrics:
+            if isinstance(metric, Histogram):
+                values = [dict(labels=labels, **metric.snapshot(**labels)) for labels in metric.labels()]
+            else:
+                values = [{'labels': dict(key), 'value': value} for _, key, value in metric.samples()]
+            snapshot[metric.name] = {'type': metric.TYPE, 'help': metric.help, 'values': values}
+        return snapshot
+
+REGISTRY = MetricsRegistry()
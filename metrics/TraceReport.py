@@ -0,0 +1,83 @@
+import glob
+import json
+import math
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+def read_traces(path:str) -> Iterator[dict]:
+    """Read traces of a JSONL file and its rotated files, oldest file first
+
+    Parameters
+    ----------
+    path : str
+        JSONL file of Tracer
+
+    Yields
+    -------
+    Iterator[dict]
+        completed traces
+    """
+    backups = [x for x in glob.glob(glob.escape(path)+'.*') if x.rsplit('.', 1)[-1].isdigit()]
+    backups.sort(key=lambda x: int(x.rsplit('.', 1)[-1]), reverse=True) # path.<backup_count> is the oldest
+    for file_path in backups+glob.glob(glob.escape(path)):
+        with open(file_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue # line was cut by a crash
+
+def percentile(values:List[float], q:float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if len(values) == 0:
+        return float('nan')
+    return values[min(len(values)-1, max(0, math.ceil(q/100*len(values))-1))]
+
+def stage_percentiles(traces:Iterable[dict], percentiles:Tuple[float, ...] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+    """Latency percentiles of each stage and of whole traces
+
+    Parameters
+    ----------
+    traces : Iterable[dict]
+        completed traces
+    percentiles : Tuple[float, ...], optional
+        percentiles to report, by default (50, 90, 99)
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]]
+        dictionary of stage name, or 'total', and dictionary of 'count', 'p<q>' and 'max' in seconds
+    """
+    durations = {}
+    for trace in traces:
+        for stage in trace.get('stages', []):
+            durations.setdefault(stage['stage'], []).append(stage['duration'])
+        durations.setdefault('total', []).append(trace.get('duration', 0.))
+    report = {}
+    for stage, values in durations.items():
+        values.sort()
+        report[stage] = {'count': len(values)}
+        for q in percentiles:
+            report[stage]['p{:g}'.format(q)] = percentile(values, q)
+        report[stage]['max'] = values[-1]
+    return report
+
+def format_report(report:Dict[str, Dict[str, float]]) -> str:
+    if len(report) == 0:
+        return 'No traces'
+    columns = list(next(iter(report.values())))
+    lines = ['{:<20}'.format('stage')+''.join('{:>12}'.format(x) for x in columns)]
+    for stage, row in sorted(report.items(), key=lambda x: (x[0] == 'total', x[0])):
+        lines.append('{:<20}'.format(stage)+''.join('{:>12}'.format(row[x]) if x == 'count' else '{:>12.3f}'.format(row[x]) for x in columns))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Per-stage latency percentiles of article traces')
+    parser.add_argument('path', help='JSONL file of traces, rotated files are read too')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[50, 90, 99])
+    parser.add_argument('--status', choices=['ok', 'error'], help='only traces of given status')
+    args = parser.parse_args()
+    traces = (x for x in read_traces(args.path) if args.status is None or x.get('status') == args.status)
+    print(format_report(stage_percentiles(traces, tuple(args.percentiles))))
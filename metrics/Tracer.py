@@ -0,0 +1,175 @@
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+class Tracer:
+    ''' Per-article lifecycle tracer, every stage of an article is recorded from the end of its previous stage
+    so waiting in queues is counted into the stage that it was waiting for '''
+    def __init__(
+        self,
+        path:str = None,
+        slow_threshold:float = 300.,
+        sample_rate:float = .1,
+        max_bytes:int = 10*1024*1024,
+        backup_count:int = 5,
+        max_open:int = 10000
+        ):
+        """Constructor of Tracer class
+
+        Parameters
+        ----------
+        path : str, optional
+            JSONL file of completed traces, the file is rotated to path.1 ... path.<backup_count>,
+            by default None tracing is disabled
+        slow_threshold : float, optional
+            seconds from trace to the last stage, slower or failed traces are always written, by default 300.
+        sample_rate : float, optional
+            ratio of other traces that are written, by default .1
+        max_bytes : int, optional
+            size of JSONL file that trigger a rotation, by default 10*1024*1024
+        backup_count : int, optional
+            number of rotated files that are kept, by default 5
+        max_open : int, optional
+            max number of unfinished traces, the oldest trace is dropped when a new trace exceed it, by default 10000
+        """
+        self.__slow_threshold = slow_threshold
+        self.__sample_rate = sample_rate
+        self.__max_open = max(1, max_open)
+        self.__traces = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__logger = None
+        if path is not None:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.__logger = logging.getLogger('{}.{}'.format(__name__, id(self)))
+            self.__logger.propagate = False
+            self.__logger.setLevel(logging.INFO)
+            self.__logger.addHandler(handler)
+
+    @property
+    def enabled(self) -> bool:
+        return self.__logger is not None
+
+    @property
+    def max_open(self) -> int:
+        return self.__max_open
+
+    def __len__(self) -> int:
+        return len(self.__traces)
+
+    def begin(self, key:str, at:float = None) -> Optional[str]:
+        """Start a trace of an article, an article that is traced already keep its trace
+
+        Parameters
+        ----------
+        key : str
+            article key e.g. source url
+        at : float, optional
+            epoch timestamp of trace start, by default now
+
+        Returns
+        -------
+        Optional[str]
+            trace id, None when tracing is disabled
+        """
+        if not self.enabled:
+            return None
+        with self.__lock:
+            trace = self.__traces.get(key)
+            if trace is None:
+                started_at = at if at is not None else time.time()
+                trace = self.__traces[key] = {
+                    'trace_id': uuid.uuid4().hex[:16],
+                    'key': key,
+                    'started_at': started_at,
+                    'last_at': started_at,
+                    'stages': []
+                }
+                while len(self.__traces) > self.__max_open:
+                    self.__traces.popitem(last=False)
+            return trace['trace_id']
+
+    def trace_id(self, key:str) -> Optional[str]:
+        with self.__lock:
+            trace = self.__traces.get(key)
+            return trace['trace_id'] if trace is not None else None
+
+    def mark(self, key:str, stage:str, at:float = None) -> None:
+        """Record a stage that end now, untraced article is ignored
+
+        Parameters
+        ----------
+        key : str
+            article key
+        stage : str
+            stage name e.g. 'scrape'
+        at : float, optional
+            epoch timestamp of stage end, by default now
+        """
+        if not self.enabled:
+            return
+        ended_at = at if at is not None else time.time()
+        with self.__lock:
+            trace = self.__traces.get(key)
+            if trace is None:
+                return
+            trace['stages'].append({
+                'stage': stage,
+                'start': trace['last_at'],
+                'end': ended_at,
+                'duration': max(0., ended_at-trace['last_at'])
+            })
+            trace['last_at'] = max(trace['last_at'], ended_at)
+
+    def discard(self, key:str) -> None:
+        """Drop a trace without writing it e.g. an article that has been posted before"""
+        with self.__lock:
+            self.__traces.pop(key, None)
+
+    def finish(self, key:str, stage:str = None, error:str = None) -> Optional[dict]:
+        """Complete a trace and write it when it is slow, failed or sampled
+
+        Parameters
+        ----------
+        key : str
+            article key
+        stage : str, optional
+            name of the last stage that end now, by default None
+        error : str, optional
+            error that end the trace, by default None
+
+        Returns
+        -------
+        Optional[dict]
+            completed trace, None when article is not traced
+        """
+        if not self.enabled:
+            return None
+        if stage is not None:
+            self.mark(key, stage)
+        with self.__lock:
+            trace = self.__traces.pop(key, None)
+        if trace is None:
+            return None
+        last_at = trace.pop('last_at')
+        trace['duration'] = last_at-trace['started_at']
+        trace['status'] = 'error' if error is not None else 'ok'
+        if error is not None:
+            trace['error'] = str(error)[:500]
+        logger = self.__logger
+        if logger is not None and (error is not None or trace['duration'] >= self.__slow_threshold or random.random() < self.__sample_rate):
+            logger.info(json.dumps(trace, ensure_ascii=False))
+        return trace
+
+    def close(self) -> None:
+        if self.__logger is not None:
+            for handler in list(self.__logger.handlers):
+                handler.close()
+                self.__logger.removeHandler(handler)
+            self.__logger = None
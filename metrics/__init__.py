@@ -0,0 +1,4 @@
+from metrics.Registry import Counter, Gauge, Histogram, MetricsRegistry, REGISTRY
+from metrics.Exporter import MetricsServer, JsonDumper
+from metrics.Tracer import Tracer
+from metrics.MemoryProfiler import MemoryProfiler, rss_bytes
@@ -0,0 +1,447 @@
+import os
+import json
+import time
+import random
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+import requests
+from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from apiConnector.ChangeFeed import ChangeFeed
+from newsScraper.scraper.Transport import TokenBucket
+from news.SummarizePool import SummarizePool, default_workers
+from news.RetryScheduler import RetryScheduler, RetryScheduleFull
+
+SERVER_KEYS = ('_id', '__v', 'insertDt', 'summarizeStatus')
+
+def _timestamp(value:str) -> Optional[float]:
+    """Epoch timestamp of an ISO 8601 insertDt, None when it is not a timestamp"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class Backfill:
+    ''' Resumable re-summarization of archived raw news in an insertDt range, raw news are read page by page
+    and summarized by worker processes, progress is checkpointed after writes of every chunk are queued in outbox,
+    a summarized news that exists already is replaced so news are not duplicated when they are summarized again,
+    a news that could not be summarized is retried before its page is committed '''
+    def __init__(
+        self,
+        checkpoint_path:str,
+        since:str,
+        until:str = None,
+        summarize_status:str = 'true',
+        summarize_algorithm:str = 'text_rank',
+        compression_rate:float = .6,
+        workers:int = 0,
+        chunk_size:int = 4,
+        page_size:int = 200,
+        rate:float = 10.,
+        outbox_path:str = None,
+        post_batch_size:int = 50,
+        max_backlog:int = 1000,
+        report_interval:float = 10.,
+        fetch_attempts:int = 5,
+        summarize_max_attempts:int = 3,
+        summarize_retry_base:float = 1.,
+        summarize_retry_max:float = 30.,
+        api_session:requests.Session = None,
+        api_url:str = ''
+        ) -> None:
+        """Constructor of Backfill class
+
+        Parameters
+        ----------
+        checkpoint_path : str
+            Json file of backfill progress, a backfill with the same range and summarize settings resume from it
+        since : str
+            insertDt of the oldest raw news to summarize, inclusive e.g. '2020-01-01'
+        until : str, optional
+            insertDt of the latest raw news to summarize, inclusive e.g. '2020-06-30T23:59:59.999Z',
+            by default None now at the first run
+        summarize_status : str, optional
+            summarizeStatus of raw news to summarize, 'true' re-summarize news that the live system has summarized,
+            'false' summarize news that it has not, None both, by default 'true'
+        summarize_algorithm : str, optional
+            summarize algorithm name that can select between 'text_rank' and 'sentence_rank', by default 'text_rank'
+        compression_rate : float, optional
+            original news compression rate, by default .6
+        workers : int, optional
+            number of summarize worker processes, 0 summarize in calling thread, by default 0
+        chunk_size : int, optional
+            max number of news that are sent to a worker process at a time, by default 4
+        page_size : int, optional
+            number of raw news that are read in each request, by default 200
+        rate : float, optional
+            max number of news summarized per second so the live system keep its share of api and cpu,
+            0 disable the cap, by default 10.
+        outbox_path : str, optional
+            SQLite file of queued writes, by default checkpoint_path with '.outbox.sqlite3' suffix
+        post_batch_size : int, optional
+            max number of writes that are sent in one bulk request, by default 50
+        max_backlog : int, optional
+            max number of queued writes, reading is paused while outbox is larger, by default 1000
+        report_interval : float, optional
+            seconds between progress reports, by default 10.
+        fetch_attempts : int, optional
+            max number of attempts to read a page, attempts are spaced by exponential backoff, by default 5
+        summarize_max_attempts : int, optional
+            number of failed summarize attempts that a news is moved to dead letter queue of outbox after, by default 3
+        summarize_retry_base : float, optional
+            base delay in seconds before a failed news is summarized again, the delay is doubled on every failure, by default 1.
+        summarize_retry_max : float, optional
+            max delay in seconds before a failed news is summarized again, by default 30.
+        api_session : requests.Session, optional
+            session used to call New-sREST api, by default None
+        api_url : str, optional
+            base url of New-sREST api, by default APIUrl in config
+        """
+        self.__checkpoint_path = checkpoint_path
+        self.__page_size = max(1, page_size)
+        self.__max_backlog = max(1, max_backlog)
+        self.__report_interval = report_interval
+        self.__fetch_attempts = max(1, fetch_attempts)
+        self.__api_session = api_session
+        self.__api_url = api_url
+        self.__state = {
+            'since': since,
+            'until': until if until is not None else datetime.utcnow().isoformat(timespec='milliseconds')+'Z',
+            'summarize_status': summarize_status,
+            'summarize_algorithm': summarize_algorithm,
+            'compression_rate': compression_rate,
+            'cursor': None,
+            'cursor_ids': [],
+            'page_ids': [],
+            'summarized': 0,
+            'failed': 0,
+            'finished': False
+        }
+        self.__load(until is None)
+        self.__summarize_pool = SummarizePool(workers, compression_rate, summarize_algorithm, chunk_size)
+        self.__retries = RetryScheduler(summarize_max_attempts, summarize_retry_base, summarize_retry_max, max_items=self.__page_size)
+        self.__bucket = TokenBucket(rate, max(1, chunk_size)) if rate > 0 else None
+        self.__outbox = Outbox(
+            outbox_path if outbox_path is not None else checkpoint_path+'.outbox.sqlite3',
+            connector_factory=lambda: ApiConnector(session=self.__api_session, api_url=self.__api_url),
+            batch_size=post_batch_size)
+        self.__started = None
+        self.__done_at_start = 0
+        self.__covered_at_start = 0.
+        self.__reported_at = 0.
+
+    @property
+    def progress(self) -> dict:
+        """Backfill progress that is written into checkpoint file
+
+        Returns
+        -------
+        dict
+            range, cursor, number of summarized and failed news and whether the range is finished
+        """
+        return dict(self.__state)
+
+    def __load(self, default_until:bool) -> None:
+        """Resume progress of checkpoint file, raise an error when it belongs to a different backfill"""
+        if not os.path.exists(self.__checkpoint_path):
+            return
+        with open(self.__checkpoint_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if default_until:
+            self.__state['until'] = state.get('until')
+        for key in ('since', 'until', 'summarize_status', 'summarize_algorithm', 'compression_rate'):
+            if state.get(key) != self.__state[key]:
+                raise Exception('Checkpoint {} belongs to a backfill with different {} {!r}, remove it to start over'.format(
+                    self.__checkpoint_path, key, state.get(key)))
+        self.__state.update(state)
+
+    def __save(self) -> None:
+        temp_path = self.__checkpoint_path+'.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.__state, f, ensure_ascii=False)
+        os.replace(temp_path, self.__checkpoint_path)
+
+    def __feed(self) -> ChangeFeed:
+        connector = ApiConnector(session=self.__api_session, api_url=self.__api_url).setModel('raw')
+        params = {'to': self.__state['until']}
+        if self.__state['summarize_status'] is not None:
+            params['summarizeStatus'] = self.__state['summarize_status']
+        cursor = self.__state['cursor']
+        return ChangeFeed(
+            connector,
+            params,
+            limit=self.__page_size,
+            since=cursor if cursor is not None else self.__state['since'],
+            since_ids=self.__state['cursor_ids'])
+
+    def __fetch(self, feed:ChangeFeed, connector:ApiConnector, run_event:threading.Event) -> Tuple[List[dict], Dict[str, str]]:
+        """Read next page in prefetch thread, a failed read is retried with exponential backoff
+
+        Returns
+        -------
+        Tuple[List[dict], Dict[str, str]]
+            page of raw news and dictionary of sourceUrl and id of summarized news that exist already
+        """
+        for attempt in range(self.__fetch_attempts):
+            try:
+                page = feed.poll()
+                return page, self.__existing(connector, page)
+            except Exception as e:
+                if attempt+1 == self.__fetch_attempts or not run_event.is_set():
+                    raise
+                delay = min(60., 2.**attempt)*random.uniform(.5, 1)
+                print('Failed to read raw news, read again in {:.1f}s :'.format(delay), e)
+                time.sleep(delay)
+
+    @staticmethod
+    def __existing(connector:ApiConnector, page:List[dict]) -> Dict[str, str]:
+        """Find summarized news of a page by sourceUrl, they are replaced instead of posted again, api only filter
+        one sourceUrl at a time so lookups of a page are sent together"""
+        existing = {}
+        source_urls = sorted({x['sourceUrl'] for x in page if x.get('sourceUrl')})
+        results = connector.get_many([{'sourceUrl': source_url, 'limit': 1} for source_url in source_urls])
+        for source_url, (status_code, found) in zip(source_urls, results):
+            if not status_code in connector.PASS_STATUS or not isinstance(found, list):
+                raise Exception('Bad status code {}'.format(status_code))
+            if len(found) != 0:
+                existing[source_url] = found[0]['_id']
+        return existing
+
+    def __summarize_failed(self, id:str, news:dict, error:str) -> None:
+        """Schedule a news that could not be summarized to be summarized again, a news that has run out of attempts
+        or can not be scheduled is moved to dead letter queue with its number of attempts"""
+        try:
+            if self.__retries.failed(id, news):
+                print('Some error occur while summarizing news {}, it will be retried'.format(id), error)
+                return
+            attempts = self.__retries.max_attempts
+        except RetryScheduleFull as full:
+            attempts = full.attempts
+            error = '{} ({})'.format(error, full)
+        print('Summarizing news {} failed {} times, it is moved to dead letter queue'.format(id, attempts), error)
+        self.__state['page_ids'].append(id)
+        self.__state['failed'] += 1
+        self.__outbox.bury('summarize', 'raw', None, id, news, attempts, error)
+
+    def __summarize_page(self, page:List[dict], existing:Dict[str, str]) -> None:
+        """Summarize a page in worker processes at the capped rate and queue its writes, failed news are summarized
+        again when their retry is due, progress is checkpointed after every chunk so news of a page that is read again
+        after a crash are skipped"""
+        chunk_size = self.__summarize_pool.chunk_size
+        done = set(self.__state['page_ids'])
+        page = [x for x in page if not x['_id'] in done]
+        raw_news = {x['_id']: x for x in page}
+        futures = {}
+        pending = page
+        while True:
+            for start in range(0, len(pending), chunk_size):
+                chunk = [(x['_id'], x['content']) for x in pending[start:start+chunk_size]]
+                if self.__bucket is not None:
+                    for _ in chunk:
+                        self.__bucket.acquire()
+                futures[self.__summarize_pool.submit(chunk)] = chunk
+            if len(futures) == 0 and len(self.__retries) == 0:
+                break
+            finished = set()
+            if len(futures) != 0:
+                finished, _ = wait(list(futures), timeout=.5, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(.5) # only retries are left, wait until one is due
+            for future in finished:
+                chunk = futures.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e: # worker process died, every news of the chunk is failed
+                    results = [(id, None, repr(e)) for id, _ in chunk]
+                for id, content, error in results:
+                    if error is not None:
+                        self.__summarize_failed(id, raw_news[id], error)
+                        continue
+                    self.__retries.succeeded(id)
+                    self.__publish(raw_news[id], content, existing)
+                self.__save()
+            pending = [news for _, news in self.__retries.due()]
+
+    def __publish(self, news:dict, content:str, existing:Dict[str, str]) -> None:
+        """Queue writes of a summarized news and record it as done in page progress"""
+        self.__state['page_ids'].append(news['_id'])
+        summarized = {key: value for key, value in news.items() if not key in SERVER_KEYS}
+        summarized['content'] = content
+        if news.get('sourceUrl') in existing:
+            self.__outbox.put('summarized', existing[news['sourceUrl']], summarized)
+        else:
+            self.__outbox.post('summarized', summarized)
+        if news.get('summarizeStatus') in (False, 'false'):
+            self.__outbox.put('raw', news['_id'], {'summarizeStatus': 'true'})
+        self.__state['summarized'] += 1
+
+    def __wait_backlog(self, run_event:threading.Event) -> None:
+        while run_event.is_set() and len(self.__outbox) > self.__max_backlog:
+            time.sleep(.5)
+
+    def report(self, force:bool = False) -> None:
+        """Print number of processed news, throughput since start and ETA from covered part of the range
+
+        Parameters
+        ----------
+        force : bool, optional
+            print even if report interval has not passed, by default False
+        """
+        now = time.monotonic()
+        if self.__started is None or (not force and now-self.__reported_at < self.__report_interval):
+            return
+        self.__reported_at = now
+        elapsed = max(1e-9, now-self.__started)
+        done = self.__state['summarized']+self.__state['failed']
+        throughput = (done-self.__done_at_start)/elapsed
+        since, until = _timestamp(self.__state['since']), _timestamp(self.__state['until'])
+        cursor = _timestamp(self.__state['cursor'] or self.__state['since'])
+        covered = None
+        if self.__state['finished']:
+            covered = 1.
+        elif None not in (since, until, cursor) and until > since:
+            covered = min(1., max(0., (cursor-since)/(until-since)))
+        eta = 'unknown'
+        if covered == 1.:
+            eta = 'done'
+        elif covered is not None and throughput > 0 and done > self.__done_at_start:
+            # news are assumed to be spread evenly over the range that has not been read
+            remaining = (done-self.__done_at_start)*(1-covered)/max(1e-9, covered-self.__covered_at_start)
+            eta = '{:.0f}s'.format(remaining/throughput)
+        print('Backfill {} summarized, {} failed, {:.1f} news/s, {} of range, ETA {}'.format(
+            self.__state['summarized'],
+            self.__state['failed'],
+            throughput,
+            '{:.1%}'.format(covered) if covered is not None else 'unknown',
+            eta))
+
+    def run(self, run_event:threading.Event = None) -> dict:
+        """Summarize raw news of the range until it is finished or run_event is cleared, the current page is
+        always completed and checkpointed before returning so a resumed backfill neither skip nor repeat news
+
+        Parameters
+        ----------
+        run_event : threading.Event, optional
+            backfill stop after the current page when this event is cleared, by default None run until finished
+
+        Returns
+        -------
+        dict
+            backfill progress
+        """
+        if run_event is None:
+            run_event = threading.Event()
+            run_event.set()
+        if self.__state['finished']:
+            print('Backfill from {since} to {until} has been finished'.format(**self.__state))
+            return self.progress
+        self.__started = time.monotonic()
+        self.__done_at_start = self.__state['summarized']+self.__state['failed']
+        since, cursor = _timestamp(self.__state['since']), _timestamp(self.__state['cursor'] or self.__state['since'])
+        until = _timestamp(self.__state['until'])
+        self.__covered_at_start = (cursor-since)/(until-since) if None not in (since, until, cursor) and until > since else 0.
+        self.__summarize_pool.start()
+        self.__outbox.start()
+        feed = self.__feed()
+        summarized_connector = ApiConnector(session=self.__api_session, api_url=self.__api_url).setModel('summarized')
+        # next page is read while the current page is summarized
+        fetcher = ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = fetcher.submit(self.__fetch, feed, summarized_connector, run_event)
+            while run_event.is_set():
+                page, existing = next_page.result()
+                if len(page) == 0:
+                    self.__state['finished'] = True
+                    self.__save()
+                    break
+                next_page = fetcher.submit(self.__fetch, feed, summarized_connector, run_event)
+                self.__summarize_page(page, existing)
+                # cursor of the feed moves past a page once it is committed
+                feed.commit(page)
+                self.__state['cursor'] = feed.cursor
+                self.__state['cursor_ids'] = feed.cursor_ids
+                self.__state['page_ids'] = []
+                self.__save()
+                self.report()
+                self.__wait_backlog(run_event)
+        finally:
+            fetcher.shutdown(wait=True)
+            self.__summarize_pool.close()
+            self.__outbox.stop()
+            self.report(force=True)
+        return self.progress
+
+    def close(self) -> None:
+        self.__summarize_pool.close()
+        self.__outbox.close()
+
+def main(argv:list = None) -> dict:
+    """Re-summarize archived raw news e.g. `python -m news.Backfill --since 2020-01-01 --checkpoint configs/backfill.json`,
+    the command resume from its checkpoint when it is run again after an interruption
+
+    Parameters
+    ----------
+    argv : list, optional
+        command line arguments, by default None sys.argv
+
+    Returns
+    -------
+    dict
+        backfill progress
+    """
+    parser = argparse.ArgumentParser(description='Resumable re-summarization of archived New-s raw news')
+    parser.add_argument('--since', required=True, help='insertDt of the oldest raw news, inclusive')
+    parser.add_argument('--until', help='insertDt of the latest raw news, inclusive, now by default')
+    parser.add_argument('--checkpoint', required=True, help='Json file of backfill progress')
+    parser.add_argument('--status', choices=['true', 'false', 'all'], default='true', help='summarizeStatus of raw news to summarize')
+    parser.add_argument('--algorithm', choices=['text_rank', 'sentence_rank'], default='text_rank')
+    parser.add_argument('--compression-rate', type=float, default=.6)
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--chunk-size', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=10., help='max news summarized per second, 0 is unlimited')
+    parser.add_argument('--outbox', help='SQLite file of queued writes')
+    parser.add_argument('--batch-size', type=int, default=50, help='max writes in one bulk request')
+    parser.add_argument('--report-interval', type=float, default=10.)
+    parser.add_argument('--fetch-attempts', type=int, default=5, help='max attempts to read a page of raw news')
+    parser.add_argument('--summarize-attempts', type=int, default=3, help='max attempts to summarize a news before it is dead lettered')
+    parser.add_argument('--api-url', default='', help='base url of New-sREST api')
+    args = parser.parse_args(argv)
+    backfill = Backfill(
+        args.checkpoint,
+        args.since,
+        args.until,
+        summarize_status=args.status if args.status != 'all' else None,
+        summarize_algorithm=args.algorithm,
+        compression_rate=args.compression_rate,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        page_size=args.page_size,
+        rate=args.rate,
+        outbox_path=args.outbox,
+        post_batch_size=args.batch_size,
+        report_interval=args.report_interval,
+        fetch_attempts=args.fetch_attempts,
+        summarize_max_attempts=args.summarize_attempts,
+        api_url=args.api_url)
+    run_event = threading.Event()
+    run_event.set()
+    def stop(signum, frame):
+        print('Backfill stop after the current page')
+        run_event.clear()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        return backfill.run(run_event)
+    finally:
+        backfill.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from typing import Dict, Iterable, List
+
+class LeaseStore:
+    ''' Leases of raw news that are being summarized, shared through a SQLite file by News processes on the same host
+    so a raw news is summarized by one process at a time, a lease of a process that died is reclaimed when it expires '''
+    def __init__(self, db_path:str, owner:str = None, ttl:float = 300., retention:float = 24*3600):
+        """Constructor of LeaseStore class
+
+        Parameters
+        ----------
+        db_path : str
+            path of SQLite database file that is shared by every process, ':memory:' coordinate threads of this process only
+        owner : str, optional
+            unique name of this process, by default host name, process id and a random suffix
+        ttl : float, optional
+            seconds that a lease is held without renewal before other processes can claim it, by default 300.
+        retention : float, optional
+            seconds to keep a completed lease so other processes do not claim news whose summarizeStatus
+            update is still queued, by default 1 day
+        """
+        self.__owner = owner or '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.__ttl = ttl
+        self.__retention = max(ttl, retention)
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS lease ('
+            'id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL, completed_at REAL) WITHOUT ROWID')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS lease_owner_index ON lease (owner)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS lease_expires_at_index ON lease (expires_at)')
+
+    @property
+    def owner(self) -> str:
+        return self.__owner
+
+    def __write(self, query:str, rows:List[tuple]) -> int:
+        """Run a write query for every row in one immediate transaction, transactions of all processes are serialized
+
+        Returns
+        -------
+        int
+            number of changed rows
+        """
+        changed = 0
+        with self.__lock:
+            with self.__connection:
+                self.__connection.execute('BEGIN IMMEDIATE')
+                for row in rows:
+                    changed += self.__connection.execute(query, row).rowcount
+        return changed
+
+    def claim(self, ids:Iterable[str]) -> List[str]:
+        """Lease news that are not leased, a lease that this process hold already is neither claimed again nor renewed,
+        see renew
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            raw news ids
+
+        Returns
+        -------
+        List[str]
+            ids that are newly leased by this process in given order
+        """
+        ids = list(ids)
+        if len(ids) == 0:
+            return []
+        now = time.time()
+        claimed = []
+        with self.__lock:
+            with self.__connection:
+                self.__connection.execute('BEGIN IMMEDIATE')
+                for id in ids:
+                    changed = self.__connection.execute(
+                        'INSERT INTO lease (id, owner, expires_at) VALUES (?, ?, ?) '
+                        'ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                        'WHERE lease.completed_at IS NULL AND lease.expires_at < ?',
+                        (id, self.__owner, now+self.__ttl, now)).rowcount
+                    if changed > 0:
+                        claimed.append(id)
+        return claimed
+
+    def renew(self, ids:Iterable[str]) -> int:
+        """Extend unfinished leases of this process by ttl, only news that are still being summarized should be renewed
+        so leases of news that this process has given up expire
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            raw news ids
+
+        Returns
+        -------
+        int
+            number of renewed leases
+        """
+        expires_at = time.time()+self.__ttl
+        return self.__write(
+            'UPDATE lease SET expires_at = ? WHERE id = ? AND owner = ? AND completed_at IS NULL',
+            [(expires_at, id, self.__owner) for id in ids])
+
+    def complete(self, ids:Iterable[str]) -> int:
+        """Mark leased news as summarized, they are not claimed again until retention period has passed
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            raw news ids
+
+        Returns
+        -------
+        int
+            number of completed leases
+        """
+        now = time.time()
+        return self.__write(
+            'UPDATE lease SET completed_at = ?, expires_at = ? WHERE id = ? AND owner = ?',
+            [(now, now+self.__retention, id, self.__owner) for id in ids])
+
+    def release(self, ids:Iterable[str] = None) -> int:
+        """Drop unfinished leases of this process so other processes can claim them at once
+
+        Parameters
+        ----------
+        ids : Iterable[str], optional
+            raw news ids, by default None every unfinished lease of this process
+
+        Returns
+        -------
+        int
+            number of released leases
+        """
+        if ids is None:
+            return self.__write('DELETE FROM lease WHERE owner = ? AND completed_at IS NULL', [(self.__owner,)])
+        return self.__write(
+            'DELETE FROM lease WHERE id = ? AND owner = ? AND completed_at IS NULL',
+            [(id, self.__owner) for id in ids])
+
+    def states(self, ids:Iterable[str]) -> Dict[str, str]:
+        """Get lease state of news
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            raw news ids
+
+        Returns
+        -------
+        Dict[str, str]
+            dictionary of id and state, 'free' when the news can be claimed, 'leased' while a process hold its lease
+            or 'completed' when it has been summarized
+        """
+        ids = list(ids)
+        states = {id: 'free' for id in ids}
+        now = time.time()
+        with self.__lock:
+            for start in range(0, len(ids), 500): # stay under SQLite limit of query parameters
+                batch = ids[start:start+500]
+                rows = self.__connection.execute(
+                    'SELECT id, expires_at, completed_at FROM lease WHERE id IN ({})'.format(','.join('?'*len(batch))), batch)
+                for id, expires_at, completed_at in rows:
+                    if completed_at is not None:
+                        states[id] = 'completed'
+                    elif expires_at >= now:
+                        states[id] = 'leased'
+        return states
+
+    def compact(self) -> int:
+        """Remove expired leases and completed leases that older than retention period
+
+        Returns
+        -------
+        int
+            number of removed leases
+        """
+        return self.__write('DELETE FROM lease WHERE expires_at < ?', [(time.time(),)])
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
@@ -1,10 +1,26 @@
 import threading
 import asyncio
 import time
-from typing import List, Tuple, Union, Dict
+import queue
+import signal
+import sys
+from functools import partial
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
+import requests
+from typing import Callable, List, Tuple, Union, Dict
 from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from apiConnector.ChangeFeed import ChangeFeed
 from newsScraper.NewsScraper import NewsScraper
-from summarization.Summarization import summarize
+from news.SeenStore import SeenStore
+from news.SummarizePool import SummarizePool
+from news.RetryScheduler import RetryScheduler, RetryScheduleFull
+from news.LeaseStore import LeaseStore
+from metrics.Exporter import MetricsServer, JsonDumper
+from metrics.Instruments import BACKLOG, FAILED, RESIDENT_MEMORY
+from metrics.MemoryProfiler import MemoryProfiler, rss_bytes
+from metrics.Tracer import Tracer
 
 class News:
     ''' Main package that used to run automatic news summarization from online news source '''
@@ -14,7 +30,38 @@ class News:
         trace_limit:int = 12, 
         summarize_algorithm:str = 'text_rank',
         compression_rate:float = .6,
-        checkpoints:dict = {}
+        checkpoints:dict = {},
+        scrape_session:requests.Session = None,
+        api_session:requests.Session = None,
+        api_url:str = '',
+        seen_store_path:str = ':memory:',
+        seen_retention:float = 30*24*3600,
+        post_batch_size:int = 10,
+        outbox_path:str = ':memory:',
+        long_poll:float = 0,
+        prefetch_batches:int = 2,
+        pipeline:bool = False,
+        pipeline_queue_size:int = 32,
+        summarize_workers:int = 0,
+        summarize_chunk_size:int = 4,
+        metrics_port:int = None,
+        metrics_path:str = None,
+        metrics_interval:float = 60.,
+        trace_path:str = None,
+        trace_slow_threshold:float = 300.,
+        trace_sample_rate:float = .1,
+        summarize_max_attempts:int = 3,
+        summarize_retry_base:float = 30.,
+        summarize_retry_max:float = 900.,
+        outbox_max_attempts:int = 10,
+        summarize_recycle_after:int = 0,
+        summarize_recycle_memory:float = 0,
+        memory_profile_interval:float = None,
+        memory_profile_top:int = 10,
+        lease_path:str = None,
+        lease_ttl:float = 300.,
+        lease_max_deferred:int = 10000,
+        scrape:bool = True
         ) -> None:
         """A News class contructor
 
@@ -29,16 +76,134 @@ class News:
         compression_rate : float, optional
             Original News compression rate, by default .6
         checkpoints : dict, optional
-            A dictionary contain publisher name as a key and list of news ids as a value, by default {}
+            A dictionary contain publisher name as a key and list of news ids as a value, 
+            the news ids are imported into seen news index, by default {}
+        scrape_session : requests.Session, optional
+            Session used by news scrapers e.g. replay.ReplaySession to run without network, by default None
+        api_session : requests.Session, optional
+            Session used to call New-sREST api e.g. replay.RecordingSession to record api calls, by default None
+        api_url : str, optional
+            Base url of New-sREST api e.g. url of replay.StandInServer, by default APIUrl in config
+        seen_store_path : str, optional
+            SQLite file of posted news index, every posted news is committed so a restart does not post it again, by default ':memory:'
+        seen_retention : float, optional
+            Seconds to remember a posted news, by default 30 days
+        post_batch_size : int, optional
+            Max number of writes that are sent to New-sREST api in one bulk request, by default 10
+        outbox_path : str, optional
+            SQLite file of queued New-sREST writes, queued writes survive an outage or a restart and are sent
+            in background, by default ':memory:'
+        long_poll : float, optional
+            Seconds that New-sREST api may hold a request for new raw news, 0 poll with idle backoff instead, by default 0
+        prefetch_batches : int, optional
+            Max number of raw news batches that are fetched ahead of summarization, by default 2
+        pipeline : bool, optional
+            Hand scraped news to summarization in process instead of polling raw news from New-sREST api,
+            raw news are archived to New-sREST as already summarized, by default False
+        pipeline_queue_size : int, optional
+            Max number of news waiting between pipeline stages, a full queue slow down the previous stage, by default 32
+        summarize_workers : int, optional
+            Number of summarize worker processes, 0 summarize in summarize worker thread, by default 0
+        summarize_chunk_size : int, optional
+            Max number of news that are sent to a summarize worker process at a time, by default 4
+        metrics_port : int, optional
+            Local port that serve metrics in Prometheus text format at /metrics, 0 pick a free port,
+            by default None no metrics endpoint
+        metrics_path : str, optional
+            Json file that a metrics snapshot is written into every metrics_interval, by default None no snapshot
+        metrics_interval : float, optional
+            Seconds between metrics snapshots, by default 60.
+        trace_path : str, optional
+            Rotating JSONL file of article lifecycle traces, analyze it with `python -m metrics.TraceReport <trace_path>`,
+            by default None no tracing
+        trace_slow_threshold : float, optional
+            Seconds from trace to the last write of an article, slower or failed traces are always written, by default 300.
+        trace_sample_rate : float, optional
+            Ratio of other traces that are written, by default .1
+        summarize_max_attempts : int, optional
+            Number of failed summarize attempts that a news is moved to dead letter queue of outbox after,
+            inspect and replay it with `python -m apiConnector.DeadLetters <outbox_path>`, by default 3
+        summarize_retry_base : float, optional
+            Base delay in seconds before a failed news is summarized again, the delay is doubled on every failure, by default 30.
+        summarize_retry_max : float, optional
+            Max delay in seconds before a failed news is summarized again, by default 900.
+        outbox_max_attempts : int, optional
+            Number of attempts that a write rejected by New-sREST api is moved to dead letter queue after, by default 10
+        summarize_recycle_after : int, optional
+            Number of news that summarize worker processes summarize before they are replaced by fresh processes,
+            0 never replace them, by default 0
+        summarize_recycle_memory : float, optional
+            Resident memory in MB of a summarize worker process that worker processes are replaced after,
+            0 never replace them, by default 0
+        memory_profile_interval : float, optional
+            Seconds between tracemalloc snapshots, allocation sites that grew the most since the previous snapshot
+            are printed, by default None no profiling
+        memory_profile_top : int, optional
+            Number of allocation sites that are printed on each snapshot, by default 10
+        lease_path : str, optional
+            SQLite file of raw news leases that is shared by News processes on the same host, a raw news is summarized
+            by the process that claimed it, by default None every fetched raw news is summarized
+        lease_ttl : float, optional
+            Seconds that a lease of a stopped process is kept before other processes reclaim its raw news, by default 300.
+        lease_max_deferred : int, optional
+            Max number of raw news leased by other processes that are kept to be claimed once their lease expires,
+            the oldest ones are forgotten and counted as failed at stage 'deferred', by default 10000
+        scrape : bool, optional
+            Scrape news from online news sources, False only summarize raw news that other processes have scraped
+            e.g. extra summarize processes that share lease_path, by default True
         """        
+        if pipeline and not scrape:
+            raise Exception('Pipeline mode summarize news that it scrapes, scrape can not be disabled')
         self.__delay = delay
+        self.__scrape = scrape
         self.__trace_limit = trace_limit
         self.__summarize_algorithm = summarize_algorithm
         self.__compression_rate = compression_rate
-        self.__news_scraper = NewsScraper(max_trace_limit=trace_limit)
+        self.__tracer = Tracer(trace_path, slow_threshold=trace_slow_threshold, sample_rate=trace_sample_rate)
+        self.__news_scraper = NewsScraper(max_trace_limit=trace_limit, session=scrape_session, tracer=self.__tracer)
+        self.__api_session = api_session
+        self.__api_url = api_url
+        self.__long_poll = long_poll
+        self.__prefetch_batches = max(1, prefetch_batches)
+        self.__pipeline = pipeline
+        self.__pipeline_queue_size = max(1, pipeline_queue_size)
+        self.__in_flight = set()
+        # executor of blocking calls of asyncio runtime, it is created by serve
+        self.__executor = None
+        self.__summarize_pool = SummarizePool(
+            summarize_workers,
+            compression_rate,
+            summarize_algorithm,
+            summarize_chunk_size,
+            recycle_after=summarize_recycle_after,
+            recycle_memory=summarize_recycle_memory)
+        self.__outbox = Outbox(
+            outbox_path,
+            connector_factory=lambda: ApiConnector(session=self.__api_session, api_url=self.__api_url),
+            batch_size=post_batch_size,
+            max_attempts=outbox_max_attempts,
+            tracer=self.__tracer)
+        self.__retries = RetryScheduler(summarize_max_attempts, summarize_retry_base, summarize_retry_max)
+        self.__leases = LeaseStore(lease_path, ttl=lease_ttl) if lease_path is not None else None
+        # ids of raw news that this process has claimed and is still summarizing, only their leases are renewed
+        self.__leased = set()
+        # ids of leased raw news that are in a summarize chunk now, news that wait for their retry are not
+        self.__summarizing = set()
+        self.__leased_lock = threading.Lock()
+        self.__deferred = OrderedDict()
+        self.__max_deferred = max(1, lease_max_deferred)
         self.__checkpoints = checkpoints if bool(checkpoints) else {
             'sanook' : []
         }
+        self.__seen = SeenStore(seen_store_path, retention=seen_retention)
+        self.__seen.import_checkpoints(self.__checkpoints)
+        # imported ids are kept by seen store, only the latest trace of each publisher is kept as checkpoint
+        self.__checkpoints = {publisher: list(news_ids)[:trace_limit] for publisher, news_ids in self.__checkpoints.items()}
+        self.__metrics_port = metrics_port
+        self.__metrics_path = metrics_path
+        self.__metrics_interval = metrics_interval
+        self.__metrics_exporters = []
+        self.__memory_profiler = MemoryProfiler(memory_profile_interval, memory_profile_top) if memory_profile_interval is not None else None
     
     def __update_checkpoint(self, latest_news_ids:Dict[str, str]) -> None:
         """Update current checkpoint, where checkpoint is the list of latest news ids
@@ -53,13 +218,268 @@ class News:
             if len(latest_news_ids[publisher]) == 0:
                 continue
             else:
-                self.__checkpoints[publisher] = latest_news_ids[publisher]
+                self.__checkpoints[publisher] = list(latest_news_ids[publisher])[:self.__trace_limit]
                     #if news_id not in self.__checkpoints:
                     #    if len(self.__checkpoints[publisher]) > 0:
                     #        self.__checkpoints[publisher].pop()
                     #    self.__checkpoints[publisher].insert(0, news_id)
 
-    def __auto_scrape(self, name=None, run_event=None) -> None:
+    def __news_key(self, url:str) -> Tuple[str, str]:
+        """Get publisher name and news id of given news url
+
+        Parameters
+        ----------
+        url : str
+            news url
+
+        Returns
+        -------
+        Tuple[str, str]
+            publisher name and news id
+        """        
+        return self.__news_scraper._filter(url), url.rstrip('/').rsplit('/', 1)[-1]
+
+    def __new_urls(self, urls:List[str]) -> List[str]:
+        """Filter out news that have been posted or are in flight, their traces are dropped
+
+        Parameters
+        ----------
+        urls : List[str]
+            traced news urls
+
+        Returns
+        -------
+        List[str]
+            news urls to be scraped
+        """        
+        new_urls = []
+        for url in urls:
+            if self.__news_key(url) in self.__seen or self.__news_key(url) in self.__in_flight:
+                self.__tracer.discard(url)
+            else:
+                new_urls.append(url)
+        return new_urls
+
+    def __trace_polled(self, raw_news:List[dict]) -> None:
+        """Mark raw news that were read from New-sREST api, news that were scraped by another process start their trace here"""
+        for news in raw_news:
+            if 'sourceUrl' in news:
+                self.__tracer.begin(news['sourceUrl'])
+                self.__tracer.mark(news['sourceUrl'], 'poll')
+
+    def __claim_raw(self, raw_news:List[dict]) -> Dict[str, dict]:
+        """Filter out raw news that are queued to be updated, dead lettered or leased by another process,
+        leased news are deferred until their lease is completed or expired
+
+        Parameters
+        ----------
+        raw_news : List[dict]
+            fetched raw news
+
+        Returns
+        -------
+        Dict[str, dict]
+            dictionary of raw news id and raw news to be summarized by this process
+        """        
+        # summarizeStatus of pending news is queued to be updated, its summary is queued already
+        raw_news = {news['_id']: news for news in raw_news if not self.__outbox.pending('raw', news['_id']) and not self.__outbox.buried('raw', news['_id'])}
+        if self.__leases is None:
+            return raw_news
+        with self.__leased_lock:
+            # news that this process is summarizing are fetched again after the change feed is rewound, they are skipped
+            raw_news = {id: news for id, news in raw_news.items() if not id in self.__summarizing}
+            held = [id for id in raw_news if id in self.__leased]
+        claimed = set(self.__leases.claim([id for id in raw_news if not id in held]))
+        # news that wait for their retry keep the lease of this process unless it has expired and been taken over
+        renewed = {id for id in held if self.__leases.renew([id]) != 0}
+        claimed.update(renewed)
+        with self.__leased_lock:
+            self.__leased.difference_update(set(held)-renewed)
+            self.__leased.update(claimed)
+            self.__summarizing.update(claimed)
+        evicted = 0
+        for id, news in raw_news.items():
+            if not id in claimed:
+                self.__deferred[id] = news
+                while len(self.__deferred) > self.__max_deferred:
+                    self.__deferred.popitem(last=False)
+                    evicted += 1
+        if evicted != 0:
+            # forgotten news are summarized by their lease holder, or fetched again after a restart if it has stopped
+            FAILED.inc(evicted, stage='deferred')
+            print('{} deferred raw news are forgotten, more than {} raw news are leased by other processes'.format(evicted, self.__max_deferred))
+        return {id: news for id, news in raw_news.items() if id in claimed}
+
+    def __renew_leases(self) -> List[dict]:
+        """Renew leases of this process and take deferred raw news whose lease has expired or been released
+
+        Returns
+        -------
+        List[dict]
+            raw news to be claimed again
+        """        
+        if self.__leases is None:
+            return []
+        with self.__leased_lock:
+            leased = list(self.__leased)
+        self.__leases.renew(leased)
+        reclaimed = []
+        for id, state in self.__leases.states(list(self.__deferred)).items():
+            if state != 'leased':
+                news = self.__deferred.pop(id, None)
+                if state == 'free' and news is not None:
+                    reclaimed.append(news)
+        return reclaimed
+
+    def __complete_leases(self, ids:List[str]) -> None:
+        """Complete leases of raw news that have been queued to publish or dead lettered"""
+        if self.__leases is None:
+            return
+        self.__leases.complete(ids)
+        with self.__leased_lock:
+            self.__leased.difference_update(ids)
+            self.__summarizing.difference_update(ids)
+
+    def __release_leases(self, ids:List[str] = None) -> None:
+        """Release leases of raw news that this process has given up e.g. a batch that failed and is fetched again,
+        other processes can claim them at once
+
+        Parameters
+        ----------
+        ids : List[str], optional
+            raw news ids, by default None every lease of this process
+        """
+        if self.__leases is None:
+            return
+        try:
+            self.__leases.release(ids)
+        except Exception as e: # leases that are not released expire after ttl as they are no longer renewed
+            print('Failed to release leases', e)
+        with self.__leased_lock:
+            if ids is None:
+                self.__leased.clear()
+                self.__summarizing.clear()
+            else:
+                self.__leased.difference_update(ids)
+                self.__summarizing.difference_update(ids)
+
+    def __summarize_failed(self, key:str, news:dict, error:str, raw:bool) -> None:
+        """Schedule a news that could not be summarized to be summarized again, a news that has run out of attempts
+        or can not be scheduled because retry schedule is full is moved to dead letter queue so it stop taking
+        summarize worker time
+
+        Parameters
+        ----------
+        key : str
+            raw news id or source url of scraped news
+        news : dict
+            raw news or scraped news
+        error : str
+            summarize error
+        raw : bool
+            True if news is raw news that fetched from New-sREST api
+        """        
+        try:
+            if self.__retries.failed(key, news):
+                print('Some error occur while summarizing news {}, it will be retried'.format(key), error)
+                self.__tracer.mark(news.get('sourceUrl'), 'summarize_failed')
+                if raw:
+                    # its lease is kept and renewed until the retry claims it again
+                    with self.__leased_lock:
+                        self.__summarizing.discard(key)
+                return
+            attempts = self.__retries.max_attempts
+            print('Summarizing news {} failed {} times, it is moved to dead letter queue'.format(key, attempts), error)
+        except RetryScheduleFull as full:
+            attempts = full.attempts
+            error = '{} ({})'.format(error, full)
+            print('Summarizing news {} failed and retry schedule is full, it is moved to dead letter queue'.format(key), error)
+        self.__outbox.bury('summarize', 'raw', None, key if raw else None, news, attempts, error)
+        self.__tracer.finish(news.get('sourceUrl'), 'summarize', error=error)
+        if raw:
+            # dead lettered news is replayed by hand, other processes do not summarize it again
+            self.__complete_leases([key])
+        if not raw:
+            # scraped news is not scraped again, replay post it as raw news
+            self.__seen.add(*self.__news_key(news['sourceUrl']))
+            self.__in_flight.discard(self.__news_key(news['sourceUrl']))
+
+    def __retry_due(self, stage_queue:queue.Queue, run_event:threading.Event, batched:bool) -> None:
+        """Put news whose summarize retry is due back into summarize stage
+
+        Parameters
+        ----------
+        stage_queue : queue.Queue
+            queue of summarize stage
+        run_event : threading.Event
+            run thread event
+        batched : bool
+            True if stage queue take a list of news
+        """        
+        while run_event.is_set():
+            due = [news for _, news in self.__retries.due()]+self.__renew_leases()
+            if batched and len(due) != 0:
+                self.__put(stage_queue, due, run_event)
+            elif not batched:
+                for news in due:
+                    self.__put(stage_queue, news, run_event)
+            time.sleep(1)
+
+    def __start_metrics(self, stage_queues:Dict[str, Union[queue.Queue, asyncio.Queue]]) -> None:
+        """Bind backlog gauges to outbox and stage queues then start metrics exporters
+
+        Parameters
+        ----------
+        stage_queues : Dict[str, Union[queue.Queue, asyncio.Queue]]
+            dictionary of queue name and queue
+        """        
+        BACKLOG.set_function(lambda: len(self.__outbox), queue='outbox')
+        BACKLOG.set_function(lambda: len(self.__in_flight), queue='in_flight')
+        BACKLOG.set_function(lambda: len(self.__retries), queue='retry')
+        BACKLOG.set_function(lambda: len(self.__deferred), queue='deferred')
+        RESIDENT_MEMORY.set_function(rss_bytes, process='main')
+        for name, stage_queue in stage_queues.items():
+            BACKLOG.set_function(stage_queue.qsize, queue=name)
+        if self.__metrics_port is not None:
+            server = MetricsServer(port=self.__metrics_port).start()
+            self.__metrics_exporters.append(server)
+            print('Metrics are serving at {}'.format(server.url))
+        if self.__metrics_path is not None:
+            self.__metrics_exporters.append(JsonDumper(self.__metrics_path, self.__metrics_interval).start())
+        if self.__memory_profiler is not None:
+            self.__metrics_exporters.append(self.__memory_profiler.start())
+
+    def __stop_metrics(self) -> None:
+        for exporter in self.__metrics_exporters:
+            exporter.stop()
+        self.__metrics_exporters = []
+
+    def __put(self, stage_queue:queue.Queue, item, run_event:threading.Event) -> bool:
+        """Put item into a bounded stage queue, block while the queue is full so the producer is slowed down
+
+        Parameters
+        ----------
+        stage_queue : queue.Queue
+            bounded queue of next stage
+        item : Any
+            item to put
+        run_event : threading.Event
+            run thread event
+
+        Returns
+        -------
+        bool
+            False if system is closing before item is put
+        """        
+        while run_event.is_set():
+            try:
+                stage_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __auto_scrape(self, name=None, run_event=None, scraped:queue.Queue = None) -> None:
         """Automatic scrape news from online news source
 
         Parameters
@@ -68,28 +488,178 @@ class News:
             thread name, by default None
         run_event : Thread, optional
             run thread event, by default None
+        scraped : queue.Queue, optional
+            queue of summarize stage in pipeline mode, by default None post raw news to New-sREST api
         """        
         print('Scraper worker is starting...')
-        api_connector = ApiConnector()
+        hand_off = partial(self.__put, scraped, run_event=run_event) if scraped is not None else None
         while run_event.is_set():
-            urls, latest_news_ids = self.__news_scraper.trace(limit=self.__trace_limit, checkpoint=[])
-            if latest_news_ids['sanook'] != self.__checkpoints['sanook']:
-                for index in range(len(latest_news_ids['sanook'])):
-                    if latest_news_ids['sanook'][index] in self.__checkpoints['sanook']:
-                        continue
-                    scraped_news = self.__news_scraper.scrape(urls[index])
-                    api_connector.setModel('raw')
-                    for news in scraped_news:
-                        status_code, status_text = api_connector.post(news)
-                        if not status_code in api_connector.PASS_STATUS:
-                            print("Bad status code at post raw news :", status_code)
-                            continue
-                        else:
-                            print("Raw news pushed.")
-                self.__update_checkpoint(latest_news_ids)
+            try:
+                self.__scrape_round(run_event, hand_off)
+            except Exception as e:
+                print('Some error occur in auto_scrape', e)
             print('Scraper is sleeping now...')
             time.sleep(self.__delay)
 
+    def __scrape_round(self, run_event:threading.Event, hand_off:Callable[[dict], bool] = None) -> None:
+        """Trace latest news of every publisher once and scrape news that have not been seen, shared by thread
+        and asyncio runtimes, asyncio runtime run it in an executor thread
+
+        Parameters
+        ----------
+        run_event : threading.Event
+            tracing and scraping stop at the next request when this event is cleared
+        hand_off : Callable[[dict], bool], optional
+            function that hand a scraped news to summarize stage in pipeline mode and return False if system is closing,
+            by default None post raw news to New-sREST api
+        """        
+        urls, latest_news_ids = self.__news_scraper.trace(limit=self.__trace_limit, checkpoint=[], run_event=run_event)
+        new_urls = self.__new_urls(urls)
+        scraped_urls = set()
+        for record in self.__news_scraper.iter_records(new_urls, run_event=run_event):
+            if not run_event.is_set():
+                break
+            news = record.to_payload()
+            scraped_urls.add(news['sourceUrl'])
+            if hand_off is not None:
+                # hand news to summarize stage directly, it is marked as seen when it is published
+                self.__in_flight.add(self.__news_key(news['sourceUrl']))
+                if not hand_off(news):
+                    break
+                continue
+            # queue each news as soon as it is scraped, outbox send it to New-sREST in background
+            self.__outbox.post('raw', news, trace=news['sourceUrl'])
+            self.__seen.add(*self.__news_key(news['sourceUrl']))
+            print("Raw news queued.")
+        for url in new_urls:
+            if not url in scraped_urls:
+                self.__tracer.finish(url, error='Not scraped')
+        self.__update_checkpoint(latest_news_ids)
+        self.__seen.compact()
+        if self.__leases is not None:
+            self.__leases.compact()
+
+    def __pipeline_summarize(self, scraped:queue.Queue, summarized:queue.Queue, run_event:threading.Event) -> None:
+        """Summarize stage of pipeline mode, summarize scraped news and hand them to publish stage
+
+        Parameters
+        ----------
+        scraped : queue.Queue
+            queue of scraped news
+        summarized : queue.Queue
+            queue of publish stage, each item is a tuple of scraped news and summarized news
+        run_event : threading.Event
+            run thread event
+        """        
+        print('Summarize stage is starting...')
+        in_flight = {}
+        max_in_flight = max(1, self.__summarize_pool.workers)*2
+        while run_event.is_set():
+            chunk = []
+            try:
+                if len(in_flight) < max_in_flight:
+                    chunk.append(scraped.get(timeout=.1 if len(in_flight) != 0 else 1))
+                    # only news that are waiting already join the chunk, a chunk never wait to be filled
+                    while len(chunk) < self.__summarize_pool.chunk_size:
+                        chunk.append(scraped.get_nowait())
+            except queue.Empty:
+                pass
+            if len(chunk) != 0:
+                in_flight[self.__summarize_pool.submit([(index, news['content']) for index, news in enumerate(chunk)])] = chunk
+            done, _ = wait(list(in_flight), timeout=0 if len(in_flight) < max_in_flight else 1, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(index, news['content'], repr(e)) for index, news in enumerate(chunk)]
+                for index, content, error in results:
+                    if error is not None:
+                        self.__summarize_failed(chunk[index]['sourceUrl'], chunk[index], error, raw=False)
+                        continue
+                    self.__retries.succeeded(chunk[index]['sourceUrl'])
+                    self.__tracer.mark(chunk[index]['sourceUrl'], 'summarize')
+                    self.__put(summarized, (chunk[index], dict(chunk[index], content=content)), run_event)
+
+    def __pipeline_publish(self, summarized:queue.Queue, run_event:threading.Event) -> None:
+        """Publish stage of pipeline mode, queue summarized news and archive raw news as already summarized
+
+        Parameters
+        ----------
+        summarized : queue.Queue
+            queue of tuples of scraped news and summarized news
+        run_event : threading.Event
+            run thread event
+        """        
+        print('Publish stage is starting...')
+        while run_event.is_set():
+            try:
+                news, summarized_news = summarized.get(timeout=1)
+            except queue.Empty:
+                continue
+            self.__publish_scraped(news, summarized_news)
+
+    def __publish_scraped(self, news:dict, summarized_news:dict) -> None:
+        """Queue summarized news of pipeline mode and archive raw news as already summarized
+
+        Parameters
+        ----------
+        news : dict
+            scraped news
+        summarized_news : dict
+            summarized news
+        """        
+        try:
+            self.__outbox.post('summarized', summarized_news, trace=news['sourceUrl'])
+            # raw news is only archived, REST polling summarizer of a split deployment must skip it,
+            # outbox follows the post with a put when the server does not keep summarizeStatus on insert
+            self.__outbox.post('raw', dict(news, summarizeStatus='true'), trace=news['sourceUrl'], finish=True)
+            self.__seen.add(*self.__news_key(news['sourceUrl']))
+            print("Summarized news queued.")
+        except Exception as e:
+            print('Some error occur in publish stage', e)
+        finally:
+            self.__in_flight.discard(self.__news_key(news['sourceUrl']))
+
+    def __publish_raw(self, mark_as_summarized:str, news:dict, content:str) -> None:
+        """Queue summarized news of raw news that fetched from New-sREST api and update its summarizeStatus
+
+        Parameters
+        ----------
+        mark_as_summarized : str
+            raw news id
+        news : dict
+            raw news
+        content : str
+            summarized content
+        """        
+        # raw news is kept intact, its batch release leases by id when the batch fails
+        news = {key: value for key, value in news.items() if not key in ('_id', '__v', 'insertDt', 'summarizeStatus')}
+        news['content'] = content
+        trace = news.get('sourceUrl')
+        self.__tracer.mark(trace, 'summarize')
+        self.__outbox.post('summarized', news, trace=trace)
+        self.__outbox.put('raw', mark_as_summarized, {"summarizeStatus": 'true'}, trace=trace, finish=True)
+        self.__complete_leases([mark_as_summarized])
+        print("Summarized news queued on raw news id {}".format(mark_as_summarized))
+
+    def __prefetch_raw(self, raw_feed:ChangeFeed, raw_batches:queue.Queue, run_event:threading.Event) -> None:
+        """Fetch raw news batches ahead of summarize worker, block while the queue is full
+
+        Parameters
+        ----------
+        raw_feed : ChangeFeed
+            change feed of unsummarized raw news
+        raw_batches : queue.Queue
+            bounded queue of fetched batches
+        run_event : threading.Event
+            run thread event
+        """        
+        while run_event.is_set():
+            raw_news = raw_feed.next(run_event)
+            if len(raw_news) != 0:
+                self.__put(raw_batches, raw_news, run_event)
+
     def __auto_summarize(self, name=None, run_event=None) -> None:
         """Automatic summarize scraped news that has been collected in New-sREST api
 
@@ -102,53 +672,102 @@ class News:
 
         """        
         print('Summarize worker is starting...')
-        failed_mark_as_summarized = []
-        raw_connector = ApiConnector()
-        summarized_connector = ApiConnector()
+        raw_connector = ApiConnector(session=self.__api_session, api_url=self.__api_url)
         raw_connector.setModel('raw')
-        summarized_connector.setModel('summarized')
-        while run_event.is_set():
+        raw_feed = ChangeFeed(raw_connector, {'summarizeStatus': 'false'}, limit=24, long_poll=self.__long_poll)
+        # next batches are fetched while current batch is summarized, writes are flushed by outbox in background
+        raw_batches = queue.Queue(maxsize=self.__prefetch_batches)
+        BACKLOG.set_function(raw_batches.qsize, queue='raw_batches')
+        prefetcher = threading.Thread(target=self.__prefetch_raw, args=(raw_feed, raw_batches, run_event), name='prefetch', daemon=True)
+        prefetcher.start()
+        retrier = threading.Thread(target=self.__retry_due, args=(raw_batches, run_event, True), name='retry', daemon=True)
+        retrier.start()
+        # chunks of many batches are kept in summarize pool so workers are not idle while the tail of a batch is summarized
+        in_flight = {}
+        waiting = deque()
+        max_in_flight = max(1, self.__summarize_pool.workers)*2
+        while run_event.is_set() or len(in_flight) != 0:
             try:
-                get_raw_params = {'limit':24, 'summarizeStatus': 'false'}
-                status_code, raw_news = raw_connector.get(get_raw_params)
-                if len(raw_news) != 0:
-                    for news in raw_news:
-                        if type(news['_id']) != str:
-                            if news['_id'] in failed_mark_as_summarized:
-                                continue
-                        mark_as_summarized = news['_id']
-                        summarized_news = summarize(news['content'], self.__compression_rate, lang='th', algorithm=self.__summarize_algorithm)
-                        if len(summarized_news) == 0: # return nothing from summarize system
-                            try_different_algo = 'sentence_rank' if self.__summarize_algorithm == 'text_rank' else 'text_rank'
-                            summarized_news = summarize(news['content'], self.__compression_rate, lang='th', algorithm=try_different_algo)
-                        news['content'] = summarized_news if bool(summarized_news) else news['content']
-                        del(news['_id'])
-                        del(news['__v'])
-                        del(news['insertDt'])
-                        del(news['summarizeStatus'])
-                        status_code, status_text = summarized_connector.post(news)
-                        if not status_code in summarized_connector.PASS_STATUS:
-                            print("Bad status code at post summarized news :", status_code)
-                            continue
-                        else:
-                            print("Summarized news pushed")
-                        status_code, status_text = raw_connector.put(mark_as_summarized, {"summarizeStatus": 'true'})
-                        if not status_code in raw_connector.PASS_STATUS:
-                            print("Failed to re-assign summarizeStatus with bad code :", status_code)
-                            failed_mark_as_summarized.append(mark_as_summarized)
-                        else:
-                            print("Re-assign summarizeStatus completed on raw news id {}".format(mark_as_summarized))
-                if len(failed_mark_as_summarized) != 0:
-                    for i in range(0, len(failed_mark_as_summarized)):
-                        status_code, status_text = raw_connector.put(failed_mark_as_summarized[i], {"summarizeStatus": True})
-                        if not status_code in raw_connector.PASS_STATUS:
-                            print("Failed to re-assign summarizeStatus with bad code :", status_code)
-                        else:
-                            print("Re-assign summarizeStatus completed on raw news id {}".format(mark_as_summarized))
-                            del(failed_mark_as_summarized[i])
-                time.sleep(1)
+                if run_event.is_set() and len(waiting) == 0 and len(in_flight) < max_in_flight:
+                    try:
+                        batch = raw_batches.get(timeout=.1 if len(in_flight) != 0 else 1)
+                    except queue.Empty:
+                        batch = None
+                    if batch is not None:
+                        try:
+                            waiting.extend(self.__split_raw(raw_feed, batch))
+                        except Exception:
+                            self.__release_leases([news['_id'] for news in batch])
+                            raise
+                while run_event.is_set() and len(waiting) != 0 and len(in_flight) < max_in_flight:
+                    state, ids = waiting.popleft()
+                    in_flight[self.__summarize_pool.submit([(id, state[1][id]['content']) for id in ids])] = (state, ids)
+                if len(in_flight) == 0:
+                    continue
+                done, _ = wait(list(in_flight), timeout=0 if len(in_flight) < max_in_flight and run_event.is_set() else 1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    state, ids = in_flight.pop(future)
+                    batch, raw_news, _ = state
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = [(id, raw_news[id]['content'], repr(e)) for id in ids]
+                    try:
+                        self.__publish_raw_results(raw_news, results)
+                    except Exception:
+                        # the batch is fetched again after rewind, news of the chunk that are not published can be claimed by any process
+                        self.__release_leases(ids)
+                        raise
+                    state[2] -= 1
+                    if state[2] == 0:
+                        # every news of the batch is queued to publish, scheduled to retry or deferred
+                        raw_feed.commit(batch)
             except Exception as e:
                 print('Some error occur in auto_summarize', e)
+                raw_feed.rewind()
+
+    def __split_raw(self, raw_feed:ChangeFeed, batch:List[dict]) -> List[Tuple[list, List[str]]]:
+        """Claim raw news of a fetched batch and split them into summarize chunks
+
+        Parameters
+        ----------
+        raw_feed : ChangeFeed
+            change feed that the batch is committed to
+        batch : List[dict]
+            fetched raw news
+
+        Returns
+        -------
+        List[Tuple[list, List[str]]]
+            list of batch state and raw news ids of a chunk, batch state is a list of batch, dictionary of claimed
+            raw news and number of chunks that are not handled
+        """        
+        raw_news = self.__claim_raw(batch)
+        self.__trace_polled(raw_news.values())
+        ids = list(raw_news)
+        chunk_size = self.__summarize_pool.chunk_size
+        chunks = [ids[start:start+chunk_size] for start in range(0, len(ids), chunk_size)]
+        if len(chunks) == 0:
+            raw_feed.commit(batch)
+        state = [batch, raw_news, len(chunks)]
+        return [(state, chunk) for chunk in chunks]
+
+    def __publish_raw_results(self, raw_news:Dict[str, dict], results:List[Tuple[str, str, str]]) -> None:
+        """Publish summarized raw news of a chunk and schedule failed ones to retry
+
+        Parameters
+        ----------
+        raw_news : Dict[str, dict]
+            dictionary of raw news id and raw news
+        results : List[Tuple[str, str, str]]
+            raw news id, summarized content and error or None
+        """        
+        for mark_as_summarized, content, error in results:
+            if error is not None:
+                self.__summarize_failed(mark_as_summarized, raw_news[mark_as_summarized], error, raw=True)
+                continue
+            self.__retries.succeeded(mark_as_summarized)
+            self.__publish_raw(mark_as_summarized, raw_news[mark_as_summarized], content)
 
     def start(self) -> Dict[str, list]:
         """Start automatic news scraping and summarizing system
@@ -160,10 +779,25 @@ class News:
         """        
         run_event = threading.Event()
         run_event.set()
-        scraper_worker = threading.Thread(target=self.__auto_scrape, args=('scraper', run_event))
-        summarier_worker = threading.Thread(target=self.__auto_summarize, args=('scraper', run_event))
-        scraper_worker.start()
-        summarier_worker.start()
+        if self.__pipeline:
+            scraped = queue.Queue(maxsize=self.__pipeline_queue_size)
+            summarized = queue.Queue(maxsize=self.__pipeline_queue_size)
+            workers = [
+                threading.Thread(target=self.__auto_scrape, args=('scraper', run_event, scraped)),
+                threading.Thread(target=self.__pipeline_summarize, args=(scraped, summarized, run_event)),
+                threading.Thread(target=self.__pipeline_publish, args=(summarized, run_event)),
+                threading.Thread(target=self.__retry_due, args=(scraped, run_event, False))
+            ]
+            self.__start_metrics({'scraped': scraped, 'summarized': summarized})
+        else:
+            workers = [threading.Thread(target=self.__auto_summarize, args=('scraper', run_event))]
+            if self.__scrape:
+                workers.append(threading.Thread(target=self.__auto_scrape, args=('scraper', run_event)))
+            self.__start_metrics({})
+        self.__summarize_pool.start()
+        self.__outbox.start()
+        for worker in workers:
+            worker.start()
         print("System started.")
         try:
             while True:
@@ -172,7 +806,300 @@ class News:
         except KeyboardInterrupt:
             print("Closing system...")
             run_event.clear()
-            scraper_worker.join()
-            summarier_worker.join()
-            print("System closed.")
-        return self.__checkpoints
\ No newline at end of file
+            for worker in workers:
+                worker.join()
+            self.__summarize_pool.close()
+            self.__outbox.stop()
+            self.__stop_metrics()
+            self.__news_scraper.close()
+            self.__tracer.close()
+            self.__release_leases()
+            print("System closed, {} writes are kept in outbox.".format(len(self.__outbox)))
+        return self.__checkpoints
+
+    async def __sleep(self, stop:asyncio.Event, delay:float) -> None:
+        """Sleep that return as soon as system is closing"""
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def __scrape_task(self, stop:asyncio.Event, run_event:threading.Event, scraped:asyncio.Queue = None) -> None:
+        """Scrape task of asyncio runtime, scrape rounds are run in an executor thread, see __scrape_round
+
+        Parameters
+        ----------
+        stop : asyncio.Event
+            event that is set when system is closing
+        run_event : threading.Event
+            event that is cleared when system is closing, it stops a running scrape round
+        scraped : asyncio.Queue, optional
+            queue of summarize dispatchers in pipeline mode, by default None post raw news to New-sREST api
+        """        
+        print('Scraper task is starting...')
+        loop = asyncio.get_running_loop()
+        hand_off = None
+        if scraped is not None:
+            def hand_off(news:dict) -> bool:
+                # scrape thread wait while the queue is full, like __put of thread runtime
+                future = asyncio.run_coroutine_threadsafe(scraped.put(news), loop)
+                while run_event.is_set():
+                    try:
+                        future.result(timeout=1)
+                        return True
+                    except FutureTimeoutError:
+                        continue
+                future.cancel()
+                return False
+        while not stop.is_set():
+            try:
+                await loop.run_in_executor(self.__executor, self.__scrape_round, run_event, hand_off)
+            except Exception as e:
+                print('Some error occur in scrape task', e)
+            print('Scraper is sleeping now...')
+            await self.__sleep(stop, self.__delay)
+
+    async def __fetch_task(self, raw_feed:ChangeFeed, run_event:threading.Event, raw_batches:asyncio.Queue) -> None:
+        """Fetch task of asyncio runtime, fetch unsummarized raw news batches ahead of summarize dispatcher
+
+        Parameters
+        ----------
+        raw_feed : ChangeFeed
+            change feed of unsummarized raw news
+        run_event : threading.Event
+            event that is cleared when system is closing, it interrupts a blocking fetch
+        raw_batches : asyncio.Queue
+            bounded queue of fetched batches
+        """        
+        loop = asyncio.get_running_loop()
+        while run_event.is_set():
+            raw_news = await loop.run_in_executor(self.__executor, raw_feed.next, run_event)
+            if len(raw_news) != 0:
+                await raw_batches.put(raw_news)
+
+    async def __dispatch_raw_task(self, raw_feed:ChangeFeed, raw_batches:asyncio.Queue) -> None:
+        """Summarize dispatch task of asyncio runtime in REST polling mode
+
+        Parameters
+        ----------
+        raw_feed : ChangeFeed
+            change feed that fetched batches are committed to
+        raw_batches : asyncio.Queue
+            queue of fetched raw news batches
+        """        
+        print('Summarize task is starting...')
+        # chunks of many batches are kept in summarize pool, the next batch is dispatched while a batch is summarized
+        slots = asyncio.Semaphore(max(1, self.__summarize_pool.workers)*2)
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await raw_batches.get()
+            try:
+                tasks = []
+                # leases and outbox are SQLite stores, they are called in executor threads so the loop never blocks
+                for state, ids in await loop.run_in_executor(self.__executor, self.__split_raw, raw_feed, batch):
+                    await slots.acquire()
+                    tasks.append(asyncio.ensure_future(self.__summarize_raw_chunk(state[1], ids, slots)))
+            except Exception as e:
+                print('Some error occur in summarize task', e)
+                await loop.run_in_executor(self.__executor, self.__release_leases, [news['_id'] for news in batch])
+                raw_feed.rewind()
+                raw_batches.task_done()
+                continue
+            asyncio.ensure_future(self.__finish_raw_batch(raw_feed, raw_batches, batch, tasks))
+
+    async def __summarize_raw_chunk(self, raw_news:Dict[str, dict], ids:List[str], slots:asyncio.Semaphore) -> None:
+        """Summarize a chunk of raw news in summarize pool and publish it, its slot is released when it is done"""
+        try:
+            try:
+                results = await asyncio.wrap_future(self.__summarize_pool.submit([(id, raw_news[id]['content']) for id in ids]))
+            except Exception as e:
+                results = [(id, raw_news[id]['content'], repr(e)) for id in ids]
+            await asyncio.get_running_loop().run_in_executor(self.__executor, self.__publish_raw_results, raw_news, results)
+        finally:
+            slots.release()
+
+    async def __finish_raw_batch(self, raw_feed:ChangeFeed, raw_batches:asyncio.Queue, batch:List[dict], tasks:List[asyncio.Future]) -> None:
+        """Commit a batch once every chunk of it is handled, the change feed is rewound when a chunk failed"""
+        try:
+            for error in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(error, BaseException):
+                    raise error
+            raw_feed.commit(batch)
+        except Exception as e:
+            print('Some error occur in summarize task', e)
+            await asyncio.get_running_loop().run_in_executor(self.__executor, self.__release_leases, [news['_id'] for news in batch])
+            raw_feed.rewind()
+        finally:
+            raw_batches.task_done()
+
+    async def __dispatch_scraped_task(self, scraped:asyncio.Queue, summarized:asyncio.Queue) -> None:
+        """Summarize dispatch task of asyncio runtime in pipeline mode, each dispatcher keep one chunk in summarize pool
+
+        Parameters
+        ----------
+        scraped : asyncio.Queue
+            queue of scraped news
+        summarized : asyncio.Queue
+            queue of publish task, each item is a tuple of scraped news and summarized news
+        """        
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = [await scraped.get()]
+            # only news that are waiting already join the chunk, a chunk never wait to be filled
+            while len(chunk) < self.__summarize_pool.chunk_size and not scraped.empty():
+                chunk.append(scraped.get_nowait())
+            try:
+                try:
+                    results = await asyncio.wrap_future(self.__summarize_pool.submit([(index, news['content']) for index, news in enumerate(chunk)]))
+                except Exception as e:
+                    results = [(index, news['content'], repr(e)) for index, news in enumerate(chunk)]
+                for index, content, error in results:
+                    if error is not None:
+                        await loop.run_in_executor(self.__executor, self.__summarize_failed, chunk[index]['sourceUrl'], chunk[index], error, False)
+                        continue
+                    self.__retries.succeeded(chunk[index]['sourceUrl'])
+                    self.__tracer.mark(chunk[index]['sourceUrl'], 'summarize')
+                    await summarized.put((chunk[index], dict(chunk[index], content=content)))
+            except Exception as e:
+                print('Some error occur in summarize task', e)
+                for news in chunk:
+                    self.__in_flight.discard(self.__news_key(news['sourceUrl']))
+            finally:
+                for _ in chunk:
+                    scraped.task_done()
+
+    async def __retry_task(self, stage_queue:asyncio.Queue, batched:bool) -> None:
+        """Retry task of asyncio runtime, see __retry_due
+
+        Parameters
+        ----------
+        stage_queue : asyncio.Queue
+            queue of summarize dispatchers
+        batched : bool
+            True if stage queue take a list of news
+        """        
+        loop = asyncio.get_running_loop()
+        while True:
+            due = [news for _, news in self.__retries.due()]+await loop.run_in_executor(self.__executor, self.__renew_leases)
+            if batched and len(due) != 0:
+                await stage_queue.put(due)
+            elif not batched:
+                for news in due:
+                    await stage_queue.put(news)
+            await asyncio.sleep(1)
+
+    async def __publish_task(self, summarized:asyncio.Queue) -> None:
+        """Publish task of asyncio runtime in pipeline mode
+
+        Parameters
+        ----------
+        summarized : asyncio.Queue
+            queue of tuples of scraped news and summarized news
+        """        
+        print('Publish task is starting...')
+        loop = asyncio.get_running_loop()
+        while True:
+            news, summarized_news = await summarized.get()
+            try:
+                await loop.run_in_executor(self.__executor, self.__publish_scraped, news, summarized_news)
+            finally:
+                summarized.task_done()
+
+    async def __until(self, deadline:float, timeout_message:str, function:Callable, *args) -> None:
+        """Run a closing step in an executor thread and stop waiting for it at deadline, it keeps running in background"""
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(loop.run_in_executor(self.__executor, function, *args), timeout=max(0, deadline-loop.time()))
+        except asyncio.TimeoutError:
+            print(timeout_message)
+
+    async def serve(self, shutdown_timeout:float = 30., stop:asyncio.Event = None) -> Dict[str, list]:
+        """Run automatic news scraping and summarizing system as tasks on running event loop until SIGINT or SIGTERM,
+        on close scraping stops at once, fetched news are drained within shutdown_timeout and queued writes are flushed
+
+        Parameters
+        ----------
+        shutdown_timeout : float, optional
+            max seconds to drain in-flight news and flush outbox before exit, by default 30.
+        stop : asyncio.Event, optional
+            event that close system when it is set e.g. by an embedding application, by default None close on signals only
+
+        Returns
+        -------
+        Dict[str, list]
+            A dictionary that represented a checkpoint news of each publishers
+        """        
+        loop = asyncio.get_running_loop()
+        stop = stop if stop is not None else asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass # not supported on this platform or loop is not in main thread, KeyboardInterrupt still closes system
+        run_event = threading.Event()
+        run_event.set()
+        # own executor so a blocking call that outlives shutdown timeout is not waited by the event loop on exit
+        self.__executor = ThreadPoolExecutor(thread_name_prefix='serve')
+        self.__summarize_pool.start()
+        self.__outbox.start()
+        if self.__pipeline:
+            scraped = asyncio.Queue(maxsize=self.__pipeline_queue_size)
+            summarized = asyncio.Queue(maxsize=self.__pipeline_queue_size)
+            producers = [asyncio.ensure_future(self.__scrape_task(stop, run_event, scraped)), asyncio.ensure_future(self.__retry_task(scraped, False))]
+            queues = [scraped, summarized]
+            consumers = [asyncio.ensure_future(self.__dispatch_scraped_task(scraped, summarized)) for _ in range(max(1, self.__summarize_pool.workers)*2)]
+            consumers.append(asyncio.ensure_future(self.__publish_task(summarized)))
+            self.__start_metrics({'scraped': scraped, 'summarized': summarized})
+        else:
+            raw_batches = asyncio.Queue(maxsize=self.__prefetch_batches)
+            raw_connector = ApiConnector(session=self.__api_session, api_url=self.__api_url)
+            raw_connector.setModel('raw')
+            raw_feed = ChangeFeed(raw_connector, {'summarizeStatus': 'false'}, limit=24, long_poll=self.__long_poll)
+            producers = [
+                asyncio.ensure_future(self.__fetch_task(raw_feed, run_event, raw_batches)),
+                asyncio.ensure_future(self.__retry_task(raw_batches, True))
+            ]
+            if self.__scrape:
+                producers.append(asyncio.ensure_future(self.__scrape_task(stop, run_event)))
+            queues = [raw_batches]
+            consumers = [asyncio.ensure_future(self.__dispatch_raw_task(raw_feed, raw_batches))]
+            self.__start_metrics({'raw_batches': raw_batches})
+        print("System started.")
+        try:
+            await stop.wait()
+        except asyncio.CancelledError:
+            pass
+        print("Closing system...")
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
+        deadline = loop.time()+shutdown_timeout
+        run_event.clear()
+        for task in producers:
+            task.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+        try:
+            for stage_queue in queues:
+                await asyncio.wait_for(stage_queue.join(), timeout=max(0, deadline-loop.time()))
+        except asyncio.TimeoutError:
+            print("In-flight news are not drained before shutdown timeout.")
+        for task in consumers:
+            task.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        self.__in_flight.clear()
+        await self.__until(deadline, "Summarize workers are still running after shutdown timeout.", self.__summarize_pool.close)
+        await self.__until(deadline, "Outbox is still flushing after shutdown timeout.", self.__outbox.stop, max(0, deadline-loop.time()))
+        await self.__until(deadline, "Metrics exporters are still stopping after shutdown timeout.", self.__stop_metrics)
+        await self.__until(deadline, "Scraper threads are still running after shutdown timeout.", self.__news_scraper.close)
+        self.__tracer.close()
+        await self.__until(deadline, "Leases are not released before shutdown timeout.", self.__release_leases)
+        # calls that are still running finish in background, calls that have not started are dropped
+        if sys.version_info >= (3, 9):
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self.__executor.shutdown(wait=False)
+        self.__executor = None
+        print("System closed, {} writes are kept in outbox.".format(len(self.__outbox)))
+        return self.__checkpoints
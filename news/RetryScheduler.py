@@ -0,0 +1,103 @@
+import time
+import heapq
+import random
+import threading
+from itertools import count
+from typing import Any, Hashable, List, Tuple
+
+class RetryScheduleFull(Exception):
+    ''' Raised when a failed item can not be scheduled because the schedule is full, attempts is its number of failed attempts '''
+    def __init__(self, key:Hashable, attempts:int):
+        super().__init__(f'Retry schedule is full, {key} is not scheduled after {attempts} failed attempts')
+        self.key = key
+        self.attempts = attempts
+
+class RetryScheduler:
+    ''' Thread-safe schedule of failed items, each item is retried after a jittered exponential delay until it run out of attempts '''
+    def __init__(self, max_attempts:int = 3, backoff_base:float = 30., backoff_max:float = 900., max_items:int = 10000):
+        """Constructor of RetryScheduler class
+
+        Parameters
+        ----------
+        max_attempts : int, optional
+            number of failed attempts that an item is given up after, by default 3
+        backoff_base : float, optional
+            base delay in seconds before the first retry, the delay is doubled on every failure, by default 30.
+        backoff_max : float, optional
+            max delay in seconds before a retry, by default 900.
+        max_items : int, optional
+            max number of scheduled items, failed raises RetryScheduleFull while the schedule is full, by default 10000
+        """
+        self.__max_attempts = max(1, max_attempts)
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+        self.__max_items = max(1, max_items)
+        self.__attempts = {}
+        self.__schedule = []
+        self.__sequence = count()
+        self.__lock = threading.Lock()
+
+    @property
+    def max_attempts(self) -> int:
+        return self.__max_attempts
+
+    def __len__(self) -> int:
+        return len(self.__schedule)
+
+    def attempts(self, key:Hashable) -> int:
+        with self.__lock:
+            return self.__attempts.get(key, 0)
+
+    def failed(self, key:Hashable, item:Any) -> bool:
+        """Record a failed attempt of an item and schedule its retry
+
+        Parameters
+        ----------
+        key : Hashable
+            item key e.g. raw news id
+        item : Any
+            item that is returned by due when its retry is due
+
+        Returns
+        -------
+        bool
+            True if the retry is scheduled, False if item has run out of attempts and it is forgotten
+
+        Raises
+        ------
+        RetryScheduleFull
+            error when item has attempts left but the schedule is full, it is forgotten
+        """
+        with self.__lock:
+            attempts = self.__attempts.pop(key, 0)+1
+            if attempts >= self.__max_attempts:
+                return False
+            if len(self.__schedule) >= self.__max_items:
+                raise RetryScheduleFull(key, attempts)
+            self.__attempts[key] = attempts
+            while len(self.__attempts) > self.__max_items:
+                # the oldest attempts belong to items that were dropped without success or failure
+                del self.__attempts[next(iter(self.__attempts))]
+            delay = min(self.__backoff_max, self.__backoff_base*(2**(attempts-1)))*random.uniform(.5, 1)
+            heapq.heappush(self.__schedule, (time.monotonic()+delay, next(self.__sequence), key, item))
+            return True
+
+    def succeeded(self, key:Hashable) -> None:
+        with self.__lock:
+            self.__attempts.pop(key, None)
+
+    def due(self) -> List[Tuple[Hashable, Any]]:
+        """Take items whose retry is due, their attempts are kept until they succeed or run out of attempts
+
+        Returns
+        -------
+        List[Tuple[Hashable, Any]]
+            list of key and item in due order
+        """
+        now = time.monotonic()
+        items = []
+        with self.__lock:
+            while len(self.__schedule) != 0 and self.__schedule[0][0] <= now:
+                _, _, key, item = heapq.heappop(self.__schedule)
+                items.append((key, item))
+        return items
@@ -0,0 +1,154 @@
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List
+
+class SeenStore:
+    ''' Crash-safe index of news ids that have been posted, backed by SQLite in WAL mode and fronted by in-memory sets '''
+    def __init__(self, db_path:str, retention:float = 30*24*3600):
+        """Constructor of SeenStore class
+
+        Parameters
+        ----------
+        db_path : str
+            path of SQLite database file, ':memory:' keep the index in memory only
+        retention : float, optional
+            seconds to keep a news id before compaction remove it, by default 30 days
+        """
+        self.__retention = retention
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'publisher TEXT NOT NULL, news_id TEXT NOT NULL, seen_at REAL NOT NULL, '
+            'PRIMARY KEY (publisher, news_id)) WITHOUT ROWID')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS seen_at_index ON seen (seen_at)')
+        self.__seen = {}
+        self.__load()
+
+    def __load(self) -> None:
+        seen = {}
+        for publisher, news_id in self.__connection.execute('SELECT publisher, news_id FROM seen'):
+            seen.setdefault(publisher, set()).add(news_id)
+        self.__seen = seen
+
+    def __contains__(self, key:tuple) -> bool:
+        publisher, news_id = key
+        return self.contains(publisher, news_id)
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.__seen.values())
+
+    def contains(self, publisher:str, news_id:str) -> bool:
+        """Check whether or not news has been posted
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        news_id : str
+            news id
+
+        Returns
+        -------
+        bool
+            True if news has been posted
+        """
+        return news_id in self.__seen.get(publisher, ())
+
+    def add(self, publisher:str, news_id:str, seen_at:float = None) -> None:
+        """Mark news as posted, the change is committed before this method return
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        news_id : str
+            news id
+        seen_at : float, optional
+            unix time of posting, by default now
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        with self.__lock:
+            self.__connection.execute(
+                'INSERT OR IGNORE INTO seen (publisher, news_id, seen_at) VALUES (?, ?, ?)',
+                (publisher, news_id, seen_at))
+            self.__seen.setdefault(publisher, set()).add(news_id)
+
+    def add_many(self, publisher:str, news_ids:Iterable[str], seen_at:float = None) -> None:
+        """Mark many news as posted in one transaction
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        news_ids : Iterable[str]
+            list of news ids
+        seen_at : float, optional
+            unix time of posting, by default now
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        news_ids = list(news_ids)
+        with self.__lock:
+            with self.__connection:
+                self.__connection.execute('BEGIN')
+                self.__connection.executemany(
+                    'INSERT OR IGNORE INTO seen (publisher, news_id, seen_at) VALUES (?, ?, ?)',
+                    [(publisher, news_id, seen_at) for news_id in news_ids])
+            self.__seen.setdefault(publisher, set()).update(news_ids)
+
+    def unseen(self, publisher:str, news_ids:Iterable[str]) -> List[str]:
+        """Filter out news ids that have been posted
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        news_ids : Iterable[str]
+            list of news ids
+
+        Returns
+        -------
+        List[str]
+            news ids that have not been posted in given order
+        """
+        seen = self.__seen.get(publisher, ())
+        return [news_id for news_id in news_ids if news_id not in seen]
+
+    def compact(self, retention:float = None) -> int:
+        """Remove news ids that older than retention period
+
+        Parameters
+        ----------
+        retention : float, optional
+            seconds to keep a news id, by default retention of constructor
+
+        Returns
+        -------
+        int
+            number of removed news ids
+        """
+        retention = self.__retention if retention is None else retention
+        with self.__lock:
+            removed = self.__connection.execute('DELETE FROM seen WHERE seen_at < ?', (time.time()-retention,)).rowcount
+            if removed > 0:
+                self.__load()
+                self.__connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def import_checkpoints(self, checkpoints:Dict[str, List[str]]) -> None:
+        """Import news ids of the old JSON checkpoints
+
+        Parameters
+        ----------
+        checkpoints : Dict[str, List[str]]
+            A dictionary contain publisher name as a key and list of news ids as a value
+        """
+        for publisher, news_ids in checkpoints.items():
+            self.add_many(publisher, news_ids)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
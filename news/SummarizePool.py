@@ -0,0 +1,272 @@
+import os
+import time
+import threading
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Iterable, Iterator, List, Tuple
+from summarization.Summarization import summarize
+from metrics.Instruments import SUMMARIZED, FAILED, STAGE_LATENCY, RESIDENT_MEMORY, WORKERS_RECYCLED
+from metrics.MemoryProfiler import rss_bytes
+
+# times a chunk is submitted again after worker processes crashed while it was queued or running
+MAX_CRASHES = 3
+
+WARM_UP_DOCUMENT = 'นายกรัฐมนตรีเดินทางไปตรวจราชการที่จังหวัดเชียงใหม่ เพื่อติดตามการแก้ไขปัญหาหมอกควัน ประชาชนในพื้นที่ให้การต้อนรับเป็นอย่างดี'
+
+def summarize_content(content:str, compression_rate:float, algorithm:str) -> str:
+    """Summarize news content, other algorithm is tried when selected algorithm return nothing or raise an error
+
+    Parameters
+    ----------
+    content : str
+        original news content
+    compression_rate : float
+        original news compression rate
+    algorithm : str
+        summarize algorithm name, 'text_rank' or 'sentence_rank'
+
+    Returns
+    -------
+    str
+        summarized content or original content when both algorithms return nothing
+
+    Raises
+    ------
+    Exception
+        error of the other algorithm when both algorithms raise an error
+    """
+    try:
+        summarized_news = summarize(content, compression_rate, lang='th', algorithm=algorithm, raise_errors=True)
+    except Exception:
+        summarized_news = ''
+    if len(summarized_news) == 0: # return nothing from summarize system
+        try_different_algo = 'sentence_rank' if algorithm == 'text_rank' else 'text_rank'
+        summarized_news = summarize(content, compression_rate, lang='th', algorithm=try_different_algo, raise_errors=True)
+    return summarized_news if bool(summarized_news) else content
+
+def _init_worker(compression_rate:float, algorithm:str) -> None:
+    """Initializer of worker process, summarizers, lexicons and tokenizer dictionaries are loaded once here"""
+    summarize_content(WARM_UP_DOCUMENT, compression_rate, algorithm)
+
+def _summarize_chunk(chunk:List[Tuple[Any, str]], compression_rate:float, algorithm:str) -> List[Tuple[Any, str, str]]:
+    results = []
+    for key, content in chunk:
+        try:
+            results.append((key, summarize_content(content, compression_rate, algorithm), None))
+        except Exception as e:
+            results.append((key, content, repr(e)))
+    return results
+
+def _summarize_chunk_measured(chunk:List[Tuple[Any, str]], compression_rate:float, algorithm:str) -> Tuple[List[Tuple[Any, str, str]], int]:
+    """Summarize a chunk in worker process and measure resident memory of the worker after it"""
+    return _summarize_chunk(chunk, compression_rate, algorithm), rss_bytes()
+
+def _record(chunk_size:int, started:float, future:Future) -> None:
+    """Count summarized and failed news of a done chunk, chunk duration is shared by its news"""
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        FAILED.inc(chunk_size, stage='summarize')
+        return
+    elapsed = (time.perf_counter()-started)/max(1, chunk_size)
+    for _, _, error in future.result():
+        STAGE_LATENCY.observe(elapsed, stage='summarize')
+        if error is None:
+            SUMMARIZED.inc()
+        else:
+            FAILED.inc(stage='summarize')
+
+class SummarizePool:
+    ''' Pool of summarize worker processes, summarization is CPU bound so it scale with processes instead of threads '''
+    def __init__(
+        self,
+        workers:int = 0,
+        compression_rate:float = .6,
+        algorithm:str = 'text_rank',
+        chunk_size:int = 4,
+        recycle_after:int = 0,
+        recycle_memory:float = 0
+        ):
+        """Constructor of SummarizePool class
+
+        Parameters
+        ----------
+        workers : int, optional
+            number of worker processes, 0 summarize in calling thread, by default 0
+        compression_rate : float, optional
+            original news compression rate, by default .6
+        algorithm : str, optional
+            summarize algorithm name, 'text_rank' or 'sentence_rank', by default 'text_rank'
+        chunk_size : int, optional
+            number of news that sent to a worker at a time, by default 4
+        recycle_after : int, optional
+            number of news that worker processes summarize before they are replaced by fresh processes so memory
+            retained by summarizers and tokenizers is released, 0 never replace them, by default 0
+        recycle_memory : float, optional
+            resident memory in MB of a worker process that worker processes are replaced after, 0 never replace them,
+            by default 0
+        """
+        self.__workers = max(0, workers)
+        self.__compression_rate = compression_rate
+        self.__algorithm = algorithm
+        self.__chunk_size = max(1, chunk_size)
+        self.__recycle_after = max(0, recycle_after)
+        self.__recycle_memory = max(0, recycle_memory)*1024*1024
+        self.__summarized = 0
+        self.__worker_rss = 0
+        self.__generation = 0
+        self.__executor = None
+        self.__lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @property
+    def chunk_size(self) -> int:
+        return self.__chunk_size
+
+    def start(self) -> 'SummarizePool':
+        """Start and warm up worker processes
+
+        Returns
+        -------
+        SummarizePool
+            return self
+        """
+        with self.__lock:
+            if self.__workers > 0 and self.__executor is None:
+                self.__executor = self.__new_executor()
+        return self
+
+    def __new_executor(self) -> ProcessPoolExecutor:
+        # chunks of old worker processes are tagged with older generation, their memory is not counted for new ones
+        self.__generation += 1
+        self.__summarized = 0
+        self.__worker_rss = 0
+        return ProcessPoolExecutor(
+            max_workers=self.__workers,
+            initializer=_init_worker,
+            initargs=(self.__compression_rate, self.__algorithm))
+
+    def __recycle(self) -> None:
+        """Replace worker processes that have reached news or memory limit, old processes exit after their queued chunks"""
+        if self.__recycle_after > 0 and self.__summarized >= self.__recycle_after:
+            reason = 'articles'
+        elif self.__recycle_memory > 0 and self.__worker_rss >= self.__recycle_memory:
+            reason = 'memory'
+        else:
+            return
+        self.__executor.shutdown(wait=False)
+        self.__executor = self.__new_executor()
+        WORKERS_RECYCLED.inc(reason=reason)
+
+    def __submit_worker(self, future:Future, chunk:List[Tuple[Any, str]], crashes:int) -> None:
+        """Submit a chunk to worker processes, a broken pool is replaced before the chunk is submitted"""
+        with self.__lock:
+            if self.__executor is None:
+                future.set_exception(Exception('Summarize pool is closed'))
+                return
+            self.__recycle()
+            try:
+                worker_future = self.__executor.submit(_summarize_chunk_measured, chunk, self.__compression_rate, self.__algorithm)
+            except BrokenProcessPool:
+                self.__replace_broken(self.__generation)
+                worker_future = self.__executor.submit(_summarize_chunk_measured, chunk, self.__compression_rate, self.__algorithm)
+            generation = self.__generation
+            self.__summarized += len(chunk)
+        worker_future.add_done_callback(partial(self.__measured, future, chunk, crashes, generation))
+
+    def __replace_broken(self, generation:int) -> None:
+        """Replace worker processes of a generation after one of them died, lock must be held, a pool is replaced once"""
+        if self.__generation != generation:
+            return
+        self.__executor.shutdown(wait=False)
+        self.__executor = self.__new_executor()
+        WORKERS_RECYCLED.inc(reason='crash')
+
+    def __measured(self, future:Future, chunk:List[Tuple[Any, str]], crashes:int, generation:int, worker_future:Future) -> None:
+        """Resolve future of submit with result of worker process and keep the largest memory of current worker processes, a chunk whose
+        worker processes crashed is submitted again to new processes so the crash is not counted as a failure of its news"""
+        if worker_future.cancelled():
+            future.cancel()
+            return
+        error = worker_future.exception()
+        if isinstance(error, BrokenProcessPool):
+            with self.__lock:
+                if self.__executor is not None:
+                    self.__replace_broken(generation)
+            if crashes+1 < MAX_CRASHES:
+                print('Summarize worker process died, chunk of {} news is submitted again'.format(len(chunk)))
+                self.__submit_worker(future, chunk, crashes+1)
+            else:
+                # chunk is likely to kill its worker process, its news fail like a summarize error
+                future.set_result([(key, content, repr(error)) for key, content in chunk])
+            return
+        if error is not None:
+            future.set_exception(error)
+            return
+        results, rss = worker_future.result()
+        RESIDENT_MEMORY.set(rss, process='summarize_worker')
+        with self.__lock:
+            if generation == self.__generation:
+                self.__worker_rss = max(self.__worker_rss, rss)
+        future.set_result(results)
+
+    def submit(self, chunk:List[Tuple[Any, str]]) -> Future:
+        """Summarize a chunk of news in a worker process
+
+        Parameters
+        ----------
+        chunk : List[Tuple[Any, str]]
+            list of key and content
+
+        Returns
+        -------
+        Future
+            future of list of key, summarized content and error or None
+        """
+        started = time.perf_counter()
+        if self.__executor is None:
+            future = Future()
+            future.set_result(_summarize_chunk(chunk, self.__compression_rate, self.__algorithm))
+        else:
+            future = Future()
+            self.__submit_worker(future, chunk, 0)
+        future.add_done_callback(partial(_record, len(chunk), started))
+        return future
+
+    def map_unordered(self, items:Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Any, str, str]]:
+        """Summarize news in chunks, results are yielded as soon as their chunk is done
+
+        Parameters
+        ----------
+        items : Iterable[Tuple[Any, str]]
+            list of key and content
+
+        Yields
+        -------
+        Iterator[Tuple[Any, str, str]]
+            key, summarized content and error or None in completion order
+        """
+        items = list(items)
+        futures = [self.submit(items[start:start+self.__chunk_size]) for start in range(0, len(items), self.__chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+    def close(self) -> None:
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+def default_workers() -> int:
+    """Number of worker processes that leave a core for scraping and api io
+
+    Returns
+    -------
+    int
+        number of workers
+    """
+    return max(1, (os.cpu_count() or 2)-1)
@@ -1,31 +1,76 @@
-import re
+import time
+import queue
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from types import SimpleNamespace
-from typing import List, Union, Tuple, Dict
-from newsScraper.scraper.SanookScraper import SanookScraper
-from newsScraper.scraper.Scraper import Scraper
+from typing import List, Union, Tuple, Dict, Iterator
+from newsScraper.scraper.Scraper import Scraper, NewsRecord
+from newsScraper.scraper.Transport import Transport, RequestCancelled
+from newsScraper.ScraperRegistry import ScraperRegistry, SCRAPERS
+from metrics.Instruments import TRACED, SCRAPED, FAILED, STAGE_LATENCY
+from metrics.Tracer import Tracer
 
 class NewsScraper(Scraper):
     ''' NewsScraper Adapter Class '''
     
-    def __init__(self, max_trace_limit:int = 10):
+    def __init__(self, max_trace_limit:int = 10, publisher_concurrency:int = 2, timeout:float = 300, registry:ScraperRegistry = SCRAPERS, session:requests.Session = None, tracer:Tracer = None, buffer_size:int = 32):
         """Constructor of Scraper class
         
         Parameters
         ----------
         max_trace_limit : int
             max number of limit that used in order to trace a news from news source
+        publisher_concurrency : int, optional
+            max number of concurrent requests into each publisher scraper, by default 2
+        timeout : float, optional
+            seconds to wait for all publishers in each trace or scrape call, slower publishers are skipped, time that
+            a stream consumer spends between news is not counted, by default 300
+        registry : ScraperRegistry, optional
+            registry of available publishers, a publisher scraper is constructed on its first use, by default SCRAPERS
+        session : requests.Session, optional
+            session used by transport of every publisher scraper e.g. replay.ReplaySession, by default a new session per publisher
+        tracer : Tracer, optional
+            tracer that every traced url is started in and scraped news are marked in, by default None no tracing
+        buffer_size : int, optional
+            max number of scraped news waiting for a stream consumer, publishers wait while it is full, by default 32
         """        
         super().__init__(max_trace_limit)
-        self.__scraper = {
-            "sanook": SanookScraper(max_trace_limit)
-        }
+        self.__registry = registry
+        self.__session = session
+        self.__scraper = {}
+        self.__transports = {}
+        self.__scraper_lock = threading.Lock()
         self.__PUBLISHER_NAME = {}
         self.__PUBLISHERS = {}
-        for key in self.__scraper.keys():
+        self.__publisher_concurrency = max(1, publisher_concurrency)
+        self.__timeout = timeout
+        self.__buffer_size = max(1, buffer_size)
+        self.__tracer = tracer if tracer is not None else Tracer()
+        self.__budgets = {}
+        for key in self.__registry.names:
             self.__PUBLISHER_NAME[key.upper()] = key
             self.__PUBLISHERS[key] = True
+            self.__budgets[key] = threading.BoundedSemaphore(self.__publisher_concurrency)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=len(self.__PUBLISHERS)*self.__publisher_concurrency,
+            thread_name_prefix='publisher')
         self.__PUBLISHER_NAME = SimpleNamespace(**self.__PUBLISHER_NAME) # Use for access element in dict with .
     
+    def close(self) -> None:
+        """Shut down publisher threads after their running calls and close sessions of publisher transports that
+        this scraper created, a closed scraper can not trace or scrape"""
+        self.__executor.shutdown(wait=True)
+        if self.__session is None:
+            for transport in self.__transports.values():
+                transport.session.close()
+
+    def __enter__(self) -> 'NewsScraper':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     @property
     def PUBLISHER_NAME(self) -> str:
         """Use for refer to publisher name
@@ -55,6 +100,29 @@ class NewsScraper(Scraper):
             else:
                 self.__PUBLISHERS[key] = False
     
+    def __get_scraper(self, publisher:str) -> Scraper:
+        """Get scraper of given publisher, the scraper is constructed on first call
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+
+        Returns
+        -------
+        Scraper
+            publisher scraper
+        """        
+        scraper = self.__scraper.get(publisher)
+        if scraper is None:
+            with self.__scraper_lock:
+                if publisher not in self.__scraper:
+                    self.__transports[publisher] = Transport(session=self.__session)
+                    self.__scraper[publisher] = self.__registry.create(
+                        publisher, self.MAX_TRACE_LIMIT, transport=self.__transports[publisher])
+                scraper = self.__scraper[publisher]
+        return scraper
+
     @property
     def base_url(self) -> dict:
         """Base urls of all request Api
@@ -65,12 +133,80 @@ class NewsScraper(Scraper):
             dictionary of all base urls where key is publisher name and value is url of request Api
         """        
         base_urls = {}
-        for key in self.__scraper:
+        for key in self.__PUBLISHERS:
             if self.__PUBLISHERS[key]:
-                base_urls[key] = self.__scraper[key].base_url
+                base_urls[key] = self.__get_scraper(key).base_url
         return base_urls
 
-    def trace(self, limit:int = 0, checkpoint:dict = {}) -> Tuple[List[str], Dict[str, str]]:
+    def __run_publisher(self, publisher:str, method:str, cancelled:threading.Event, *args, **kwargs):
+        """Call a method of publisher scraper within its concurrency budget
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        method : str
+            name of scraper method, 'trace' or 'scrape'
+        cancelled : threading.Event
+            event that is set when the caller timed out, requests of scraper stop and its budget is released
+
+        Returns
+        -------
+        Any
+            result of scraper method
+
+        Raises
+        ------
+        RequestCancelled
+            error when the call is cancelled before it finished
+        """        
+        with self.__budgets[publisher]:
+            scraper = self.__get_scraper(publisher)
+            with self.__transports[publisher].cancel_on(cancelled), STAGE_LATENCY.time(stage=method):
+                if cancelled.is_set():
+                    raise RequestCancelled(f'Publisher {publisher} is cancelled')
+                return getattr(scraper, method)(*args, **kwargs)
+
+    def __gather(self, futures:dict, cancelled:threading.Event, run_event:threading.Event = None) -> dict:
+        """Collect results of publisher futures as each publisher finishes, failed or timed out publishers are left out
+
+        Parameters
+        ----------
+        futures : dict
+            dictionary of future and publisher name
+        cancelled : threading.Event
+            event that the futures were started with, it is set on timeout so running publishers stop
+        run_event : threading.Event, optional
+            publishers are cancelled when this event is cleared, by default None
+
+        Returns
+        -------
+        dict
+            dictionary of publisher name and list of its results
+        """        
+        results = {}
+        deadline = time.monotonic()+self.__timeout
+        pending = set(futures)
+        while len(pending) != 0 and time.monotonic() < deadline and (run_event is None or run_event.is_set()):
+            timeout = deadline-time.monotonic() if run_event is None else min(.5, deadline-time.monotonic())
+            done, pending = wait(pending, timeout=max(0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                publisher = futures[future]
+                try:
+                    results.setdefault(publisher, []).append(future.result())
+                except Exception as err:
+                    FAILED.inc(stage='trace')
+                    print(f'Publisher {publisher} failed :', err)
+        if len(pending) != 0:
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+                if run_event is None or run_event.is_set():
+                    FAILED.inc(stage='trace')
+                    print(f'Publisher {futures[future]} timed out')
+        return results
+
+    def trace(self, limit:int = 0, checkpoint:dict = {}, run_event:threading.Event = None) -> Tuple[List[str], Dict[str, str]]:
         """Trace all news urls from all publisher since given checkpoint until reach the given limit
         
         Parameters
@@ -79,6 +215,9 @@ class NewsScraper(Scraper):
             trace limit 0 is mean as much as possible, by default 0
         checkpoint : dict, optional
             dictionary in pair of PUBLISHER_NAME and checkpoint, where checkpoint is mean the latest trace that can be a date-time format or [news_id], by default {}
+        run_event : threading.Event, optional
+            tracing stops at the next request of each publisher when this event is cleared, publishers that have not
+            finished are left out, by default None
         
         Returns
         -------
@@ -90,17 +229,28 @@ class NewsScraper(Scraper):
         ValueError
             error when some key of checkpoint that use to identify publisher not found in publisher list
         """     
-        if not all([x in self.__scraper.keys() for x in checkpoint]):
+        if not all([x in self.__PUBLISHERS for x in checkpoint]):
             raise ValueError("Invalid Key of checkpoint")
         latest_news_ids = {}
         limit = self.MAX_TRACE_LIMIT if limit == 0 else limit
+        started_at = time.time()
         traced_urls = []
-        for key in self.__scraper:
+        futures = {}
+        cancelled = threading.Event()
+        for key in self.__PUBLISHERS:
             if self.__PUBLISHERS[key]:
                 cp = [] if not key in checkpoint else checkpoint[key]
-                urls, latest_news_id = self.__scraper[key].trace(limit=self.MAX_TRACE_LIMIT, checkpoint=cp)
+                latest_news_ids[key] = []
+                future = self.__executor.submit(self.__run_publisher, key, 'trace', cancelled, limit=self.MAX_TRACE_LIMIT, checkpoint=cp)
+                futures[future] = key
+        for key, results in self.__gather(futures, cancelled, run_event).items():
+            for urls, latest_news_id in results:
                 latest_news_ids[key] = list(latest_news_id)
                 traced_urls += urls
+                TRACED.inc(len(urls), publisher=key)
+                for url in urls:
+                    self.__tracer.begin(url, at=started_at)
+                    self.__tracer.mark(url, 'trace')
         self.urls = traced_urls
         return traced_urls, latest_news_ids
     
@@ -115,40 +265,116 @@ class NewsScraper(Scraper):
         Returns
         -------
         str
-            publisher name that's the part of __scraper.keys()
+            publisher name that's the part of PUBLISHER_NAME
         """        
-        sanook_matcher = re.compile(r'^(http://|https://|https://www\.|http://www\.)sanook\.com/news/[0-9]{7}(/|)$').match
-        if bool(sanook_matcher(data)):
-            return self.PUBLISHER_NAME.SANOOK
-        return ''
+        return self.__registry.match(data)
     
-    def scrape(self, urls:Union[str, List[str]]=None) -> List[dict]:
-        """Scrape a news data from given url
+    @staticmethod
+    def __offer(news_queue:queue.Queue, item, cancelled:threading.Event) -> bool:
+        """Put item into bounded queue, wait while it is full until the stream is cancelled
+
+        Returns
+        -------
+        bool
+            False if the stream is cancelled before item is put
+        """        
+        while not cancelled.is_set():
+            try:
+                news_queue.put(item, timeout=.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __stream_publisher(self, publisher:str, urls:List[str], news_queue:queue.Queue, done:object, cancelled:threading.Event) -> None:
+        """Scrape given urls with publisher scraper within its concurrency budget and put each news record into queue
+
+        Parameters
+        ----------
+        publisher : str
+            publisher name
+        urls : List[str]
+            list of news urls of publisher
+        news_queue : queue.Queue
+            bounded queue of scraped news
+        done : object
+            sentinel that is put into queue with publisher name when scraping finished or failed
+        cancelled : threading.Event
+            event that is set when the consumer timed out or stopped, scraping stops at the next request
+        """        
+        try:
+            with self.__budgets[publisher]:
+                scraper = self.__get_scraper(publisher)
+                with self.__transports[publisher].cancel_on(cancelled):
+                    started = time.perf_counter()
+                    for record in scraper.iter_records(urls):
+                        # records are yielded as soon as each one is scraped, so the gap between them is the scrape time
+                        STAGE_LATENCY.observe(time.perf_counter()-started, stage='scrape')
+                        SCRAPED.inc(publisher=publisher)
+                        self.__tracer.mark(record.sourceUrl, 'scrape')
+                        if not self.__offer(news_queue, record, cancelled):
+                            break
+                        started = time.perf_counter()
+        except RequestCancelled:
+            pass
+        except Exception as err:
+            FAILED.inc(stage='scrape')
+            print(f'Publisher {publisher} failed :', err)
+        finally:
+            self.__offer(news_queue, (done, publisher), cancelled)
+
+    def iter_records(self, urls:Union[str, List[str]] = None, run_event:threading.Event = None) -> Iterator[NewsRecord]:
+        """Scrape news data from given urls of all publishers concurrently and yield each news record as soon as any publisher filtered it
         
         Parameters
         ----------
         urls : Union[str, List[str]], optional
             news url or list of news urls or None when the trace method has called before this method, by default None
+        run_event : threading.Event, optional
+            the stream ends and publishers stop at their next request when this event is cleared, by default None
         
-        Returns
+        Yields
         -------
-        List[dict]
-            list of news data 
+        NewsRecord
+            news record
         """        
-        if urls == None and len(self.urls) == 0:
-            return []
-        elif isinstance(urls, str):
-            urls = [urls]
-        elif isinstance(urls, list):
-            urls = urls
-        else:
-            urls = self.urls
-        scraped_list = []
-        for url in urls:
+        publisher_urls = {}
+        for url in self._resolve_urls(urls):
             publisher_name = self._filter(url)
             if bool(publisher_name):
-                scraped_data = self.__scraper[publisher_name].scrape(url)
-                if len(scraped_data) > 0:
-                    tmp_dict = dict(scraped_data[0]) # for some reason if not do this filtered_data will point to old memory address
-                    scraped_list.append(tmp_dict)
-        return scraped_list
\ No newline at end of file
+                publisher_urls.setdefault(publisher_name, []).append(url)
+        news_queue = queue.Queue(maxsize=self.__buffer_size)
+        done = object()
+        cancelled = threading.Event()
+        pending = []
+        for publisher_name, news_urls in publisher_urls.items():
+            # split urls into chunks so each publisher uses up to its concurrency budget
+            n_chunks = min(self.__publisher_concurrency, len(news_urls))
+            for index in range(n_chunks):
+                self.__executor.submit(self.__stream_publisher, publisher_name, news_urls[index::n_chunks], news_queue, done, cancelled)
+                pending.append(publisher_name)
+        # only time spent waiting for publishers counts, a slow consumer slows publishers down through the bounded queue
+        waited = 0.
+        try:
+            while len(pending) > 0 and (run_event is None or run_event.is_set()):
+                started = time.monotonic()
+                timeout = self.__timeout-waited if run_event is None else min(.5, self.__timeout-waited)
+                try:
+                    record = news_queue.get(timeout=max(0, timeout))
+                except queue.Empty:
+                    record = None
+                waited += time.monotonic()-started
+                if record is None:
+                    if waited < self.__timeout:
+                        continue
+                    for publisher_name in set(pending):
+                        FAILED.inc(stage='scrape')
+                        print(f'Publisher {publisher_name} timed out')
+                    return
+                if isinstance(record, tuple) and record[0] is done:
+                    pending.remove(record[1])
+                else:
+                    yield record
+        finally:
+            # publishers of a timed out or abandoned stream stop at their next request
+            cancelled.set()
@@ -0,0 +1,114 @@
+import re
+import threading
+from importlib import import_module
+from typing import Callable, List, Union
+from newsScraper.scraper.Scraper import Scraper
+
+class ScraperRegistry:
+    ''' Registry of publisher scraper factories and their news url patterns '''
+    def __init__(self):
+        self.__factories = {}
+        self.__routes = {}
+        self.__lock = threading.Lock()
+        self.__route_pattern = None
+
+    def register(self, name:str, factory:Union[str, Callable[[int], Scraper]], url_pattern:str) -> 'ScraperRegistry':
+        """Register a publisher scraper
+
+        Parameters
+        ----------
+        name : str
+            publisher name, must be a valid python identifier
+        factory : Union[str, Callable[[int], Scraper]]
+            scraper class or dotted path of scraper class e.g. 'newsScraper.scraper.SanookScraper.SanookScraper',
+            it is called with max_trace_limit and transport keyword on first use of publisher
+        url_pattern : str
+            regular expression of publisher news url without scheme
+
+        Returns
+        -------
+        ScraperRegistry
+            return self
+
+        Raises
+        ------
+        ValueError
+            error when publisher name is not a valid identifier or already registered
+        """
+        if not name.isidentifier():
+            raise ValueError('Invalid publisher name')
+        with self.__lock:
+            if name in self.__factories:
+                raise ValueError('Publisher already registered')
+            self.__factories[name] = factory
+            self.__routes[name] = url_pattern
+            self.__route_pattern = None
+        return self
+
+    @property
+    def names(self) -> List[str]:
+        """Names of all registered publishers
+
+        Returns
+        -------
+        List[str]
+            list of publisher name in registered order
+        """
+        return list(self.__factories.keys())
+
+    def __contains__(self, name:str) -> bool:
+        return name in self.__factories
+
+    def create(self, name:str, max_trace_limit:int, **kwargs) -> Scraper:
+        """Construct scraper of given publisher, scraper module is imported here when factory is a dotted path
+
+        Parameters
+        ----------
+        name : str
+            publisher name
+        max_trace_limit : int
+            max number of limit that used in order to trace a news from news source
+        **kwargs
+            keyword arguments of scraper constructor e.g. transport
+
+        Returns
+        -------
+        Scraper
+            new publisher scraper
+
+        Raises
+        ------
+        KeyError
+            error when publisher is not registered
+        """
+        factory = self.__factories[name]
+        if isinstance(factory, str):
+            module_name, class_name = factory.rsplit('.', 1)
+            factory = getattr(import_module(module_name), class_name)
+        return factory(max_trace_limit, **kwargs)
+
+    def match(self, url:str) -> str:
+        """Identify publisher of given news url
+
+        Parameters
+        ----------
+        url : str
+            news url
+
+        Returns
+        -------
+        str
+            publisher name or empty string when no publisher matched
+        """
+        pattern = self.__route_pattern
+        if pattern is None:
+            with self.__lock:
+                routes = '|'.join(f'(?P<{name}>{route})' for name, route in self.__routes.items())
+                pattern = self.__route_pattern = re.compile(r'^https?://(?:'+routes+r')$')
+        route = pattern.match(url)
+        if route is None:
+            return ''
+        return route.lastgroup
+
+SCRAPERS = ScraperRegistry()
+SCRAPERS.register('sanook', 'newsScraper.scraper.SanookScraper.SanookScraper', r'(?:www\.)?sanook\.com/news/[0-9]{7}/?')
@@ -1 +1,2 @@
-from newsScraper.NewsScraper import NewsScraper
\ No newline at end of file
+from newsScraper.NewsScraper import NewsScraper
+from newsScraper.ScraperRegistry import ScraperRegistry, SCRAPERS
\ No newline at end of file
@@ -1,17 +1,47 @@
 import requests
 import re
-from bs4 import BeautifulSoup
+import json
 from datetime import datetime
-from typing import List, Union, Tuple, Set
-from newsScraper.scraper.Scraper import Scraper
+from typing import List, Union, Tuple, Set, Dict, Iterator
+from newsScraper.scraper.Scraper import Scraper, NewsRecord
+from newsScraper.scraper.Transport import Transport, CircuitOpenError, RETRY_STATUS
+from newsScraper.utils import html_to_text
 from itertools import cycle
 
+NEWS_URL_PATTERN = re.compile(r'^(http://|https://|https://www\.|http://www\.)sanook\.com/news/[0-9]{7}(/|)$')
+NEWS_ID_PATTERN = re.compile(r'[0-9]{7}')
+
+# Only the fields that _filter_entry actually reads, no related entries or galleries
+ENTRY_FIELDS = '''
+    id
+    title
+    body
+    thumbnail
+    tags
+    createdAtdatetime
+    primaryCategory { name }
+    author { name realName }
+'''
+
 class SanookScraper(Scraper):
     ''' News scraper for sanook '''
-    def __init__(self, max_trace_limit:int = 100):
-        super().__init__(max_trace_limit)
+    def __init__(self, max_trace_limit:int = 100, batch_size:int = 10, transport:Transport = None):
+        """Constructor of SanookScraper class
+
+        Parameters
+        ----------
+        max_trace_limit : int, optional
+            max number of limit that used in order to trace a news from news source, by default 100
+        batch_size : int, optional
+            number of news entries fetched per request, 1 or less disable batch fetching, by default 10
+        transport : Transport, optional
+            http transport with rate limit, retry and circuit breaker, by default a new Transport
+        """        
+        super().__init__(max_trace_limit, transport)
         self.__NEWS_SITE = 'https://www.sanook.com/news/'
         self.__proxies_pool = cycle(self.get_proxies())
+        self.__batch_size = max(1, batch_size)
+        self.__batch_supported = self.__batch_size > 1
     
     @property
     def base_url(self) -> str:
@@ -42,7 +72,9 @@ class SanookScraper(Scraper):
         Raises
         ------
         Exception 'Call Sanook Api failed'
-            Occur when got bad status code from api or failed when tried to decode a response as json
+            Occur when got bad status code from api after all retries or failed when tried to decode a response as json
+        CircuitOpenError
+            Occur when Sanook api is paused after repeated failures
         """        
         latest_news_ids = []
         limit = self.MAX_TRACE_LIMIT if limit == 0 else limit
@@ -54,7 +86,7 @@ class SanookScraper(Scraper):
             'variables': qparam_variables,
             'extensions': qparam_extensions
             }
-        response = requests.get(self.base_url, params=qparams, headers=self.random_header(), proxies={"http": next(self.__proxies_pool)})
+        response = self._transport.get(self.base_url, params=qparams, headers=self.random_header(), proxies={"http": next(self.__proxies_pool)})
         if response.status_code not in self.PASS_STATUS:
             raise Exception('Call Sanook api failed.')
         try:
@@ -64,7 +96,7 @@ class SanookScraper(Scraper):
         try:
             edges = data['data']['entries']['edges']
         except:
-            print(data)
+            raise Exception('Call Sanook api failed.')
         traced_urls = []
         for edge in edges:
             node = edge['node']
@@ -77,7 +109,7 @@ class SanookScraper(Scraper):
         self.urls = traced_urls
         return traced_urls, set(latest_news_ids)
     
-    def _filter(self, data:dict) -> dict:
+    def _filter(self, data:dict) -> NewsRecord:
         """Filter a raw scraped data and give the clean one after processed
         
         Parameters
@@ -87,90 +119,217 @@ class SanookScraper(Scraper):
         
         Returns
         -------
-        dict
-            filtered scraped data
+        NewsRecord
+            filtered scraped data or None when news should be skipped
+        """        
+        return self._filter_entry(data['data']['entry'])
+
+    def _filter_entry(self, data:dict) -> NewsRecord:
+        """Filter a single news entry node of Sanook graph api
+
+        Parameters
+        ----------
+        data : dict
+            news entry node, the value of data.entry in getEntryWithGallery response
+
+        Returns
+        -------
+        NewsRecord
+            filtered scraped data or None when news should be skipped
         """        
-        data = data['data']['entry']
         if len(data['body']) > 1:
             # News content mostly will not be too long
-            return {}
+            return None
         sanook_url = f"{self.__NEWS_SITE}{data['id']}"
         dt_raw = data['createdAtdatetime'].split(' ')
         year, month, day = dt_raw[0].split('-')
         hour, minute = dt_raw[1].split(':')
         year, month, day, hour, minute = int(year), int(month), int(day), int(hour), int(minute)
         dt_isoformat = datetime(year, month, day, hour, minute).isoformat('T')+'Z' # create datetime according to RFC3339 format
-        content = BeautifulSoup(data['body'][0], features='html.parser').getText() # clean html tag with beautiful soup
-        
-        self._scraped_data['title'] = data['title'] or 'Untitled'
-        self._scraped_data['imageUrl'] = data['thumbnail'] or 'Undefined'
-        self._scraped_data['content'] = content
-        self._scraped_data['publisher'] = 'Sanook'
-        self._scraped_data['language'] = ['th']
-        self._scraped_data['tags'] = data['tags'] or []
-        self._scraped_data['publishAt'] = dt_isoformat
-        self._scraped_data['sourceUrl'] = sanook_url
+        content = html_to_text(data['body'][0]) # clean html tag
         try:
-            self._scraped_data['category'] = data['primaryCategory']['name'] or 'Undefined'
+            category = data['primaryCategory']['name'] or 'Undefined'
         except:
-            self._scraped_data['category'] = 'Undefined'
+            category = 'Undefined'
         try:
-            self._scraped_data['author'] = data['author']['name'] or data['author']['realName'] or 'Sanook'
+            author = data['author']['name'] or data['author']['realName'] or 'Sanook'
         except:
-            self._scraped_data['author'] = 'Sanook'
-        return self._scraped_data
-    
-    def scrape(self, urls:Union[str, List[str]] = None) -> List[dict]:
-        """Scrape a news data from given url
+            author = 'Sanook'
+        return NewsRecord(
+            title=data['title'] or 'Untitled',
+            imageUrl=data['thumbnail'] or 'Undefined',
+            content=content,
+            publisher='Sanook',
+            author=author,
+            language=['th'],
+            tags=data['tags'] or [],
+            category=category,
+            publishAt=dt_isoformat,
+            sourceUrl=sanook_url)
+
+    def __url_to_id(self, url:str) -> str:
+        """Extract news id from given sanook news url
+
+        Parameters
+        ----------
+        url : str
+            sanook news url
+
+        Returns
+        -------
+        str
+            news id
+
+        Raises
+        ------
+        ValueError
+            error when given url is not a sanook news url
+        """        
+        if bool(NEWS_URL_PATTERN.match(url)):
+            return NEWS_ID_PATTERN.search(url).group()
+        raise ValueError('Invalid url')
+
+    def __fetch_entry(self, id:str) -> dict:
+        """Fetch a single news entry with getEntryWithGallery persisted query
+
+        Parameters
+        ----------
+        id : str
+            news id
+
+        Returns
+        -------
+        dict
+            news entry node or empty dictionary when request failed
+        """        
+        qparam_operationName = 'getEntryWithGallery'
+        qparam_extensions = '{"persistedQuery":{"version":1,"sha256Hash":"2d493971ae139330de9de1c8e8494561d27b2d11"}}'
+        qparam_variables = '{"id":"'+str(id)+'","channel":"news","relatedLimit":0,"relatedGalleryFirst":0,"oppaChannel":"news","oppaCategorySlugs":[]}'
+        qparams = {
+            'operationName':qparam_operationName,
+            'variables': qparam_variables,
+            'extensions': qparam_extensions
+            }
+        try:
+            response = self._transport.get(self.base_url, params=qparams, headers=self.random_header(), proxies={"http": next(self.__proxies_pool)})
+        except requests.RequestException:
+            return {}
+        if response.status_code not in self.PASS_STATUS:
+            return {}
+        try:
+            return response.json()['data']['entry'] or {}
+        except (ValueError, KeyError, TypeError):
+            return {}
+
+    def __fetch_entries(self, ids:List[str]) -> Dict[str, dict]:
+        """Fetch many news entries in one request, each entry is an aliased field of a single graphql query
+
+        Parameters
+        ----------
+        ids : List[str]
+            list of news ids
+
+        Returns
+        -------
+        Dict[str, dict]
+            dictionary of news id and its entry node, ids that api did not return are left out
+
+        Raises
+        ------
+        ValueError
+            error when api rejects the batch query, e.g. only persisted queries are allowed
+        requests.RequestException
+            error when the request failed for a transient reason, connection error, 429 or 5xx status or a cut response
+        """        
+        aliases = ''.join(
+            f'e{index}: entry(id: "{id}", channel: "news") {{{ENTRY_FIELDS}}}\n'
+            for index, id in enumerate(ids))
+        body = {'operationName': 'getEntries', 'query': 'query getEntries {\n'+aliases+'}', 'variables': {}}
+        headers = self.random_header()
+        headers['Content-Type'] = 'application/json'
+        response = self._transport.post(self.base_url, data=json.dumps(body), headers=headers, proxies={"http": next(self.__proxies_pool)})
+        if response.status_code in RETRY_STATUS:
+            raise requests.HTTPError('Batch query failed with status {}'.format(response.status_code), response=response)
+        if response.status_code not in self.PASS_STATUS:
+            raise ValueError('Batch query rejected')
+        try:
+            result = response.json()
+        except ValueError:
+            raise requests.RequestException('Batch query returned invalid json')
+        data = result.get('data') if isinstance(result, dict) else None
+        if not isinstance(data, dict):
+            # graphql errors without data, the query itself is not accepted
+            raise ValueError('Batch query rejected')
+        entries = {}
+        for index, id in enumerate(ids):
+            entry = data.get(f'e{index}')
+            if bool(entry):
+                entries[id] = entry
+        return entries
+
+    def _iter_fetch(self, ids:List[str]) -> Iterator[Tuple[str, dict]]:
+        """Fetch news entries of given ids, batch requests are used until the api rejects one then fall back to per news requests,
+        news of a batch that failed for a transient reason are fetched per news, fetching stops when the circuit breaker pauses Sanook api
+        
+        Parameters
+        ----------
+        ids : List[str]
+            list of news ids
+        
+        Yields
+        -------
+        Tuple[str, dict]
+            news id and its entry node, as soon as the request of the entry is done
+        """        
+        fetched = set()
+        try:
+            if self.__batch_supported:
+                for start in range(0, len(ids), self.__batch_size):
+                    chunk = ids[start:start+self.__batch_size]
+                    try:
+                        entries = self.__fetch_entries(chunk)
+                    except ValueError:
+                        self.__batch_supported = False
+                        break
+                    except requests.RequestException as err:
+                        print('Sanook batch query failed, its news are fetched one by one :', err)
+                        continue
+                    for id in chunk:
+                        if id in entries:
+                            fetched.add(id)
+                            yield id, entries[id]
+            for id in ids:
+                if id not in fetched:
+                    entry = self.__fetch_entry(id)
+                    if bool(entry):
+                        fetched.add(id)
+                        yield id, entry
+        except CircuitOpenError as err:
+            print('Sanook scraper paused :', err)
+
+    def iter_records(self, urls:Union[str, List[str]] = None) -> Iterator[NewsRecord]:
+        """Scrape news data from given urls and yield each news record as soon as it is filtered
         
         Parameters
         ----------
         urls : Union[str, List[str]], optional
             news url or list of news urls or None when the trace method has called before this method, by default None
         
-        Returns
+        Yields
         -------
-        List[dict]
-            list of news data 
+        NewsRecord
+            news record
         
         Raises
         ------
         ValueError
-            error when have no url in urls or hasn't call trace method before
+            error when some of given urls is not a sanook news url
         """        
-        if urls == None and len(self.urls) == 0:
-            return []
-        elif isinstance(urls, str):
-            urls = [urls]
-        elif isinstance(urls, list):
-            urls = urls
-        else:
-            urls = self.urls
-        filtered_list = []
-        qparam_operationName = 'getEntryWithGallery'
-        qparam_extensions = '{"persistedQuery":{"version":1,"sha256Hash":"2d493971ae139330de9de1c8e8494561d27b2d11"}}'
-        for url in urls:
-            url_matcher = re.compile(r'^(http://|https://|https://www\.|http://www\.)sanook\.com/news/[0-9]{7}(/|)$').match
-            id_matcher = re.compile(r'[0-9]{7}').search
-            if bool(url_matcher(url)):
-                id = id_matcher(url).group()
-            else:
-                raise ValueError('Invalid url')
-            qparam_variables = '{"id":"'+str(id)+'","channel":"news","relatedLimit":5,"relatedGalleryFirst":6,"oppaChannel":"news","oppaCategorySlugs":[]}'
-            qparams = {
-                'operationName':qparam_operationName,
-                'variables': qparam_variables,
-                'extensions': qparam_extensions
-                }
-            response = requests.get(self.base_url, params=qparams, headers=self.random_header(), proxies={"http": next(self.__proxies_pool)})
-            if response.status_code not in self.PASS_STATUS:
+        ids = [self.__url_to_id(url) for url in self._resolve_urls(urls)]
+        for id, entry in self._iter_fetch(ids):
+            try:
+                record = self._filter_entry(entry)
+            except (ValueError, KeyError, TypeError, IndexError) as err:
                 continue
-            else:
-                try:
-                    filtered_data = self._filter(response.json())
-                except ValueError as err:
-                    continue
-                if bool(filtered_data) :
-                    tmp_dict = dict(filtered_data) # for some reason if not do this filtered_data will point to old memory address
-                    filtered_list.append(tmp_dict)
-        return filtered_list
\ No newline at end of file
+            if record is not None:
+                yield record
@@ -1,7 +1,24 @@
-import collections, re, random, requests
+import collections, re, random, requests, asyncio, threading
 from bs4 import BeautifulSoup
-from typing import List, Tuple, Union
+from typing import List, Tuple, Union, Iterator, AsyncIterator
 from abc import ABC, abstractmethod
+from newsScraper.scraper.Transport import Transport
+from metrics.Instruments import PROXY_POOL_SIZE
+
+LEGAL_KEYS = (
+    "title",
+    "imageUrl",
+    "content",
+    "publisher",
+    "author",
+    "language",
+    "tags",
+    "category",
+    "publishAt",
+    "sourceUrl"
+)
+LEGAL_KEY_SET = frozenset(LEGAL_KEYS)
+ISO8601_PATTERN = re.compile(r'^(-?(?:[1-9][0-9]*)?[0-9]{4})-(1[0-2]|0[1-9])-(3[01]|0[1-9]|[12][0-9])T(2[0-3]|[01][0-9]):([0-5][0-9]):([0-5][0-9])(\.[0-9]+)?(Z|[+-](?:2[0-3]|[01][0-9]):[0-5][0-9])?$')
 
 class ScrapeData(dict):
     def __init__(self, iterable:dict = {}):
@@ -16,19 +33,7 @@ class ScrapeData(dict):
         List[str]
             list of legal key
         """        
-        LEGAL_KEY_LIST = [
-            "title",
-            "imageUrl",
-            "content",
-            "publisher",
-            "author",
-            "language",
-            "tags",
-            "category",
-            "publishAt",
-            "sourceUrl"
-        ]
-        return LEGAL_KEY_LIST
+        return list(LEGAL_KEYS)
 
     def __validate_iso8601(self, dt_str:str) -> bool:
         """Validate an ISO8601 format from given datetime string
@@ -43,9 +48,8 @@ class ScrapeData(dict):
         bool
             validate result
         """        
-        matcher = re.compile(r'^(-?(?:[1-9][0-9]*)?[0-9]{4})-(1[0-2]|0[1-9])-(3[01]|0[1-9]|[12][0-9])T(2[0-3]|[01][0-9]):([0-5][0-9]):([0-5][0-9])(\.[0-9]+)?(Z|[+-](?:2[0-3]|[01][0-9]):[0-5][0-9])?$').match
         try:
-            if matcher(dt_str) is not None:
+            if ISO8601_PATTERN.match(dt_str) is not None:
                 return True
             else:
                 return False
@@ -53,7 +57,7 @@ class ScrapeData(dict):
             return False
 
     def __setitem__(self, key, value):
-        if key in self.legal_key:
+        if key in LEGAL_KEY_SET:
             if key == 'publishAt':
                 if not self.__validate_iso8601(value):
                     raise ValueError('Illegal datetime format')
@@ -65,30 +69,101 @@ class ScrapeData(dict):
         else:
             raise ValueError('Illegal key')
 
+class NewsRecord:
+    ''' Immutable news record, validated once at construction '''
+    __slots__ = LEGAL_KEYS
+
+    def __init__(
+        self,
+        title:str,
+        imageUrl:str,
+        content:str,
+        publisher:str,
+        author:str,
+        language:List[str],
+        tags:List[str],
+        category:str,
+        publishAt:str,
+        sourceUrl:str
+        ):
+        """Constructor of NewsRecord class, parameters are the same as legal keys of ScrapeData
+
+        Raises
+        ------
+        ValueError
+            error when publishAt is not ISO8601 format or tags or language is not a list
+        """        
+        if not isinstance(publishAt, str) or ISO8601_PATTERN.match(publishAt) is None:
+            raise ValueError('Illegal datetime format')
+        if not isinstance(tags, (list, tuple)):
+            raise ValueError('Illegal tags type')
+        if not isinstance(language, (list, tuple)):
+            raise ValueError('Illegal language type')
+        setter = object.__setattr__
+        setter(self, 'title', title)
+        setter(self, 'imageUrl', imageUrl)
+        setter(self, 'content', content)
+        setter(self, 'publisher', publisher)
+        setter(self, 'author', author)
+        setter(self, 'language', tuple(language))
+        setter(self, 'tags', tuple(tags))
+        setter(self, 'category', category)
+        setter(self, 'publishAt', publishAt)
+        setter(self, 'sourceUrl', sourceUrl)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('NewsRecord is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('NewsRecord is immutable')
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NewsRecord):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in LEGAL_KEYS)
+
+    def __hash__(self) -> int:
+        return hash(self.sourceUrl)
+
+    def __repr__(self) -> str:
+        return f'NewsRecord(sourceUrl={self.sourceUrl!r}, title={self.title!r})'
+
+    def to_payload(self) -> dict:
+        """Serialize record into a request body of New-sREST raw news api
+        
+        Returns
+        -------
+        dict
+            news data
+        """        
+        return {
+            "title": self.title,
+            "imageUrl": self.imageUrl,
+            "content": self.content,
+            "publisher": self.publisher,
+            "author": self.author,
+            "language": list(self.language),
+            "tags": list(self.tags),
+            "category": self.category,
+            "publishAt": self.publishAt,
+            "sourceUrl": self.sourceUrl
+        }
+
 class Scraper(ABC):
     ''' Abstract class for scraper '''
-    def __init__(self, max_trace_limit:int):
+    def __init__(self, max_trace_limit:int, transport:Transport = None):
         """Constructor of Scraper class
         
         Parameters
         ----------
         max_trace_limit : int
             max number of limit that used in order to trace a news from news source
+        transport : Transport, optional
+            http transport with rate limit, retry and circuit breaker, by default a new Transport on the first request
         """        
-        self._scraped_data = ScrapeData({
-            "title":"",
-            "imageUrl":"",
-            "content":"",
-            "author":"",
-            "publisher":"",
-            "language": [],
-            "tags": [],
-            "category": "",
-            "publishAt": "",
-            "sourceUrl": ""
-        })
-        self.__urls = [],
+        self.__urls = []
         self.__MAX_TRACE_LIMIT = max_trace_limit
+        self.__transport = transport
         self.__HEADERS_LIST = [
             'Mozilla/5.0 (Windows; U; Windows NT 6.1; x64; fr; rv:1.9.2.13) Gecko/20101203 Firebird/3.6.13',
             'Mozilla/5.0 (compatible, MSIE 11, Windows NT 6.3; Trident/7.0; rv:11.0) like Gecko',
@@ -97,6 +172,13 @@ class Scraper(ABC):
             'Mozilla/5.0 (Windows NT 5.2; RW; rv:7.0a1) Gecko/20091211 SeaMonkey/9.23a1pre'
         ]
 
+    @property
+    def _transport(self) -> Transport:
+        """Http transport of this scraper, it is created on first use so adapters that never send a request do not hold one"""
+        if self.__transport is None:
+            self.__transport = Transport()
+        return self.__transport
+
     @property
     def PASS_STATUS(self) -> List[int]:
         """Status code of response successfully
@@ -205,7 +287,7 @@ class Scraper(ABC):
         limit = self.MAX_TRACE_LIMIT if limit == 0 else limit
 
     @abstractmethod
-    def _filter(self, data:Union[dict, str]) -> dict:
+    def _filter(self, data:Union[dict, str]) -> NewsRecord:
         """Filter a raw scraped data and give the clean one after processed
         
         Parameters
@@ -215,14 +297,13 @@ class Scraper(ABC):
         
         Returns
         -------
-        dict
-            filtered scraped data
+        NewsRecord
+            filtered scraped data or None when data should be skipped
         """        
         pass
 
-    @abstractmethod
-    def scrape(self, urls:Union[str, List[str]] = None) -> List[dict]:
-        """Scrape a news data from given url
+    def _resolve_urls(self, urls:Union[str, List[str]] = None) -> List[str]:
+        """Resolve urls argument of scrape methods into a list of urls
         
         Parameters
         ----------
@@ -231,17 +312,110 @@ class Scraper(ABC):
         
         Returns
         -------
-        List[dict]
-            list of news data 
+        List[str]
+            list of news urls
         """        
         if urls == None and len(self.urls) == 0:
             return []
         elif isinstance(urls, str):
-            urls = [urls]
+            return [urls]
         elif isinstance(urls, list):
-            urls = urls
+            return urls
         else:
-            urls = self.urls
+            return self.urls
+
+    @abstractmethod
+    def iter_records(self, urls:Union[str, List[str]] = None) -> Iterator[NewsRecord]:
+        """Scrape news data from given urls and yield each news record as soon as it is filtered
+        
+        Parameters
+        ----------
+        urls : Union[str, List[str]], optional
+            news url or list of news urls or None when the trace method has called before this method, by default None
+        
+        Yields
+        -------
+        NewsRecord
+            news record
+        """        
+        pass
+
+    def iter_scrape(self, urls:Union[str, List[str]] = None) -> Iterator[dict]:
+        """Scrape news data from given urls and yield each news as soon as it is filtered
+        
+        Parameters
+        ----------
+        urls : Union[str, List[str]], optional
+            news url or list of news urls or None when the trace method has called before this method, by default None
+        
+        Yields
+        -------
+        dict
+            news data
+        """        
+        for record in self.iter_records(urls):
+            yield record.to_payload()
+
+    def scrape(self, urls:Union[str, List[str]] = None) -> List[dict]:
+        """Scrape a news data from given url
+        
+        Parameters
+        ----------
+        urls : Union[str, List[str]], optional
+            news url or list of news urls or None when the trace method has called before this method, by default None
+        
+        Returns
+        -------
+        List[dict]
+            list of news data 
+        """        
+        return list(self.iter_scrape(urls))
+
+    async def aiter_scrape(self, urls:Union[str, List[str]] = None, buffer_size:int = 32) -> AsyncIterator[dict]:
+        """Asynchronous version of iter_scrape, scraping is run in the default executor of running event loop
+        
+        Parameters
+        ----------
+        urls : Union[str, List[str]], optional
+            news url or list of news urls or None when the trace method has called before this method, by default None
+        buffer_size : int, optional
+            max number of scraped news waiting for the consumer, scraping waits while it is full, by default 32
+        
+        Yields
+        -------
+        dict
+            news data
+        """        
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=max(1, buffer_size))
+        done = object()
+        stopped = threading.Event()
+        def produce():
+            news_iterator = self.iter_scrape(urls)
+            try:
+                for news in news_iterator:
+                    if stopped.is_set():
+                        break
+                    asyncio.run_coroutine_threadsafe(queue.put(news), loop).result()
+            finally:
+                news_iterator.close()
+                if not stopped.is_set():
+                    asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                news = await queue.get()
+                if news is done:
+                    break
+                yield news
+            await producer # raise error of producer if any
+        finally:
+            # consumer stopped early, unblock producer so it can stop scraping
+            stopped.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([producer], timeout=.1)
 
     def random_header(self) -> dict:
         """Random a heder that use for change request header
@@ -259,15 +433,20 @@ class Scraper(ABC):
         Returns
         -------
         List[str]
-            A list of proxies
+            A list of proxies or [''] mean no proxy when proxy list is unavailable
         """        
-        res = requests.get(self.PROXY_URL)
-        soup = BeautifulSoup(res.text, 'lxml')
-        table = soup.find('table',id='proxylisttable')
-        list_tr = table.find_all('tr')
+        try:
+            res = self._transport.session.get(self.PROXY_URL, timeout=30)
+            soup = BeautifulSoup(res.text, 'lxml')
+            table = soup.find('table',id='proxylisttable')
+            list_tr = table.find_all('tr')
+        except (requests.RequestException, AttributeError):
+            PROXY_POOL_SIZE.set(0, scraper=type(self).__name__)
+            return ['']
         list_td = [elem.find_all('td') for elem in list_tr]
         list_td = list(filter(None, list_td))
         list_ip = [elem[0].text for elem in list_td]
         list_ports = [elem[1].text for elem in list_td]
         list_proxies = [':'.join(elem) for elem in list(zip(list_ip, list_ports))]
-        return list_proxies               
\ No newline at end of file
+        PROXY_POOL_SIZE.set(len(list_proxies), scraper=type(self).__name__)
+        return list_proxies or ['']
\ No newline at end of file
@@ -0,0 +1,306 @@
+import time
+import random
+import threading
+import requests
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from typing import Iterator, Optional
+from metrics.Instruments import HTTP_LATENCY, HTTP_FAILURES, CIRCUIT_OPEN
+
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+
+class CircuitOpenError(Exception):
+    ''' Raised when a request is made while the circuit breaker is open '''
+    pass
+
+class RequestCancelled(Exception):
+    ''' Raised when a request is made after the caller has given up waiting for its result '''
+    pass
+
+class TokenBucket:
+    ''' Thread-safe token bucket that limits a request rate '''
+    def __init__(self, rate:float, capacity:int):
+        """Constructor of TokenBucket class
+
+        Parameters
+        ----------
+        rate : float
+            number of tokens refilled per second
+        capacity : int
+            max number of tokens, the allowed burst size
+        """
+        self.__rate = rate
+        self.__capacity = max(1, capacity)
+        self.__tokens = float(self.__capacity)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self.__tokens = min(self.__capacity, self.__tokens + (now-self.__updated)*self.__rate)
+        self.__updated = now
+
+    def acquire(self) -> float:
+        """Take a token, block until a token is available
+
+        Returns
+        -------
+        float
+            seconds spent waiting for a token
+        """
+        waited = 0.
+        while True:
+            with self.__lock:
+                self.__refill()
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return waited
+                wait = (1-self.__tokens)/self.__rate
+            time.sleep(wait)
+            waited += wait
+
+class CircuitBreaker:
+    ''' Circuit breaker that stop calls to a failing service for a while '''
+    def __init__(self, failure_threshold:int = 5, reset_timeout:float = 60):
+        """Constructor of CircuitBreaker class
+
+        Parameters
+        ----------
+        failure_threshold : int, optional
+            number of consecutive failures that open the circuit, by default 5
+        reset_timeout : float, optional
+            seconds to keep the circuit open before letting a trial call through, by default 60
+        """
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial = False
+        self.__lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state of circuit
+
+        Returns
+        -------
+        str
+            'closed', 'open' or 'half-open'
+        """
+        with self.__lock:
+            if self.__opened_at is None:
+                return 'closed'
+            if time.monotonic()-self.__opened_at >= self.__reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Check whether or not a call is allowed, only one trial call is allowed while half-open
+
+        Returns
+        -------
+        bool
+            True if call is allowed
+        """
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if time.monotonic()-self.__opened_at < self.__reset_timeout or self.__trial:
+                return False
+            self.__trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial or self.__failures >= self.__failure_threshold:
+                self.__opened_at = time.monotonic()
+            self.__trial = False
+
+class Transport:
+    ''' Http transport of scraper with per host rate limit, retry with backoff and circuit breaker '''
+    def __init__(
+        self,
+        rate:float = 2.,
+        burst:int = 4,
+        max_retries:int = 4,
+        backoff_base:float = .5,
+        backoff_max:float = 60.,
+        failure_threshold:int = 5,
+        reset_timeout:float = 120.,
+        timeout:float = 30.,
+        session:Optional[requests.Session] = None
+        ):
+        """Constructor of Transport class
+
+        Parameters
+        ----------
+        rate : float, optional
+            allowed requests per second to each host, by default 2.
+        burst : int, optional
+            allowed burst of requests to each host, by default 4
+        max_retries : int, optional
+            number of retries after a failed request, by default 4
+        backoff_base : float, optional
+            base delay in seconds of exponential backoff, by default .5
+        backoff_max : float, optional
+            max delay in seconds between retries, by default 60.
+        failure_threshold : int, optional
+            number of consecutive failed requests that pause the publisher, by default 5
+        reset_timeout : float, optional
+            seconds to pause the publisher after circuit opened, by default 120.
+        timeout : float, optional
+            timeout in seconds of each request, by default 30.
+        session : requests.Session, optional
+            session used to send requests, by default a new session
+        """
+        self.__rate = rate
+        self.__burst = burst
+        self.__max_retries = max_retries
+        self.__backoff_base = backoff_base
+        self.__backoff_max = backoff_max
+        self.__timeout = timeout
+        self.__buckets = {}
+        self.__buckets_lock = threading.Lock()
+        self.__breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.__local = threading.local()
+        self.__session = session or requests.Session()
+
+    @property
+    def session(self) -> requests.Session:
+        return self.__session
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self.__breaker
+
+    def __bucket(self, url:str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self.__buckets_lock:
+            if host not in self.__buckets:
+                self.__buckets[host] = TokenBucket(self.__rate, self.__burst)
+            return self.__buckets[host]
+
+    def __backoff(self, attempt:int, response:Optional[requests.Response] = None) -> float:
+        """Get delay before the next retry, Retry-After header is honored when given
+
+        Parameters
+        ----------
+        attempt : int
+            number of failed attempts
+        response : requests.Response, optional
+            failed response, by default None
+
+        Returns
+        -------
+        float
+            delay in seconds
+        """
+        delay = random.uniform(0, min(self.__backoff_max, self.__backoff_base*(2**attempt))) # full jitter
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    delay = float(retry_after)
+                except ValueError:
+                    try:
+                        retry_at = parsedate_to_datetime(retry_after)
+                        delay = (retry_at-datetime.now(timezone.utc)).total_seconds()
+                    except (TypeError, ValueError):
+                        pass
+                delay = min(self.__backoff_max, max(0, delay))
+        return delay
+
+    @contextmanager
+    def cancel_on(self, cancelled:threading.Event) -> Iterator[None]:
+        """Stop requests of calling thread once the event is set, a request that is being sent is finished
+        but no further attempt or request is made
+
+        Parameters
+        ----------
+        cancelled : threading.Event
+            event that is set when the result is not needed anymore e.g. the caller timed out
+        """
+        previous = getattr(self.__local, 'cancelled', None)
+        self.__local.cancelled = cancelled
+        try:
+            yield
+        finally:
+            self.__local.cancelled = previous
+
+    def request(self, method:str, url:str, **kwargs) -> requests.Response:
+        """Send a request, retry on connection error, 429 and 5xx status
+
+        Parameters
+        ----------
+        method : str
+            http method
+        url : str
+            request url
+        **kwargs
+            keyword arguments of requests.Session.request
+
+        Returns
+        -------
+        requests.Response
+            response of the last attempt
+
+        Raises
+        ------
+        CircuitOpenError
+            error when publisher is paused by circuit breaker
+        RequestCancelled
+            error when the call of calling thread is cancelled, see cancel_on
+        requests.RequestException
+            error when every attempts failed with connection error
+        """
+        kwargs.setdefault('timeout', self.__timeout)
+        bucket = self.__bucket(url)
+        target = urlsplit(url).netloc
+        cancelled = getattr(self.__local, 'cancelled', None)
+        attempt = 0
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise RequestCancelled(f'Request to {target} is cancelled')
+            if not self.__breaker.allow():
+                CIRCUIT_OPEN.set(1, target=target)
+                raise CircuitOpenError(f'Circuit open for {target}')
+            bucket.acquire()
+            response = None
+            started = time.perf_counter()
+            try:
+                response = self.__session.request(method, url, **kwargs)
+            except requests.RequestException as err:
+                HTTP_FAILURES.inc(target=target)
+                self.__breaker.record_failure()
+                if attempt >= self.__max_retries:
+                    raise err
+            else:
+                HTTP_LATENCY.observe(time.perf_counter()-started, target=target, method=method)
+                if response.status_code not in RETRY_STATUS:
+                    self.__breaker.record_success()
+                    CIRCUIT_OPEN.set(0, target=target)
+                    return response
+                HTTP_FAILURES.inc(target=target)
+                self.__breaker.record_failure()
+                if attempt >= self.__max_retries:
+                    return response
+            if cancelled is not None:
+                cancelled.wait(self.__backoff(attempt, response))
+            else:
+                time.sleep(self.__backoff(attempt, response))
+            attempt += 1
+
+    def get(self, url:str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url:str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
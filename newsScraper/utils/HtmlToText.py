@@ -0,0 +1,78 @@
+from html.parser import HTMLParser
+from typing import List
+
+ASCII_SPACES = str.maketrans('', '', '\x20\x0a\x09\x0c\x0d')
+# code and inert markup are not news text, BeautifulSoup 4.8.2 that is pinned in env.yml keeps them
+SKIP_TAGS = frozenset(['script', 'style', 'template'])
+PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+
+def _collapse(text:str) -> str:
+    """Collapse a whitespace only text node the same way as BeautifulSoup does
+
+    Parameters
+    ----------
+    text : str
+        text node
+
+    Returns
+    -------
+    str
+        '\\n' when text is whitespace only and contains a newline, ' ' when text is whitespace only, otherwise text
+    """    
+    if text.translate(ASCII_SPACES):
+        return text
+    return '\n' if '\n' in text else ' '
+
+class _TagStripper(HTMLParser):
+    ''' Streaming html tag stripper that keep only text nodes '''
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.__texts = []
+        self.__skip = 0
+        self.__preserve = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.__skip += 1
+        elif tag in PRESERVE_WHITESPACE_TAGS:
+            self.__preserve += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self.__skip > 0:
+            self.__skip -= 1
+        elif tag in PRESERVE_WHITESPACE_TAGS and self.__preserve > 0:
+            self.__preserve -= 1
+
+    def handle_data(self, data):
+        if self.__skip == 0:
+            self.__texts.append(data if self.__preserve > 0 else _collapse(data))
+
+    @property
+    def texts(self) -> List[str]:
+        return self.__texts
+
+def html_to_text(document:str) -> str:
+    """Extract text content from given html document, give the same result as 
+    BeautifulSoup(document, features='html.parser').getText() without building a soup tree, except that text of
+    script, style and template tags is dropped like recent BeautifulSoup releases do
+
+    Parameters
+    ----------
+    document : str
+        html document
+
+    Returns
+    -------
+    str
+        text content of document
+    """    
+    if not document:
+        return ''
+    stripper = _TagStripper()
+    stripper.feed(document)
+    stripper.close()
+    return ''.join(stripper.texts)
+
+__all__ = [
+    'html_to_text'
+]
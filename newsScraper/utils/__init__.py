@@ -0,0 +1 @@
+from newsScraper.utils.HtmlToText import html_to_text
@@ -0,0 +1,50 @@
+import json
+import threading
+import requests
+from typing import Optional
+
+class RecordingSession(requests.Session):
+    ''' requests.Session that record every http exchange into a fixture file '''
+    def __init__(self, fixture_path:str, session:Optional[requests.Session] = None):
+        """Constructor of RecordingSession class
+
+        Parameters
+        ----------
+        fixture_path : str
+            path of fixture file, each exchange is appended as one json line
+        session : requests.Session, optional
+            session used to send real requests, by default this session itself
+        """
+        super().__init__()
+        self.__fixture_path = fixture_path
+        self.__session = session
+        self.__lock = threading.Lock()
+
+    @property
+    def fixture_path(self) -> str:
+        return self.__fixture_path
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        if self.__session is not None:
+            response = self.__session.request(method, url, *args, **kwargs)
+        else:
+            response = super().request(method, url, *args, **kwargs)
+        request = response.request
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', errors='replace')
+        exchange = {
+            'method': request.method,
+            'url': request.url,
+            'body': body,
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'response': response.content.decode(response.encoding or 'utf-8', errors='replace')
+        }
+        # content is decoded already, the recorded body must not be marked as compressed
+        for header in ('Content-Encoding', 'Content-Length', 'Transfer-Encoding'):
+            exchange['headers'].pop(header, None)
+        with self.__lock:
+            with open(self.__fixture_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(exchange, ensure_ascii=False)+'\n')
+        return response
@@ -0,0 +1,151 @@
+import json
+import time
+import random
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+from typing import Iterator, List, Tuple, Union
+
+class ReplayResponse:
+    ''' Minimal stand-in of requests.Response that is served from a fixture '''
+    def __init__(self, method:str, url:str, status_code:int, headers:dict, text:str):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.encoding = 'utf-8'
+        self.url = url
+        self.request = requests.Request(method, url).prepare()
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def iter_content(self, chunk_size:int = 1, decode_unicode:bool = False) -> Iterator[Union[bytes, str]]:
+        data = self.text if decode_unicode else self.content
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start+chunk_size]
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f'{self.status_code} Error for url: {self.url}', response=self)
+
+    def close(self) -> None:
+        pass
+
+class ReplaySession:
+    ''' Drop-in replacement of requests.Session that serve recorded http exchanges from fixture files '''
+    def __init__(
+        self,
+        *fixture_paths:Tuple[str],
+        latency:Union[float, Tuple[float, float]] = 0,
+        error_rate:float = 0,
+        error_status:int = 503,
+        seed:int = None
+        ):
+        """Constructor of ReplaySession class
+
+        Parameters
+        ----------
+        *fixture_paths : Tuple[str]
+            paths of fixture files that written by RecordingSession
+        latency : Union[float, Tuple[float, float]], optional
+            seconds of delay before each response or range of random delay, by default 0
+        error_rate : float, optional
+            probability in range [0, 1] that a request fail, half of failures are connection errors
+            and the other half are responses with error_status, by default 0
+        error_status : int, optional
+            status code of injected error responses, by default 503
+        seed : int, optional
+            seed of random generator used for latency and error injection, by default None
+        """
+        self.__exchanges = {}
+        self.__cursors = {}
+        self.__latency = latency
+        self.__error_rate = error_rate
+        self.__error_status = error_status
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.headers = CaseInsensitiveDict()
+        for fixture_path in fixture_paths:
+            self.load(fixture_path)
+
+    def load(self, fixture_path:str) -> 'ReplaySession':
+        """Load recorded exchanges from fixture file
+
+        Parameters
+        ----------
+        fixture_path : str
+            path of fixture file
+
+        Returns
+        -------
+        ReplaySession
+            return self
+        """
+        with open(fixture_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                exchange = json.loads(line)
+                for key in self.__keys(exchange['method'], exchange['url'], exchange['body']):
+                    self.__exchanges.setdefault(key, []).append(exchange)
+        return self
+
+    def __keys(self, method:str, url:str, body:str) -> List[tuple]:
+        return [(method.upper(), url, body or None), (method.upper(), url)]
+
+    def __delay(self) -> None:
+        if isinstance(self.__latency, tuple):
+            delay = self.__random.uniform(*self.__latency)
+        else:
+            delay = self.__latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def request(self, method:str, url:str, params=None, data=None, headers=None, json=None, **kwargs) -> ReplayResponse:
+        """Serve a recorded response of given request, exchanges of the same request are served in recorded order and repeated
+
+        Raises
+        ------
+        requests.ConnectionError
+            error when no exchange was recorded for given request or when a connection error is injected
+        """
+        prepared = requests.Request(method.upper(), url, params=params, data=data, json=json).prepare()
+        body = prepared.body.decode('utf-8') if isinstance(prepared.body, bytes) else prepared.body
+        self.__delay()
+        with self.__lock:
+            failed = self.__random.random() < self.__error_rate
+            drop_connection = failed and self.__random.random() < .5
+            for key in self.__keys(prepared.method, prepared.url, body):
+                if key in self.__exchanges:
+                    break
+            else:
+                raise requests.ConnectionError(f'No recorded exchange for {prepared.method} {prepared.url}')
+            exchanges = self.__exchanges[key]
+            cursor = self.__cursors.get(key, 0)
+            self.__cursors[key] = cursor+1
+        if drop_connection:
+            raise requests.ConnectionError('Injected connection error')
+        if failed:
+            return ReplayResponse(prepared.method, prepared.url, self.__error_status, {'Retry-After': '0'}, '')
+        exchange = exchanges[cursor % len(exchanges)]
+        return ReplayResponse(prepared.method, prepared.url, exchange['status'], exchange['headers'], exchange['response'])
+
+    def get(self, url:str, **kwargs) -> ReplayResponse:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url:str, **kwargs) -> ReplayResponse:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url:str, **kwargs) -> ReplayResponse:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url:str, **kwargs) -> ReplayResponse:
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self) -> None:
+        pass
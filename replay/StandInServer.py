@@ -0,0 +1,296 @@
+import json
+import gzip
+import time
+import hashlib
+import uuid
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import List, Tuple
+
+class NewsStore:
+    ''' Thread-safe in-memory collections of raw and summarized news '''
+    def __init__(self, keep_status:bool = True):
+        self.__collections = {'raw': {}, 'summarized': {}}
+        self.__keep_status = keep_status
+        self.__lock = threading.Lock()
+        self.__changed = threading.Condition(self.__lock)
+
+    def wait(self, timeout:float) -> bool:
+        """Block until a news is inserted or updated
+
+        Parameters
+        ----------
+        timeout : float
+            max seconds to wait
+
+        Returns
+        -------
+        bool
+            False if timeout
+        """
+        with self.__changed:
+            return self.__changed.wait(timeout)
+
+    def insert(self, model:str, document:dict) -> dict:
+        document = dict(document)
+        document['_id'] = uuid.uuid4().hex[:24]
+        document['__v'] = 0
+        document['insertDt'] = datetime.utcnow().isoformat(timespec='milliseconds')+'Z'
+        if model == 'raw':
+            document['summarizeStatus'] = self.__keep_status and document.get('summarizeStatus') in (True, 'true', 'True')
+        with self.__lock:
+            self.__collections[model][document['_id']] = document
+            self.__changed.notify_all()
+        return dict(document)
+
+    def update(self, model:str, id:str, changes:dict) -> dict:
+        with self.__lock:
+            document = self.__collections[model].get(id)
+            if document is None:
+                return None
+            for key, value in changes.items():
+                if key == 'summarizeStatus':
+                    value = value in (True, 'true', 'True')
+                document[key] = value
+            self.__changed.notify_all()
+            return dict(document)
+
+    def delete(self, model:str, id:str) -> bool:
+        with self.__lock:
+            return self.__collections[model].pop(id, None) is not None
+
+    def find(self, model:str, query:dict) -> List[dict]:
+        with self.__lock:
+            documents = [dict(document) for document in self.__collections[model].values()]
+        for key in ('category', 'publisher', 'author', 'language'):
+            if key in query:
+                documents = [x for x in documents if query[key] == x.get(key) or query[key] in (x.get(key) or [])]
+        if 'sourceUrl' in query:
+            documents = [x for x in documents if x.get('sourceUrl') == query['sourceUrl']]
+        if 'summarizeStatus' in query:
+            status = query['summarizeStatus'] in ('true', 'True')
+            documents = [x for x in documents if x.get('summarizeStatus') == status]
+        if 'from' in query:
+            documents = [x for x in documents if x['insertDt'] >= query['from']]
+        if 'to' in query:
+            documents = [x for x in documents if x['insertDt'] <= query['to']]
+        documents.sort(key=lambda x: x['insertDt'], reverse=str(query.get('sort', '')).startswith('-'))
+        if 'limit' in query:
+            documents = documents[:int(query['limit'])]
+        return documents
+
+class StandInHandler(BaseHTTPRequestHandler):
+    ''' Request handler that implement raw and summarized news endpoints of New-sREST '''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def __route(self) -> Tuple[str, str, dict]:
+        parts = urlsplit(self.path)
+        segments = [x for x in parts.path.split('/') if x]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if len(segments) == 0 or segments[0] not in self.server.services:
+            return None, None, query
+        model = self.server.services[segments[0]]
+        id = segments[1] if len(segments) > 1 else None
+        return model, id, query
+
+    def __read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return None
+        data = self.rfile.read(length)
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            try:
+                data = gzip.decompress(data)
+            except OSError as err:
+                raise ValueError('Invalid gzip body') from err
+        return json.loads(data.decode('utf-8'))
+
+    def __send(self, status:int, body=None, etag:bool = False) -> None:
+        data = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        if etag:
+            tag = '"{}"'.format(hashlib.sha1(data).hexdigest()[:20])
+            if self.headers.get('If-None-Match') == tag:
+                status = 304
+                data = b''
+                body = None
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', tag)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def __authorized(self, model:str, method:str) -> bool:
+        if model == 'summarized' and method == 'GET':
+            return True
+        return self.headers.get('Authorization', '') == f'Bearer {self.server.token}'
+
+    def __handle(self, method:str) -> None:
+        model, id, query = self.__route()
+        if model is None:
+            return self.__send(404, {'message': 'Not found'})
+        if not self.__authorized(model, method):
+            return self.__send(401, {'message': 'Unauthorized'})
+        try:
+            body = self.__read_json()
+        except ValueError:
+            return self.__send(400, {'message': 'Invalid json'})
+        store = self.server.store
+        if id == 'bulk' and self.server.bulk:
+            return self.__handle_bulk(method, model, body)
+        if method == 'GET' and id is None:
+            if not self.server.sort:
+                # like a server without sort support that return the latest news first
+                query = dict(query, sort='-insertDt')
+            documents = store.find(model, query)
+            # long polling, hold the request until matched news are inserted
+            deadline = time.monotonic()+min(float(query.get('wait') or 0), self.server.max_wait)
+            while len(documents) == 0 and time.monotonic() < deadline:
+                store.wait(deadline-time.monotonic())
+                documents = store.find(model, query)
+            return self.__send(200, documents, etag=True)
+        if method == 'POST' and id is None:
+            if not isinstance(body, dict):
+                return self.__send(400, {'message': 'Invalid payload'})
+            return self.__send(201, store.insert(model, body))
+        if method == 'PUT' and id is not None:
+            document = store.update(model, id, body or {})
+            return self.__send(404, {'message': 'Not found'}) if document is None else self.__send(200, document)
+        if method == 'DELETE' and id is not None:
+            return self.__send(204) if store.delete(model, id) else self.__send(404, {'message': 'Not found'})
+        return self.__send(405, {'message': 'Method not allowed'})
+
+    def __handle_bulk(self, method:str, model:str, body) -> None:
+        if method not in ('POST', 'PUT'):
+            return self.__send(405, {'message': 'Method not allowed'})
+        if not isinstance(body, list) or not all(isinstance(x, dict) for x in body):
+            return self.__send(400, {'message': 'Invalid payload'})
+        store = self.server.store
+        results = []
+        for document in body:
+            if method == 'POST':
+                results.append({'status': 201, 'data': store.insert(model, document)})
+                continue
+            changes = dict(document)
+            updated = store.update(model, str(changes.pop('_id', '')), changes)
+            results.append({'status': 404, 'data': {'message': 'Not found'}} if updated is None else {'status': 200, 'data': updated})
+        return self.__send(200, results)
+
+    def do_GET(self):
+        self.__handle('GET')
+
+    def do_POST(self):
+        self.__handle('POST')
+
+    def do_PUT(self):
+        self.__handle('PUT')
+
+    def do_DELETE(self):
+        self.__handle('DELETE')
+
+class StandInServer(ThreadingHTTPServer):
+    ''' Local stand-in of New-sREST api that keep news in memory '''
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host:str = '127.0.0.1',
+        port:int = 0,
+        token:str = 'stand-in',
+        raw_service:str = 'rawnews',
+        summarized_service:str = 'summarizednews',
+        bulk:bool = True,
+        max_wait:float = 30.,
+        keep_status:bool = True,
+        sort:bool = True,
+        verbose:bool = False
+        ):
+        """Constructor of StandInServer class
+
+        Parameters
+        ----------
+        host : str, optional
+            host to bind, by default '127.0.0.1'
+        port : int, optional
+            port to bind, 0 pick a free port, by default 0
+        token : str, optional
+            access token that required by raw news services and summarized news writes, by default 'stand-in'
+        raw_service : str, optional
+            path of raw news service, by default 'rawnews'
+        summarized_service : str, optional
+            path of summarized news service, by default 'summarizednews'
+        bulk : bool, optional
+            a flag that determine whether or not to serve '<service>/bulk' endpoints that take a json array
+            and return status and data of each item, by default True
+        max_wait : float, optional
+            max seconds that a get request with 'wait' parameter is held until matched news are inserted, by default 30.
+        keep_status : bool, optional
+            a flag that determine whether or not summarizeStatus of posted raw news is kept, False insert every raw news
+            as unsummarized like a server whose schema ignore it on insert, by default True
+        sort : bool, optional
+            a flag that determine whether or not to support 'sort' parameter, False ignore it and return the latest
+            news first, by default True
+        verbose : bool, optional
+            a flag that determine whether or not to log every request, by default False
+        """
+        super().__init__((host, port), StandInHandler)
+        self.token = token
+        self.services = {raw_service: 'raw', summarized_service: 'summarized'}
+        self.store = NewsStore(keep_status)
+        self.bulk = bulk
+        self.max_wait = max_wait
+        self.sort = sort
+        self.verbose = verbose
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        """Base url of stand-in api, same format as APIUrl in config
+
+        Returns
+        -------
+        str
+            base url that ends with '/'
+        """
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> 'StandInServer':
+        """Serve requests in a background thread
+
+        Returns
+        -------
+        StandInServer
+            return self
+        """
+        self.__thread = threading.Thread(target=self.serve_forever, name='stand-in', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Local stand-in of New-sREST api')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--token', default='stand-in')
+    args = parser.parse_args()
+    server = StandInServer(args.host, args.port, args.token, verbose=True)
+    print(f'New-sREST stand-in is serving at {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,3 @@
+from replay.Recorder import RecordingSession
+from replay.ReplaySession import ReplaySession, ReplayResponse
+from replay.StandInServer import StandInServer
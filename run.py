@@ -1,19 +1,57 @@
 import json
+import asyncio
+import argparse
 from sys import path as root_path
 from os import path
 from news.News import News
+from news.SummarizePool import default_workers
 
 CURRENT_PATH = path.join(root_path[0], 'configs')
-CHECK_POINTS_PATH = path.join(CURRENT_PATH, 'checkpoints.json')
+METRICS_PORT = 9464
+# leases are shared by every instance on this host so a raw news is summarized by one of them
+LEASE_PATH = path.join(CURRENT_PATH, 'leases.sqlite3')
 
-with open(CHECK_POINTS_PATH, 'r', encoding='utf-8-sig') as f:
-    latest_checkpoints = json.loads(f.read())
+def instance_path(name:str, instance:str = None) -> str:
+    """Path of a file in configs that belongs to one instance, e.g. outbox.sqlite3 of instance 'b' is outbox.b.sqlite3,
+    an instance never share its outbox, seen store or trace file with another running instance"""
+    if instance is None:
+        return path.join(CURRENT_PATH, name)
+    stem, extension = path.splitext(name)
+    return path.join(CURRENT_PATH, '{}.{}{}'.format(stem, instance, extension))
+
+parser = argparse.ArgumentParser(description='Automatic New-s scraping and summarizing system')
+parser.add_argument('--instance', help='name of this instance when more instances run on this host, '
+    'its outbox, seen store, trace, metrics and checkpoint files are suffixed by the name')
+parser.add_argument('--summarize-only', action='store_true', help='summarize raw news that other instances have scraped, no scraping')
+parser.add_argument('--metrics-port', type=int, help='port of metrics endpoint, {} by default, 0 pick a free port '
+    'when --instance is given'.format(METRICS_PORT))
+args = parser.parse_args()
+if args.instance is not None and (args.instance == '' or path.basename(args.instance) != args.instance):
+    parser.error('--instance must be a plain name')
+metrics_port = args.metrics_port if args.metrics_port is not None else (METRICS_PORT if args.instance is None else 0)
+CHECK_POINTS_PATH = instance_path('checkpoints.json', args.instance)
+
+latest_checkpoints = {}
+if not args.summarize_only and path.exists(CHECK_POINTS_PATH):
+    with open(CHECK_POINTS_PATH, 'r', encoding='utf-8-sig') as f:
+        latest_checkpoints = json.loads(f.read())
 news_system = News(
     delay=60, 
     trace_limit=30, 
     summarize_algorithm='text_rank', 
     compression_rate=.6, 
-    checkpoints=latest_checkpoints)
-checkpoints = news_system.start()
-with open(CHECK_POINTS_PATH, 'w', encoding='utf-8-sig') as f:
-    json.dump(checkpoints, f, ensure_ascii=False)
\ No newline at end of file
+    checkpoints=latest_checkpoints,
+    seen_store_path=instance_path('seen.sqlite3', args.instance),
+    outbox_path=instance_path('outbox.sqlite3', args.instance),
+    summarize_workers=default_workers(),
+    summarize_recycle_after=10000,
+    summarize_recycle_memory=1024,
+    metrics_port=metrics_port,
+    metrics_path=instance_path('metrics.json', args.instance),
+    trace_path=instance_path('traces.jsonl', args.instance),
+    lease_path=LEASE_PATH,
+    scrape=not args.summarize_only)
+checkpoints = asyncio.run(news_system.serve(shutdown_timeout=30))
+if not args.summarize_only:
+    with open(CHECK_POINTS_PATH, 'w', encoding='utf-8-sig') as f:
+        json.dump(checkpoints, f, ensure_ascii=False)
@@ -1,6 +1,6 @@
 from summarization.summarizer import TextRank, SentenceRank
 
-def summarize(document:str, compression_rate:float = 0.60, lang:str = 'th', algorithm:str = 'text_rank') -> str:
+def summarize(document:str, compression_rate:float = 0.60, lang:str = 'th', algorithm:str = 'text_rank', raise_errors:bool = False) -> str:
     """Summarize given document according to define algorithm
     
     Parameters
@@ -13,6 +13,8 @@ def summarize(document:str, compression_rate:float = 0.60, lang:str = 'th', algo
         language of document that need to be summarize, by default 'th'
     algorithm : str, optional
         summarization algorithm, can be 'text_rank' or 'sentence_rank, by default 'text_rank'
+    raise_errors : bool, optional
+        a flag that determine whether or not to raise error of summarizer instead of returning the original document, by default False
     
     Returns
     -------
@@ -43,7 +45,9 @@ def summarize(document:str, compression_rate:float = 0.60, lang:str = 'th', algo
         summarizer = TextRank(compression_rate, lang)
     try:
         summarized = summarizer.summarize(document, merge_sentences=True)
-    except:
+    except Exception:
+        if raise_errors:
+            raise
         print('Error occur while summrizing...')
         summarized = document
     return summarized
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+from os import path
+
+# tests run against stand-in servers with the config of fixtures, set NEWS_CONFIG to run them with real New-sREST settings
+os.environ.setdefault('NEWS_CONFIG', path.join(path.dirname(path.abspath(__file__)), 'fixtures', 'config.cfg'))
@@ -0,0 +1,71 @@
+import json
+import tempfile
+import unittest
+from unittest import mock
+from os import path
+from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from configs import NewsConfig as config
+from news.Backfill import Backfill
+from replay import StandInServer
+
+CONTENT = 'นายกรัฐมนตรีเดินทางไปตรวจราชการที่จังหวัดเชียงใหม่ เพื่อติดตามการแก้ไขปัญหาหมอกควัน ประชาชนในพื้นที่ให้การต้อนรับเป็นอย่างดี '*5
+
+class TestBackfill(unittest.TestCase):
+    ''' Unit test for Backfill class on New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer(token=config.Token, raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+        self.checkpoint_path = path.join(tempfile.mkdtemp(), 'backfill.json')
+        news = [{"title":"News{}".format(i), "content":CONTENT, "sourceUrl":"https://www.sanook.com/news/{}/".format(i), "summarizeStatus":"true"} for i in range(5)]
+        ApiConnector(token=self.server.token, api_url=self.server.url).setModel('raw').post_many(news)
+        ApiConnector(token=self.server.token, api_url=self.server.url).setModel('summarized').post_many(
+            [{key: value for key, value in x.items() if key != 'summarizeStatus'} for x in news])
+
+    def __backfill(self) -> Backfill:
+        backfill = Backfill(self.checkpoint_path, '2000-01-01', '2100-01-01', rate=0, page_size=3, report_interval=3600,
+            summarize_retry_base=0, api_url=self.server.url)
+        self.addCleanup(backfill.close)
+        return backfill
+
+    def test_resume(self):
+        [first] = self.server.store.find('raw', {'sourceUrl': 'https://www.sanook.com/news/0/'})
+        # checkpoint of a backfill that crashed after the writes of the first news were queued
+        progress = dict(self.__backfill().progress, page_ids=[first['_id']], summarized=1)
+        with open(self.checkpoint_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        progress = self.__backfill().run()
+        self.assertTrue(progress['finished'], 'Backfill should finish the range')
+        self.assertEqual(progress['summarized'], 5)
+        self.assertEqual(progress['page_ids'], [], 'Progress of a committed page should be cleared')
+        summarized = {x['title']: x['content'] for x in self.server.store.find('summarized', {})}
+        self.assertEqual(len(summarized), 5, 'Summarized news should be replaced instead of posted again')
+        self.assertEqual(summarized['News0'], CONTENT, 'News whose writes were queued before the crash should be skipped')
+        self.assertTrue(all(summarized['News{}'.format(i)] != CONTENT for i in range(1, 5)), 'Other news should be summarized again')
+        self.assertTrue(self.__backfill().run()['finished'], 'Finished backfill should not run again')
+        self.assertEqual(len(self.server.store.find('summarized', {})), 5)
+
+    def test_retry(self):
+        # both algorithms are tried in each attempt, News1 fails its first attempt and News3 every attempt
+        failures = {'News1': 2, 'News3': 10}
+        def flaky_summarize(text, rate, **kwargs):
+            title = text[len(CONTENT):]
+            if failures.get(title, 0) > 0:
+                failures[title] -= 1
+                raise ValueError('Failed to summarize {}'.format(title))
+            return text[:50]
+        for news in self.server.store.find('raw', {}):
+            self.server.store.update('raw', news['_id'], {'content': CONTENT+news['title']})
+        with mock.patch('news.SummarizePool.summarize', side_effect=flaky_summarize):
+            progress = self.__backfill().run()
+        self.assertEqual((progress['summarized'], progress['failed']), (4, 1), 'Failed news should be summarized again')
+        summarized = {x['title']: x['content'] for x in self.server.store.find('summarized', {})}
+        self.assertEqual(summarized['News1'], CONTENT[:50], 'News that failed once should be summarized on retry')
+        self.assertEqual(summarized['News3'], CONTENT, 'News that run out of attempts should not be replaced')
+        outbox = Outbox(self.checkpoint_path+'.outbox.sqlite3')
+        self.addCleanup(outbox.close)
+        [letter] = outbox.dead_letters('summarize')
+        self.assertEqual((letter['payload']['title'], letter['attempts']), ('News3', 3), 'Dead letter should keep the real number of attempts')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,25 @@
 #from apiConnector import *
 import unittest
 from apiConnector.ApiConnector import ApiConnector
+from apiConnector.AsyncApiConnector import AsyncApiConnector
+from apiConnector.ChangeFeed import ChangeFeed
+from apiConnector.JsonStream import iter_json_array
+from apiConnector.ResponseCache import ResponseCache
+from configs import NewsConfig as config
+from replay import RecordingSession, StandInServer
 import asyncio 
+import requests
 import json
+import gzip
+import tempfile
+import threading
+import time
+from os import path
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 def async_test(coro):
     def wrapper(*args, **kwargs):
@@ -30,15 +47,295 @@ class TestApiConnector(unittest.TestCase):
 
     @async_test
     async def test_get(self):
-        connector = ApiConnector()
-        connector = connector.setModel(model='summarized')
-        status_code, res = await connector.get({'limit':1})
+        async with AsyncApiConnector() as connector:
+            connector = connector.setModel(model='summarized')
+            status_code, res = await connector.get({'limit':1})
         self.assertIn(status_code, self.pass_status, 'Unexpected html status code')
         if len(res) != 0:
             self.assertIsInstance(res[0], dict, 'Unexpected response data from summarized Api')
             #json_formatted = json.dumps(res, indent=2)
             #print(json_formatted)
 
+class TestAsyncApiConnector(unittest.TestCase):
+    ''' Unit test for AsyncApiConnector class on New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+
+    async def __exercise(self, connector:AsyncApiConnector) -> None:
+        connector.setModel('raw')
+        results = await asyncio.gather(*[connector.post({"title":"News{}".format(i), "content":"เนื้อหาข่าว"*200}) for i in range(10)])
+        self.assertEqual([status for status, _ in results], [201]*10, 'Unexpected status of posted news')
+        self.assertEqual(results[0][1]['content'], "เนื้อหาข่าว"*200, 'Unexpected content of posted news')
+        status_code, res = await connector.put(results[0][1]['_id'], {'summarizeStatus': 'true'})
+        self.assertEqual(status_code, 200, 'Unexpected status of updated news')
+        status_code, res = await connector.get({'summarizeStatus': 'false'})
+        self.assertEqual(len(res), 9, 'Unexpected number of unsummarized news')
+        status_code, res = await connector.delete(results[1][1]['_id'])
+        self.assertIn(status_code, connector.PASS_STATUS, 'Unexpected status of deleted news')
+        self.assertEqual(len(self.server.store.find('raw', {})), 9, 'Deleted news should be removed')
+        with self.assertRaises(Exception):
+            await connector.post({'unknown': ''})
+
+    @async_test
+    async def test_concurrent(self):
+        async with AsyncApiConnector(token=self.server.token, api_url=self.server.url, concurrency=4) as connector:
+            await self.__exercise(connector)
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    @async_test
+    async def test_aiohttp(self):
+        threads = {thread.name for thread in threading.enumerate()}
+        async with AsyncApiConnector(token=self.server.token, api_url=self.server.url, concurrency=4, gzip_threshold=1024) as connector:
+            await self.__exercise(connector)
+            self.assertFalse([thread.name for thread in threading.enumerate() if thread.name not in threads and thread.name.startswith('api')],
+                'Requests should be sent by aiohttp instead of a thread pool')
+
+    @async_test
+    async def test_session(self):
+        session = EncodingSession()
+        async with AsyncApiConnector(token=self.server.token, api_url=self.server.url, concurrency=4, gzip_threshold=1024, session=session) as connector:
+            await self.__exercise(connector)
+        self.assertIn('gzip', session.encodings, 'Requests should be sent by given session')
+
+class TestApiConnectorBulk(unittest.TestCase):
+    ''' Unit test for bulk requests of ApiConnector class on New-sREST stand-in '''
+    def setUp(self):
+        self.news = [{"title":"News{}".format(i), "content":"เนื้อหาข่าว"*200, "publishAt":"2020-03-24T09:39:50.001Z"} for i in range(5)]
+
+    def __serve(self, bulk:bool) -> StandInServer:
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices, bulk=bulk).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_post_many(self):
+        server = self.__serve(bulk=True)
+        recorder = RecordingSession(path.join(tempfile.mkdtemp(), 'exchanges.jsonl'))
+        connector = ApiConnector(token=server.token, session=recorder, api_url=server.url).setModel('raw')
+        results = connector.post_many(self.news, batch_size=2)
+        self.assertEqual([status for status, _ in results], [201]*5, 'Unexpected status of posted news')
+        self.assertEqual([res['title'] for _, res in results], [x['title'] for x in self.news], 'Results should follow given order')
+        results = connector.put_many([(res['_id'], {'summarizeStatus': 'true'}) for _, res in results]+[('missing', {'summarizeStatus': 'true'})])
+        self.assertEqual([status for status, _ in results], [200]*5+[404], 'Unexpected status of updated news')
+        with open(recorder.fixture_path, 'r', encoding='utf-8') as f:
+            urls = [json.loads(line)['url'] for line in f]
+        self.assertEqual(len(urls), 4, 'News should be sent in batches')
+        self.assertTrue(all(url.endswith('/bulk') for url in urls), 'Bulk endpoint should be used')
+
+    def test_gzip(self):
+        server = self.__serve(bulk=True)
+        session = EncodingSession()
+        ApiConnector(token=server.token, session=session, api_url=server.url).setModel('raw').post_many(self.news)
+        self.assertEqual(session.encodings, [None], 'Request body should not be compressed by default')
+        session = EncodingSession()
+        results = ApiConnector(token=server.token, session=session, api_url=server.url, gzip_threshold=1024).setModel('raw').post_many(self.news)
+        self.assertEqual(session.encodings, ['gzip'], 'Request body larger than threshold should be compressed')
+        self.assertEqual([res['content'] for _, res in results], [x['content'] for x in self.news], 'Compressed body should be decoded by server')
+
+    def test_fallback(self):
+        server = self.__serve(bulk=False)
+        connector = ApiConnector(token=server.token, api_url=server.url).setModel('raw')
+        results = connector.post_many(self.news)
+        self.assertEqual([status for status, _ in results], [201]*5, 'Unexpected status of posted news')
+        results = connector.put_many([(res['_id'], {'summarizeStatus': 'true'}) for _, res in results])
+        self.assertEqual([status for status, _ in results], [200]*5, 'Unexpected status of updated news')
+        self.assertEqual(len(server.store.find('raw', {'summarizeStatus': 'false'})), 0, 'Every news should be updated')
+
+    def test_get_many(self):
+        server = self.__serve(bulk=True)
+        connector = ApiConnector(token=server.token, api_url=server.url).setModel('raw')
+        connector.post_many([dict(x, sourceUrl='https://www.sanook.com/news/{}/'.format(i)) for i, x in enumerate(self.news)])
+        results = connector.get_many([{'sourceUrl': 'https://www.sanook.com/news/{}/'.format(i), 'limit': 1} for i in (3, 9, 0)])
+        self.assertEqual([status for status, _ in results], [200]*3, 'Unexpected status of listed news')
+        self.assertEqual([[x['title'] for x in res] for _, res in results], [['News3'], [], ['News0']], 'Results should follow given order')
+        self.assertEqual(connector.get_many([]), [])
+
+class EncodingSession(requests.Session):
+    ''' Session that records Content-Encoding header of every request '''
+    def __init__(self):
+        super().__init__()
+        self.encodings = []
+
+    def request(self, method, url, **kwargs):
+        self.encodings.append((kwargs.get('headers') or {}).get('Content-Encoding'))
+        return super().request(method, url, **kwargs)
+
+class BulkSession:
+    ''' Session that answers bulk requests with given status and body and forwards other requests to server '''
+    def __init__(self, status:int, body):
+        self.status = status
+        self.body = body
+        self.session = requests.Session()
+
+    def request(self, method, url, **kwargs):
+        if not url.endswith('/bulk'):
+            return self.session.request(method, url, **kwargs)
+        response = requests.Response()
+        response.status_code = self.status
+        response._content = json.dumps(self.body).encode('utf-8')
+        return response
+
+class TestApiConnectorBulkProbe(unittest.TestCase):
+    ''' Unit test for bulk endpoint discovery of ApiConnector class '''
+    def setUp(self):
+        self.server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+        self.news = [{"title":"News{}".format(i)} for i in range(3)]
+
+    def test_rejected_probe(self):
+        connector = ApiConnector(token=self.server.token, session=BulkSession(400, {'message': 'Bad request'}), api_url=self.server.url).setModel('raw')
+        results = connector.post_many(self.news)
+        self.assertEqual([status for status, _ in results], [201]*3, 'Rejected probe should fallback to single requests')
+        self.assertEqual(len(self.server.store.find('raw', {})), 3, 'Every news should be inserted once')
+
+    def test_malformed(self):
+        for body in ({'inserted': 3}, [{'status': 201, 'data': {}}]):
+            connector = ApiConnector(token=self.server.token, session=BulkSession(200, body), api_url=self.server.url).setModel('raw')
+            results = connector.post_many(self.news)
+            self.assertEqual([status for status, _ in results], [None]*3, 'Malformed response should fail every item')
+        self.assertEqual(len(self.server.store.find('raw', {})), 0, 'Failed items should not be sent again as single requests')
+
+class TestChangeFeed(unittest.TestCase):
+    ''' Unit test for ChangeFeed class on New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+        self.connector = ApiConnector(token=self.server.token, api_url=self.server.url).setModel('raw')
+
+    def test_poll(self):
+        feed = ChangeFeed(self.connector, {'summarizeStatus': 'false'}, limit=2)
+        self.connector.post_many([{"title":"News{}".format(i)} for i in range(3)])
+        titles = [x['title'] for x in feed.poll()+feed.poll()]
+        self.assertEqual(sorted(titles), ['News0', 'News1', 'News2'], 'Every news should be read once')
+        self.assertEqual(feed.poll(), [], 'Read news should not be transferred again')
+        self.connector.post({"title":"News3"})
+        self.assertEqual([x['title'] for x in feed.poll()], ['News3'], 'Only new news should be read')
+
+    def test_resume(self):
+        self.connector.post_many([{"title":"News{}".format(i)} for i in range(5)])
+        feed = ChangeFeed(self.connector, limit=3)
+        batch = feed.poll()
+        feed.commit(batch)
+        titles = [x['title'] for x in batch]
+        resumed = ChangeFeed(self.connector, limit=3, since=feed.cursor, since_ids=feed.cursor_ids)
+        titles += [x['title'] for x in resumed.poll()+resumed.poll()]
+        self.assertEqual(sorted(titles), ['News{}'.format(i) for i in range(5)], 'Resumed feed should read every news once')
+
+    def test_commit(self):
+        self.connector.post_many([{"title":"News{}".format(i)} for i in range(5)])
+        feed = ChangeFeed(self.connector, limit=2)
+        first, second = feed.poll(), feed.poll()
+        feed.commit(second)
+        self.assertIsNone(feed.cursor, 'Cursor should not move past a batch that is not committed')
+        feed.commit(first)
+        self.assertEqual(feed.cursor, second[-1]['insertDt'], 'Cursor should move past committed batches')
+        third = feed.poll()
+        feed.rewind()
+        self.assertEqual(feed.poll(), third, 'Batch that is not committed should be read again after rewind')
+
+    def test_unsorted(self):
+        class Unsorted:
+            ''' Connector of a server that ignore sort and from parameters '''
+            PASS_STATUS = {200: 'OK'}
+            def get(self, params):
+                return 200, [{'_id': 'b', 'insertDt': '2020-01-02T00:00:00.000Z'}, {'_id': 'a', 'insertDt': '2020-01-01T00:00:00.000Z'}]
+        feed = ChangeFeed(Unsorted())
+        self.assertEqual([x['_id'] for x in feed.poll()], ['a', 'b'], 'Unsorted page should be sorted on client')
+        self.assertFalse(feed.server_sort, 'Missing sort support should be detected')
+        self.assertEqual(feed.poll(), [], 'News before read position should not be read again')
+
+    def test_server_without_sort(self):
+        class Counting:
+            ''' Connector that count requests with sort parameter '''
+            def __init__(self, connector):
+                self.PASS_STATUS = connector.PASS_STATUS
+                self.connector = connector
+                self.sorted = 0
+            def get(self, params):
+                self.sorted += 'sort' in params
+                return self.connector.get(params)
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices, sort=False).start()
+        self.addCleanup(server.stop)
+        connector = ApiConnector(token=server.token, api_url=server.url).setModel('raw')
+        for i in range(5):
+            connector.post({"title":"News{}".format(i)})
+            time.sleep(.01)
+        counting = Counting(connector)
+        feed = ChangeFeed(counting, limit=2)
+        batches = [feed.poll() for _ in range(4)]
+        self.assertEqual([len(x) for x in batches], [2, 2, 1, 0], 'Batches should keep the limit')
+        self.assertEqual([x['title'] for x in sum(batches, [])], ['News{}'.format(i) for i in range(5)], 'Every news should be read once in insert order')
+        self.assertEqual(counting.sorted, 1, 'Missing sort support should be detected once')
+        connector.post({"title":"News5"})
+        self.assertEqual([x['title'] for x in feed.poll()], ['News5'], 'Only new news should be read')
+
+    def test_long_poll(self):
+        feed = ChangeFeed(self.connector, long_poll=5, idle_min=5)
+        threading.Timer(.3, self.connector.post, args=({"title":"News"},)).start()
+        started = time.monotonic()
+        news = feed.next()
+        self.assertEqual([x['title'] for x in news], ['News'], 'Unexpected news')
+        self.assertLess(time.monotonic()-started, 3, 'Inserted news should be returned without idle delay')
+
+class TestJsonStream(unittest.TestCase):
+    ''' Unit test for streaming json decoding '''
+    def test_iter_json_array(self):
+        data = [{"title":"ข่าว", "tags":["ไทย", "news"], "nested":{"a":[1, 2.5, None]}}, 12345, "string", True, []]
+        encoded = json.dumps(data, ensure_ascii=False, indent=1).encode('utf-8')
+        for chunk_size in (1, 7, len(encoded)):
+            chunks = [encoded[i:i+chunk_size] for i in range(0, len(encoded), chunk_size)]
+            self.assertEqual(list(iter_json_array(chunks)), data, 'Unexpected decoded items with chunk size {}'.format(chunk_size))
+        self.assertEqual(list(iter_json_array([b'[2.', b'5, 3', b'0, "a\\', b'"b"]'])), [2.5, 30, 'a"b'], 'Split items should be decoded once complete')
+        with self.assertRaises(ValueError):
+            list(iter_json_array([encoded[:-3]]))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"message":"Unauthorized"}']))
+
+    def test_iter_get(self):
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(server.stop)
+        connector = ApiConnector(token=server.token, api_url=server.url).setModel('raw')
+        connector.post_many([{"title":"News{}".format(i), "content":"เนื้อหาข่าว"*100} for i in range(20)])
+        titles = [x['title'] for x in connector.iter_get({'limit': 15}, chunk_size=1024)]
+        self.assertEqual(titles, [x['title'] for x in connector.get({'limit': 15})[1]], 'Streamed records should equal get')
+        with self.assertRaises(Exception):
+            list(connector.setToken('invalid').iter_get({}))
+
+class TestResponseCache(unittest.TestCase):
+    ''' Unit test for cached get of ApiConnector class on New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+
+    def test_cache(self):
+        cache = ResponseCache(max_entries=2, ttl=60)
+        reader = ApiConnector(token=self.server.token, api_url=self.server.url, cache=cache).setModel('summarized')
+        writer = ApiConnector(token=self.server.token, api_url=self.server.url, cache=cache).setModel('summarized')
+        writer.post({"title":"News0"})
+        self.assertEqual(len(reader.get({'limit': 5, 'category': 'Politic'})[1]), 0, 'Unexpected news')
+        self.assertEqual(len(reader.get({'category': 'Politic', 'limit': '5'})[1]), 0, 'Unexpected news')
+        self.assertEqual((cache.hits, cache.misses), (1, 1), 'Normalized parameters should hit cache')
+        writer.post({"title":"News1", "category":"Politic"})
+        self.assertEqual(len(reader.get({'limit': 5, 'category': 'Politic'})[1]), 1, 'Write should invalidate cache')
+        reader.get({'limit': 1})
+        reader.get({'limit': 2})
+        self.assertEqual(len(cache), 2, 'Least recently used response should be evicted')
+
+    def test_token(self):
+        cache = ResponseCache(ttl=60)
+        connector = ApiConnector(token=self.server.token, api_url=self.server.url, cache=cache).setModel('raw')
+        connector.post({"title":"News"})
+        self.assertEqual(connector.get({'limit': 5})[0], 200, 'Unexpected status')
+        self.assertEqual(connector.setToken('invalid').get({'limit': 5})[0], 401, 'Response should not be shared between tokens')
+
+    def test_revalidate(self):
+        cache = ResponseCache(ttl=0)
+        connector = ApiConnector(token=self.server.token, api_url=self.server.url, cache=cache).setModel('summarized')
+        connector.post({"title":"News"})
+        first = connector.get({'limit': 5})
+        self.assertEqual(connector.get({'limit': 5}), first, 'Revalidated response should equal cached response')
+        self.assertEqual(cache.revalidations, 1, 'Expired response should be revalidated with ETag')
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -0,0 +1,41 @@
+import unittest
+import time
+import tempfile
+from os import path
+from news.LeaseStore import LeaseStore
+
+class TestLeaseStore(unittest.TestCase):
+    ''' Unit test for LeaseStore class shared by two owners '''
+    def setUp(self):
+        db_path = path.join(tempfile.mkdtemp(), 'leases.sqlite3')
+        self.first = LeaseStore(db_path, owner='first', ttl=.2)
+        self.second = LeaseStore(db_path, owner='second', ttl=.2)
+        self.addCleanup(self.first.close)
+        self.addCleanup(self.second.close)
+
+    def test_claim(self):
+        self.assertEqual(self.first.claim(['a', 'b']), ['a', 'b'])
+        self.assertEqual(self.second.claim(['a', 'b', 'c']), ['c'], 'Leased news should not be claimed by another owner')
+        self.assertEqual(self.first.claim(['a', 'd']), ['d'], 'Lease that owner holds already should not be claimed again')
+        self.first.complete(['a'])
+        self.second.release(['c'])
+        self.assertEqual(self.first.states(['a', 'b', 'c', 'd', 'e']), {'a': 'completed', 'b': 'leased', 'c': 'free', 'd': 'leased', 'e': 'free'})
+
+    def test_reclaim(self):
+        self.first.claim(['a', 'b'])
+        self.first.complete(['b'])
+        time.sleep(.3)
+        self.assertEqual(self.second.claim(['a', 'b']), ['a'], 'Expired lease should be reclaimed, completed one should not')
+        self.assertEqual(self.first.renew(['a']), 0, 'Reclaimed lease should not be renewed by its old owner')
+        self.assertEqual(self.second.renew(['a', 'b']), 1, 'Completed lease should not be renewed')
+
+    def test_renew(self):
+        self.first.claim(['a', 'b'])
+        time.sleep(.15)
+        self.assertEqual(self.first.renew(['a']), 1)
+        self.assertEqual(self.first.claim(['b']), [], 'Claim should not renew a lease that owner holds')
+        time.sleep(.15)
+        self.assertEqual(self.second.claim(['a', 'b']), ['b'], 'Lease that is not renewed should expire')
+
+if __name__ == "__main__":
+    unittest.main()
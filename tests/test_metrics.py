@@ -0,0 +1,121 @@
+import unittest
+import json
+import tempfile
+import requests
+from os import path
+from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from configs import NewsConfig as config
+from metrics import MetricsRegistry, MetricsServer, JsonDumper, REGISTRY, Tracer, MemoryProfiler, rss_bytes
+from metrics.Registry import Metric
+from metrics.TraceReport import read_traces, stage_percentiles
+from replay import StandInServer
+
+class TestMetricsRegistry(unittest.TestCase):
+    ''' Unit test for MetricsRegistry class '''
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_render(self):
+        self.registry.counter('news_scraped_total', 'News scraped').inc(2, publisher='sanook')
+        self.registry.gauge('news_backlog').set_function(lambda: 7, queue='outbox')
+        latency = self.registry.histogram('latency_seconds', buckets=(.1, 1.))
+        latency.observe(.05, stage='post')
+        latency.observe(.5, stage='post')
+        text = self.registry.render()
+        self.assertIn('# HELP news_scraped_total News scraped', text)
+        self.assertIn('news_scraped_total{publisher="sanook"} 2', text)
+        self.assertIn('news_backlog{queue="outbox"} 7', text)
+        self.assertIn('latency_seconds_bucket{stage="post",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="post",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{stage="post"} 2', text)
+
+    def test_type_conflict(self):
+        self.registry.counter('news_posted_total')
+        self.assertIs(self.registry.counter('news_posted_total'), self.registry.counter('news_posted_total'))
+        with self.assertRaises(Exception):
+            self.registry.gauge('news_posted_total')
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Metric('news_unknown')
+
+    def test_exporters(self):
+        self.registry.counter('news_summarized_total').inc()
+        server = MetricsServer(port=0, registry=self.registry).start()
+        self.addCleanup(server.stop)
+        response = requests.get(server.url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('news_summarized_total 1', response.text)
+        dump_path = path.join(tempfile.mkdtemp(), 'metrics.json')
+        JsonDumper(dump_path, interval=60, registry=self.registry).start().stop()
+        with open(dump_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot['metrics']['news_summarized_total']['values'][0]['value'], 1)
+
+class TestHttpMetrics(unittest.TestCase):
+    ''' Unit test for http latency of ApiConnector class on New-sREST stand-in '''
+    def test_latency(self):
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(server.stop)
+        connector = ApiConnector(token=server.token, api_url=server.url).setModel('raw')
+        target = '{}:{}/{}'.format(*server.server_address[:2], config.RawNewsServices)
+        latency = REGISTRY.histogram('http_request_duration_seconds')
+        count = latency.snapshot(target=target, method='GET')['count']
+        connector.get({})
+        self.assertEqual(latency.snapshot(target=target, method='GET')['count'], count+1, 'Request should be observed by service target')
+
+class TestTracer(unittest.TestCase):
+    ''' Unit test for Tracer class and trace report '''
+    def setUp(self):
+        self.trace_path = path.join(tempfile.mkdtemp(), 'traces.jsonl')
+
+    def test_sampling(self):
+        tracer = Tracer(self.trace_path, slow_threshold=10, sample_rate=0, max_bytes=300, backup_count=3)
+        self.addCleanup(tracer.close)
+        for index in range(6):
+            key = 'https://news/{}'.format(index)
+            tracer.begin(key, at=0)
+            tracer.mark(key, 'trace', at=1)
+            tracer.mark(key, 'scrape', at=3 if index%2 == 0 else 30)
+            self.assertIsNotNone(tracer.finish(key))
+        tracer.begin('https://news/failed')
+        tracer.finish('https://news/failed', 'summarize', error='ValueError')
+        traces = list(read_traces(self.trace_path))
+        self.assertEqual(len(traces), 4, 'Only slow and failed traces should be written')
+        self.assertTrue(path.exists(self.trace_path+'.1'), 'Trace file should be rotated')
+        report = stage_percentiles(traces)
+        self.assertEqual(report['scrape']['count'], 3)
+        self.assertEqual(report['scrape']['p50'], 29)
+        self.assertEqual(len(tracer), 0, 'Finished traces should not be kept')
+
+    def test_outbox_marks(self):
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(server.stop)
+        tracer = Tracer(self.trace_path, sample_rate=1)
+        self.addCleanup(tracer.close)
+        outbox = Outbox(':memory:', connector_factory=lambda: ApiConnector(token=server.token, api_url=server.url), tracer=tracer)
+        self.addCleanup(outbox.close)
+        news = {"title":"News", "content":"This is a contents", "publishAt":"2020-03-24T09:39:50.001Z", "sourceUrl":"https://news/1"}
+        tracer.begin(news['sourceUrl'])
+        outbox.post('raw', news, trace=news['sourceUrl'])
+        outbox.post('summarized', news, trace=news['sourceUrl'], finish=True)
+        outbox.flush()
+        traces = list(read_traces(self.trace_path))
+        self.assertEqual(len(traces), 1)
+        self.assertEqual([x['stage'] for x in traces[0]['stages']], ['post_raw', 'post_summarized'])
+
+class TestMemoryProfiler(unittest.TestCase):
+    ''' Unit test for MemoryProfiler class '''
+    def test_diff(self):
+        profiler = MemoryProfiler(interval=3600, top=3).start()
+        self.addCleanup(profiler.stop)
+        retained = [bytearray(1024) for _ in range(1000)]
+        growth = profiler.diff()
+        self.assertLessEqual(len(growth), 3)
+        self.assertIn('test_metrics.py', growth[0], 'Allocation site of retained objects should grow the most')
+        self.assertEqual(len(retained), 1000)
+        self.assertGreater(rss_bytes(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
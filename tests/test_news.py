@@ -0,0 +1,174 @@
+import time
+import asyncio
+import requests
+import tempfile
+import unittest
+from unittest import mock
+from os import path
+from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from configs import NewsConfig as config
+from metrics.Instruments import FAILED
+from news.LeaseStore import LeaseStore
+from news.News import News
+from replay import ReplaySession, StandInServer
+
+FIXTURE_PATH = path.join(path.dirname(__file__), 'fixtures', 'replay', 'sanook.jsonl')
+CONTENT = 'นายกรัฐมนตรีเดินทางไปตรวจราชการที่จังหวัดเชียงใหม่ เพื่อติดตามการแก้ไขปัญหาหมอกควัน ประชาชนในพื้นที่ให้การต้อนรับเป็นอย่างดี '*5
+
+class GetRecorder(requests.Session):
+    ''' Session that records the time of every raw news listing '''
+    def __init__(self):
+        super().__init__()
+        self.listed = []
+
+    def request(self, method, url, **kwargs):
+        if method == 'GET' and url.rstrip('/').endswith(config.RawNewsServices):
+            self.listed.append(time.monotonic())
+        return super().request(method, url, **kwargs)
+
+class TestServe(unittest.TestCase):
+    ''' Unit test for asyncio runtime of News class on New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer(token=config.Token, raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(self.server.stop)
+        self.outbox_path = path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+        connector = ApiConnector(token=self.server.token, api_url=self.server.url).setModel('raw')
+        connector.post_many([{"title":"News{}".format(i), "content":CONTENT, "sourceUrl":"https://www.sanook.com/news/{}/".format(i)} for i in range(5)])
+
+    def __summarized(self) -> set:
+        return {x['title'] for x in self.server.store.find('summarized', {})} & {"News{}".format(i) for i in range(5)}
+
+    def test_stop(self):
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, scrape_session=ReplaySession(FIXTURE_PATH))
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=10, stop=stop))
+            deadline = time.monotonic()+60
+            while len(self.__summarized()) < 5 and time.monotonic() < deadline:
+                await asyncio.sleep(.2)
+            stop.set()
+            return await asyncio.wait_for(task, timeout=30)
+        checkpoints = asyncio.run(serve())
+        self.assertIn('sanook', checkpoints, 'Checkpoints should be returned when system is closed')
+        self.assertEqual(len(self.__summarized()), 5, 'Every raw news should be summarized')
+        marked = {x['title'] for x in self.server.store.find('raw', {'summarizeStatus': 'true'})}
+        self.assertTrue({"News{}".format(i) for i in range(5)} <= marked, 'Raw news should be marked as summarized')
+        outbox = Outbox(self.outbox_path)
+        self.addCleanup(outbox.close)
+        self.assertEqual(len(outbox), 0, 'Queued writes should be flushed before serve return')
+
+    def test_shutdown_timeout(self):
+        # every scraper request takes 5 seconds, system is closed while news are traced
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, scrape_session=ReplaySession(FIXTURE_PATH, latency=5))
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=1, stop=stop))
+            await asyncio.sleep(1)
+            stop.set()
+            stopped = time.monotonic()
+            await task
+            return stopped
+        stopped = asyncio.run(serve())
+        self.assertLess(time.monotonic()-stopped, 2.5, 'System should be closed within shutdown timeout')
+
+    def test_prefetch(self):
+        connector = ApiConnector(token=self.server.token, api_url=self.server.url).setModel('raw')
+        connector.post_many([{"title":"News{}".format(i), "content":CONTENT, "sourceUrl":"https://www.sanook.com/news/{}/".format(i)} for i in range(5, 30)])
+        summarized = []
+        def slow_summarize(text, rate, **kwargs):
+            summarized.append(time.monotonic())
+            time.sleep(.05)
+            return text[:100]
+        session = GetRecorder()
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, api_session=session, scrape=False)
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=10, stop=stop))
+            deadline = time.monotonic()+60
+            while len(self.server.store.find('raw', {'summarizeStatus': 'false'})) != 0 and time.monotonic() < deadline:
+                await asyncio.sleep(.2)
+            stop.set()
+            stopped = time.monotonic()
+            await asyncio.wait_for(task, timeout=30)
+            return stopped
+        with mock.patch('news.SummarizePool.summarize', side_effect=slow_summarize):
+            stopped = asyncio.run(serve())
+        self.assertEqual(len(self.server.store.find('raw', {'summarizeStatus': 'false'})), 0, 'Every raw news should be summarized')
+        self.assertGreaterEqual(len(summarized), 30)
+        self.assertGreaterEqual(len(session.listed), 2)
+        # raw news are fetched in pages of 24, the first 24 summarize calls belong to the first page
+        self.assertLess(session.listed[1], summarized[23], 'Next page should be fetched while the first page is summarized')
+        listed = len(session.listed)
+        time.sleep(2)
+        self.assertEqual(len(session.listed), listed, 'Prefetch should stop when system is closed')
+        self.assertTrue(all(at < stopped+1.5 for at in session.listed), 'Prefetch should stop soon after run event is cleared')
+
+    def test_deferred_limit(self):
+        lease_path = path.join(tempfile.mkdtemp(), 'leases.sqlite3')
+        other = LeaseStore(lease_path, owner='other', ttl=60)
+        self.addCleanup(other.close)
+        other.claim([x['_id'] for x in self.server.store.find('raw', {})])
+        evicted = FAILED.value(stage='deferred')
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, lease_path=lease_path, lease_max_deferred=2, scrape=False)
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=10, stop=stop))
+            deadline = time.monotonic()+10
+            while FAILED.value(stage='deferred') < evicted+3 and time.monotonic() < deadline:
+                await asyncio.sleep(.2)
+            stop.set()
+            await asyncio.wait_for(task, timeout=30)
+        asyncio.run(serve())
+        self.assertEqual(FAILED.value(stage='deferred'), evicted+3, 'Forgotten deferred news should be counted')
+        self.assertEqual(len(self.__summarized()), 0, 'News leased by another process should not be summarized')
+
+    def test_lease_retry(self):
+        # both algorithms are tried in each attempt, News3 fails its first two attempts
+        failures = {'News3': 4}
+        def flaky_summarize(text, rate, **kwargs):
+            title = text[len(CONTENT):]
+            if failures.get(title, 0) > 0:
+                failures[title] -= 1
+                raise ValueError('Failed to summarize {}'.format(title))
+            return text[:100]
+        for raw in self.server.store.find('raw', {}):
+            self.server.store.update('raw', raw['_id'], {'content': CONTENT+raw['title']})
+        lease_path = path.join(tempfile.mkdtemp(), 'leases.sqlite3')
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, lease_path=lease_path, summarize_retry_base=.2, scrape=False)
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=10, stop=stop))
+            deadline = time.monotonic()+30
+            while len(self.__summarized()) < 5 and time.monotonic() < deadline:
+                await asyncio.sleep(.2)
+            stop.set()
+            await asyncio.wait_for(task, timeout=30)
+        with mock.patch('news.SummarizePool.summarize', side_effect=flaky_summarize):
+            asyncio.run(serve())
+        self.assertEqual(failures['News3'], 0)
+        self.assertEqual(len(self.__summarized()), 5, 'News whose retry is due should be claimed again by its lease holder')
+        self.assertEqual(len(self.server.store.find('summarized', {})), 5, 'News should be summarized once')
+        leases = LeaseStore(lease_path)
+        self.addCleanup(leases.close)
+        self.assertEqual(set(leases.states([x['_id'] for x in self.server.store.find('raw', {})]).values()), {'completed'})
+
+    def test_summarize_only(self):
+        scrape_session = mock.Mock(wraps=ReplaySession(FIXTURE_PATH))
+        news = News(api_url=self.server.url, outbox_path=self.outbox_path, scrape_session=scrape_session, scrape=False)
+        async def serve():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(news.serve(shutdown_timeout=10, stop=stop))
+            deadline = time.monotonic()+60
+            while len(self.__summarized()) < 5 and time.monotonic() < deadline:
+                await asyncio.sleep(.2)
+            stop.set()
+            return await asyncio.wait_for(task, timeout=30)
+        asyncio.run(serve())
+        self.assertEqual(len(self.__summarized()), 5, 'Every raw news should be summarized')
+        self.assertEqual(scrape_session.mock_calls, [], 'News should not be scraped')
+        with self.assertRaises(Exception):
+            News(pipeline=True, scrape=False)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import tempfile
+from os import path
+from apiConnector.ApiConnector import ApiConnector
+from apiConnector.Outbox import Outbox
+from configs import NewsConfig as config
+from replay import StandInServer
+
+class TestOutbox(unittest.TestCase):
+    ''' Unit test for Outbox class on New-sREST stand-in '''
+    def setUp(self):
+        self.db_path = path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+        self.news = {"title":"News", "content":"This is a contents", "publishAt":"2020-03-24T09:39:50.001Z"}
+
+    def __serve(self) -> StandInServer:
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def __outbox(self, server:StandInServer, max_attempts:int = 10) -> Outbox:
+        outbox = Outbox(self.db_path, connector_factory=lambda: ApiConnector(token=server.token, api_url=server.url), backoff_base=0, max_attempts=max_attempts)
+        self.addCleanup(outbox.close)
+        return outbox
+
+    def test_outage(self):
+        down = self.__serve()
+        down.stop()
+        outbox = self.__outbox(down)
+        outbox.post('raw', self.news)
+        outbox.put('raw', 'missing', {'summarizeStatus': 'true'})
+        self.assertEqual(outbox.flush(), 0, 'Nothing should be sent while api is down')
+        self.assertTrue(outbox.pending('raw', 'missing'), 'Unsent put should be pending')
+        # restart with the same outbox file
+        server = self.__serve()
+        outbox = self.__outbox(server)
+        self.assertEqual(len(outbox), 2, 'Queued writes should survive restart')
+        self.assertEqual(outbox.flush(), 1, 'Only post should be sent')
+        self.assertEqual(len(server.store.find('raw', {})), 1, 'Queued news should be posted')
+        self.assertEqual(len(outbox), 1, 'Failed put should be kept')
+
+    def test_background_flush(self):
+        server = self.__serve()
+        outbox = self.__outbox(server).start()
+        for _ in range(5):
+            outbox.post('summarized', self.news)
+        outbox.stop()
+        self.assertEqual(len(outbox), 0, 'Queued writes should be sent before stop')
+        self.assertEqual(len(server.store.find('summarized', {})), 5, 'Unexpected number of posted news')
+
+    def test_dead_letter(self):
+        server = self.__serve()
+        outbox = self.__outbox(server, max_attempts=2)
+        outbox.put('raw', 'missing', {'summarizeStatus': 'true'})
+        outbox.flush()
+        self.assertEqual(len(outbox), 1, 'Rejected write should be retried until it run out of attempts')
+        outbox.flush()
+        self.assertEqual(len(outbox), 0, 'Rejected write should leave the queue')
+        self.assertFalse(outbox.pending('raw', 'missing'))
+        self.assertTrue(outbox.buried('raw', 'missing'))
+        letters = outbox.dead_letters()
+        self.assertEqual([(x['kind'], x['method'], x['target'], x['attempts'], x['error']) for x in letters], [('write', 'PUT', 'missing', 2, '404')])
+        outbox.bury('summarize', 'raw', None, None, self.news, 3, 'ValueError()')
+        self.assertEqual(outbox.replay(), 2, 'Every dead letters should be replayed')
+        self.assertEqual(len(outbox.dead_letters()), 0)
+        self.assertFalse(outbox.buried('raw', 'missing'))
+        outbox.flush()
+        self.assertEqual(len(server.store.find('raw', {'summarizeStatus': 'false'})), 1, 'Replayed news should be posted as unsummarized raw news')
+
+    def test_unkept_status(self):
+        server = StandInServer(raw_service=config.RawNewsServices, summarized_service=config.SummarizedNewsServices, keep_status=False).start()
+        self.addCleanup(server.stop)
+        outbox = self.__outbox(server)
+        outbox.post('raw', dict(self.news, summarizeStatus='true'))
+        outbox.post('raw', dict(self.news, summarizeStatus='false'))
+        self.assertEqual(outbox.flush(), 2)
+        self.assertEqual(len(outbox), 1, 'Status that is ignored on insert should be followed by a put')
+        outbox.flush()
+        self.assertEqual(len(server.store.find('raw', {'summarizeStatus': 'true'})), 1, 'Status should be set by the put')
+
+if __name__ == "__main__":
+    unittest.main()
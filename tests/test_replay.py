@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+from os import path
+from replay import RecordingSession, ReplaySession, StandInServer
+from newsScraper.scraper.SanookScraper import SanookScraper
+from newsScraper.scraper.Transport import Transport
+
+FIXTURE_PATH = path.join(path.dirname(__file__), 'fixtures', 'replay', 'sanook.jsonl')
+
+class TestReplay(unittest.TestCase):
+    ''' Unit test for record and replay of http exchanges with New-sREST stand-in '''
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.headers = {'Authorization': f'Bearer {self.server.token}'}
+        self.news = {"title": "News", "content": "This is a contents", "publishAt": "2020-03-24T09:39:50.001Z"}
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stand_in(self):
+        recorder = RecordingSession(path.join(tempfile.mkdtemp(), 'exchanges.jsonl'))
+        response = recorder.post(self.server.url+'rawnews', json=self.news, headers=self.headers)
+        self.assertEqual(response.status_code, 201, 'Unexpected status code of post raw news')
+        id = response.json()['_id']
+        response = recorder.put(self.server.url+'rawnews/'+id, json={'summarizeStatus': 'true'}, headers=self.headers)
+        self.assertTrue(response.json()['summarizeStatus'], 'summarizeStatus should be updated')
+        response = recorder.get(self.server.url+'rawnews', params={'summarizeStatus': 'false'}, headers=self.headers)
+        self.assertEqual(response.json(), [], 'Summarized raw news should be filtered out')
+        response = recorder.get(self.server.url+'rawnews', params={'limit': 1})
+        self.assertEqual(response.status_code, 401, 'Raw news services require token')
+
+    def test_record_replay(self):
+        recorder = RecordingSession(path.join(tempfile.mkdtemp(), 'exchanges.jsonl'))
+        recorder.post(self.server.url+'summarizednews', json=self.news, headers=self.headers)
+        recorded = recorder.get(self.server.url+'summarizednews', params={'limit': 1})
+        self.server.stop()
+        replayer = ReplaySession(recorder.fixture_path)
+        replayed = replayer.get(self.server.url+'summarizednews', params={'limit': 1})
+        self.assertEqual(replayed.status_code, recorded.status_code, 'Unexpected replayed status code')
+        self.assertEqual(replayed.json(), recorded.json(), 'Unexpected replayed response')
+        self.server = StandInServer().start()
+
+    def test_error_injection(self):
+        replayer = ReplaySession(FIXTURE_PATH, error_rate=1, seed=0)
+        statuses = set()
+        for _ in range(20):
+            try:
+                statuses.add(replayer.get('https://free-proxy-list.net/').status_code)
+            except Exception:
+                statuses.add('error')
+        self.assertEqual(statuses, {503, 'error'}, 'Every request should fail')
+
+class TestReplaySanook(unittest.TestCase):
+    ''' Unit test for SanookScraper on replayed Sanook api '''
+    def test_scrape(self):
+        transport = Transport(rate=1000, session=ReplaySession(FIXTURE_PATH))
+        scraper = SanookScraper(2, transport=transport)
+        scraped_list = scraper.scrape('https://www.sanook.com/news/8064866')
+        self.assertEqual(len(scraped_list), 1, 'Unexpected number of scraped news')
+        self.assertEqual(scraped_list[0]['sourceUrl'], 'https://www.sanook.com/news/8064866', 'Unexpected scraped news')
+
+if __name__ == "__main__":
+    unittest.main()
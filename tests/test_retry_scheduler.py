@@ -0,0 +1,39 @@
+import unittest
+from news.RetryScheduler import RetryScheduler, RetryScheduleFull
+
+class TestRetryScheduler(unittest.TestCase):
+    ''' Unit test for RetryScheduler class '''
+    def test_give_up(self):
+        retries = RetryScheduler(max_attempts=3, backoff_base=0)
+        self.assertTrue(retries.failed('a', {'content': 'a'}))
+        self.assertEqual(retries.due(), [('a', {'content': 'a'})])
+        self.assertEqual(retries.due(), [], 'Due item should be taken once')
+        self.assertTrue(retries.failed('a', {'content': 'a'}))
+        self.assertEqual(retries.attempts('a'), 2)
+        self.assertFalse(retries.failed('a', {'content': 'a'}), 'Item should be given up after max attempts')
+        self.assertEqual(retries.attempts('a'), 0)
+
+    def test_backoff(self):
+        retries = RetryScheduler(max_attempts=5, backoff_base=60)
+        retries.failed('a', 'a')
+        self.assertEqual(retries.due(), [], 'Retry should wait for its delay')
+        self.assertEqual(len(retries), 1)
+        retries.succeeded('a')
+        self.assertEqual(retries.attempts('a'), 0)
+
+    def test_max_items(self):
+        retries = RetryScheduler(max_attempts=5, backoff_base=60, max_items=2)
+        self.assertTrue(retries.failed('a', 'a'))
+        self.assertTrue(retries.failed('b', 'b'))
+        with self.assertRaises(RetryScheduleFull, msg='Full schedule should not look like running out of attempts') as full:
+            retries.failed('c', 'c')
+        self.assertEqual((full.exception.key, full.exception.attempts), ('c', 1))
+        with self.assertRaises(RetryScheduleFull) as full:
+            retries.failed('a', 'a')
+        self.assertEqual(full.exception.attempts, 2, 'Real number of attempts should be reported')
+        self.assertEqual(len(retries), 2)
+        self.assertEqual(retries.attempts('c'), 0)
+        self.assertFalse(RetryScheduler(max_attempts=1, max_items=1).failed('a', 'a'), 'Item out of attempts should be given up')
+
+if __name__ == "__main__":
+    unittest.main()
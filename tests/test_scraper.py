@@ -1,7 +1,22 @@
+import time
+import asyncio
 import unittest
+import json
+import threading
+import requests
+from os import path
+from unittest import mock
+from bs4 import BeautifulSoup
+from newsScraper.utils import html_to_text
 from newsScraper.scraper.SanookScraper import SanookScraper
-from newsScraper.scraper.Scraper import ScrapeData
+from newsScraper.scraper.Transport import Transport
+from newsScraper.scraper.Scraper import Scraper, ScrapeData, NewsRecord
+from newsScraper.ScraperRegistry import ScraperRegistry
 from newsScraper.NewsScraper import NewsScraper
+from metrics.Instruments import FAILED
+from replay import ReplaySession
+
+REPLAY_PATH = path.join(path.dirname(__file__), 'fixtures', 'replay', 'sanook.jsonl')
 
 class TestSanookScraper(unittest.TestCase):
     ''' Unit test for SanookScraper class '''
@@ -21,6 +36,40 @@ class TestSanookScraper(unittest.TestCase):
         self.assertTrue(isinstance(scraped_data, dict), f'Unexpected scraped_data type {scraped_data}')
         self.assertTrue(all([x in valid_key for x in scraped_data.keys()]), f'Unexpected Api return {scraped_data}')
 
+class BatchSession:
+    ''' Session that answer batch queries with given status codes in order and every single entry query '''
+    def __init__(self, batch_status:list):
+        self.batch_status = list(batch_status)
+        self.single_calls = 0
+
+    def get(self, url, **kwargs):
+        raise requests.ConnectionError('No proxy list')
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        if method == 'POST':
+            response.status_code = self.batch_status.pop(0)
+            query = json.loads(kwargs['data'])['query']
+            ids = [x.split('"')[1] for x in query.split('entry(id: ')[1:]]
+            body = {'data': {'e{}'.format(i): {'id': id} for i, id in enumerate(ids)}} if response.status_code == 200 else {'errors': []}
+        else:
+            self.single_calls += 1
+            response.status_code = 200
+            body = {'data': {'entry': {'id': json.loads(kwargs['params']['variables'])['id']}}}
+        response._content = json.dumps(body).encode('utf-8')
+        return response
+
+class TestSanookBatch(unittest.TestCase):
+    ''' Unit test for batch fetching of SanookScraper '''
+    def test_transient_failure(self):
+        session = BatchSession([503, 200, 400, 200])
+        scraper = SanookScraper(batch_size=2, transport=Transport(rate=1000, max_retries=0, backoff_base=0, failure_threshold=100, session=session))
+        ids = [str(8000000+i) for i in range(8)]
+        fetched = [id for id, _ in scraper._iter_fetch(ids)]
+        self.assertEqual(sorted(fetched), ids, 'Every news should be fetched')
+        self.assertEqual(session.batch_status, [200], 'Batching should stop after the query is rejected, not after a 5xx')
+        self.assertEqual(session.single_calls, 6, 'News of failed and rejected batches should be fetched one by one')
+
 class TestNewsScraper(unittest.TestCase):
     ''' Unit test for NewsScraper adapter '''
     def test_baseurls(self):
@@ -39,4 +88,176 @@ class TestNewsScraper(unittest.TestCase):
         scraped_list = news_scraper.scrape()
         scraped_data = scraped_list[0]
         self.assertTrue(isinstance(scraped_data, dict), f'Unexpected scraped_data type {scraped_data}')
-        self.assertTrue(all([x in valid_key for x in scraped_data.keys()]), f'Unexpected Api return {scraped_data}')
\ No newline at end of file
+        self.assertTrue(all([x in valid_key for x in scraped_data.keys()]), f'Unexpected Api return {scraped_data}')
+
+    def test_close(self):
+        before = set(threading.enumerate())
+        with mock.patch('newsScraper.scraper.Scraper.Transport', wraps=Transport) as transport:
+            with NewsScraper(2, session=ReplaySession(REPLAY_PATH)) as news_scraper:
+                scraped_list = news_scraper.scrape(['https://www.sanook.com/news/8064866'])
+            self.assertEqual(transport.call_count, 0, 'Adapter should not create a transport that it never use')
+        self.assertEqual(len(scraped_list), 1, 'Unexpected number of scraped news')
+        leaked = [x for x in threading.enumerate() if x not in before and x.name.startswith('publisher')]
+        self.assertEqual(leaked, [], 'Publisher threads should stop when scraper is closed')
+
+class FakeScraper(Scraper):
+    ''' Scraper of a fake publisher that sleep or fail by url, every produced url is recorded '''
+    produced = []
+
+    @property
+    def base_url(self) -> str:
+        return 'https://fake.com/'
+
+    def trace(self, limit:int = 0, checkpoint:str = ''):
+        return [], checkpoint
+
+    def _filter(self, url:str) -> NewsRecord:
+        return NewsRecord('News', '', 'This is a contents', 'fake', '', ['th'], [], '', '2020-01-01T00:00:00.000Z', url)
+
+    def iter_records(self, urls=None):
+        for url in self._resolve_urls(urls):
+            if url.endswith('/error'):
+                raise ValueError('error')
+            if url.endswith('/slow'):
+                time.sleep(1)
+            FakeScraper.produced.append(url)
+            yield self._filter(url)
+
+FAKE_URLS = ['https://fake.com/{}'.format(index) for index in range(50)]
+
+class TestStreaming(unittest.TestCase):
+    ''' Unit test for bounded news streams of NewsScraper and Scraper.aiter_scrape on a fake publisher '''
+    def setUp(self):
+        FakeScraper.produced = []
+        self.registry = ScraperRegistry().register('fake', FakeScraper, r'fake\.com/[a-z0-9]+')
+
+    def __news_scraper(self, **kwargs) -> NewsScraper:
+        news_scraper = NewsScraper(2, registry=self.registry, **kwargs)
+        self.addCleanup(news_scraper.close)
+        return news_scraper
+
+    def test_early_break(self):
+        news_scraper = self.__news_scraper(publisher_concurrency=1, buffer_size=1)
+        records = news_scraper.iter_records(FAKE_URLS)
+        self.assertEqual([next(records).sourceUrl for _ in range(2)], FAKE_URLS[:2])
+        records.close()
+        news_scraper.close() # wait for publisher threads
+        self.assertLess(len(FakeScraper.produced), 10, 'Publisher should stop once the consumer stopped')
+
+    def test_timeout(self):
+        failed = FAILED.value(stage='scrape')
+        started = time.monotonic()
+        self.assertEqual(list(self.__news_scraper(timeout=.3).iter_records(['https://fake.com/slow'])), [])
+        self.assertLess(time.monotonic()-started, 1, 'Stream should stop waiting for a slow publisher after timeout')
+        self.assertEqual(FAILED.value(stage='scrape'), failed+1, 'Timed out publisher should be counted as failed')
+        urls = []
+        for record in self.__news_scraper(timeout=.3).iter_records(FAKE_URLS[:3]):
+            time.sleep(.5)
+            urls.append(record.sourceUrl)
+        self.assertEqual(sorted(urls), sorted(FAKE_URLS[:3]), 'Time spent by the consumer should not count toward timeout')
+
+    def test_error(self):
+        failed = FAILED.value(stage='scrape')
+        urls = [FAKE_URLS[0], 'https://fake.com/error', FAKE_URLS[1], FAKE_URLS[2]]
+        records = list(self.__news_scraper(publisher_concurrency=2).iter_records(urls))
+        self.assertEqual(sorted(x.sourceUrl for x in records), FAKE_URLS[:2], 'Failed chunk should not stop other chunks')
+        self.assertEqual(FAILED.value(stage='scrape'), failed+1)
+
+    def test_async_early_break(self):
+        async def consume():
+            news_iterator = FakeScraper(2).aiter_scrape(FAKE_URLS, buffer_size=1)
+            urls = [(await news_iterator.__anext__())['sourceUrl'] for _ in range(2)]
+            await news_iterator.aclose()
+            return urls
+        self.assertEqual(asyncio.run(consume()), FAKE_URLS[:2])
+        produced = len(FakeScraper.produced)
+        self.assertLess(produced, 10, 'Producer should stop once the consumer stopped')
+        time.sleep(.2)
+        self.assertEqual(len(FakeScraper.produced), produced, 'Producer thread should be finished when aclose return')
+
+    def test_async_cancel(self):
+        async def consume(received:asyncio.Event):
+            async for _ in FakeScraper(2).aiter_scrape(FAKE_URLS, buffer_size=1):
+                received.set()
+                await asyncio.sleep(60)
+        async def cancel():
+            received = asyncio.Event()
+            task = asyncio.ensure_future(consume(received))
+            await received.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(cancel())
+        self.assertLess(len(FakeScraper.produced), 10, 'Producer should stop when the consumer is cancelled')
+
+    def test_async_error(self):
+        async def consume(urls:list):
+            async for news in FakeScraper(2).aiter_scrape(['https://fake.com/1', 'https://fake.com/error']):
+                urls.append(news['sourceUrl'])
+        urls = []
+        with self.assertRaises(ValueError, msg='Error of producer should be raised to the consumer'):
+            asyncio.run(consume(urls))
+        self.assertEqual(urls, ['https://fake.com/1'], 'News scraped before the error should be yielded')
+
+class TestNewsRecord(unittest.TestCase):
+    ''' Unit test for NewsRecord class '''
+    def setUp(self):
+        self.data = {
+            "title": "News",
+            "imageUrl": "https://www.sanook.com/image.jpg",
+            "content": "This is a contents",
+            "publisher": "Sanook",
+            "author": "Sanook",
+            "language": ["th"],
+            "tags": ["tag"],
+            "category": "Politic",
+            "publishAt": "2020-03-24T09:39:00Z",
+            "sourceUrl": "https://www.sanook.com/news/8064866"
+        }
+
+    def test_payload(self):
+        record = NewsRecord(**self.data)
+        self.assertEqual(record.to_payload(), self.data, 'Unexpected payload')
+        self.assertTrue(all([x in ScrapeData().legal_key for x in record.to_payload().keys()]), 'Unexpected payload key')
+
+    def test_immutable(self):
+        record = NewsRecord(**self.data)
+        with self.assertRaises(AttributeError):
+            record.title = 'Changed'
+
+    def test_validate(self):
+        with self.assertRaises(ValueError):
+            NewsRecord(**dict(self.data, publishAt='24/03/2020'))
+        with self.assertRaises(ValueError):
+            NewsRecord(**dict(self.data, tags='tag'))
+
+class TestHtmlToText(unittest.TestCase):
+    ''' Unit test for html_to_text extractor '''
+    def test_same_as_soup(self):
+        fixture = path.join(path.dirname(__file__), 'fixtures', 'sanook', 'entry_8064866.json')
+        with open(fixture, 'r', encoding='utf-8') as f:
+            documents = json.load(f)['data']['entry']['body']
+        documents += [
+            '  \n <p>a</p>\n\n<p>b&amp;c&nbsp;</p>  ',
+            '<pre>  \n </pre><p> </p>\t'
+        ]
+        for document in documents:
+            expected = BeautifulSoup(document, features='html.parser').getText()
+            self.assertEqual(html_to_text(document), expected, f'Unexpected text of {document}')
+
+    def test_same_as_pinned_soup(self):
+        # getText() of BeautifulSoup 4.8.2 that is pinned in env.yml
+        pinned = {
+            '  \n <p>a</p>\n\n<p>b&amp;c&nbsp;</p>  ': '\na\nb&c\xa0 ',
+            '<pre>  \n </pre><p> </p>\t': '  \n   ',
+            'a<!-- comment -->b<script>var x = 1;</script>c': 'abvar x = 1;c',
+            'a<template>t<p>x</p></template>b': 'atxb',
+            '<style>p {}</style>a': 'p {}a'
+        }
+        skipped = {
+            'a<!-- comment -->b<script>var x = 1;</script>c': 'abc',
+            'a<template>t<p>x</p></template>b': 'ab',
+            '<style>p {}</style>a': 'a'
+        }
+        for document, expected in pinned.items():
+            self.assertEqual(html_to_text(document), skipped.get(document, expected), f'Unexpected text of {document}')
@@ -0,0 +1,56 @@
+import sys
+import uuid
+import tempfile
+import unittest
+from os import path
+from newsScraper.ScraperRegistry import ScraperRegistry, SCRAPERS
+
+class TestScraperRegistry(unittest.TestCase):
+    ''' Unit test for ScraperRegistry class '''
+    def test_register(self):
+        registry = ScraperRegistry().register('first', dict, r'first\.com/[0-9]+')
+        self.assertEqual(registry.names, ['first'])
+        self.assertIn('first', registry)
+        with self.assertRaises(ValueError, msg='Publisher should be registered once'):
+            registry.register('first', dict, r'other\.com/[0-9]+')
+        with self.assertRaises(ValueError, msg='Publisher name should be an identifier'):
+            registry.register('first-news', dict, r'other\.com/[0-9]+')
+        self.assertEqual(registry.names, ['first'], 'Rejected publisher should not be registered')
+
+    def test_unknown(self):
+        registry = ScraperRegistry().register('first', dict, r'first\.com/[0-9]+')
+        self.assertNotIn('second', registry)
+        with self.assertRaises(KeyError):
+            registry.create('second', 2)
+        self.assertEqual(registry.match('https://second.com/1'), '', 'Url of unknown publisher should not match')
+
+    def test_lazy_import(self):
+        module_dir = tempfile.mkdtemp()
+        module_name = 'lazy_scraper_{}'.format(uuid.uuid4().hex)
+        with open(path.join(module_dir, module_name+'.py'), 'w') as f:
+            f.write('class LazyScraper:\n'
+                    '    def __init__(self, max_trace_limit, **kwargs):\n'
+                    '        self.max_trace_limit = max_trace_limit\n'
+                    '        self.kwargs = kwargs\n')
+        sys.path.insert(0, module_dir)
+        self.addCleanup(sys.path.remove, module_dir)
+        self.addCleanup(sys.modules.pop, module_name, None)
+        registry = ScraperRegistry().register('lazy', module_name+'.LazyScraper', r'lazy\.com/[0-9]+')
+        self.assertNotIn(module_name, sys.modules, 'Scraper module should not be imported on register')
+        scraper = registry.create('lazy', 3, transport='transport')
+        self.assertIn(module_name, sys.modules, 'Scraper module should be imported on create')
+        self.assertEqual((scraper.max_trace_limit, scraper.kwargs), (3, {'transport': 'transport'}))
+        self.assertIsNot(registry.create('lazy', 3), scraper, 'Every create should construct a new scraper')
+
+    def test_match(self):
+        registry = ScraperRegistry().register('first', dict, r'(?:www\.)?first\.com/news/[0-9]+/?')
+        self.assertEqual(registry.match('https://first.com/news/1'), 'first')
+        registry.register('second', dict, r'second\.com/[a-z]+/[0-9]+')
+        self.assertEqual(registry.match('https://www.first.com/news/12/'), 'first', 'Routes should be recompiled on register')
+        self.assertEqual(registry.match('http://second.com/sport/3'), 'second')
+        self.assertEqual(registry.match('https://second.com/news/x'), '')
+        self.assertEqual(registry.match('https://first.com/news/1/extra'), '', 'Whole url should match')
+        self.assertEqual(SCRAPERS.match('https://www.sanook.com/news/8064866/'), 'sanook')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import tempfile
+from os import path
+from news.SeenStore import SeenStore
+
+class TestSeenStore(unittest.TestCase):
+    ''' Unit test for SeenStore class '''
+    def setUp(self):
+        self.db_path = path.join(tempfile.mkdtemp(), 'seen.sqlite3')
+
+    def test_recover(self):
+        store = SeenStore(self.db_path)
+        store.add('sanook', '8064866')
+        store.import_checkpoints({'sanook': ['8064867', '8064868']})
+        # reopen without close to simulate a crash after commit
+        recovered = SeenStore(self.db_path)
+        self.assertIn(('sanook', '8064866'), recovered, 'Committed news id should be recovered')
+        self.assertEqual(recovered.unseen('sanook', ['8064868', '8064869']), ['8064869'], 'Unexpected unseen news ids')
+        self.assertEqual(len(recovered), 3, 'Unexpected number of news ids')
+
+    def test_compact(self):
+        store = SeenStore(self.db_path, retention=60)
+        store.add('sanook', '8064866', seen_at=0)
+        store.add('sanook', '8064867')
+        self.assertEqual(store.compact(), 1, 'Only expired news id should be removed')
+        self.assertNotIn(('sanook', '8064866'), store, 'Expired news id should be removed')
+        self.assertIn(('sanook', '8064867'), store, 'Fresh news id should be kept')
+
+if __name__ == "__main__":
+    unittest.main()
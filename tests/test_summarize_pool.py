@@ -0,0 +1,85 @@
+import os
+import time
+import tempfile
+import unittest
+import multiprocessing
+from os import path
+from unittest import mock
+from news import SummarizePool as summarize_pool
+from news.SummarizePool import SummarizePool
+from metrics.Instruments import WORKERS_RECYCLED
+
+CRASH_MARKER = path.join(tempfile.mkdtemp(), 'crashed')
+
+def fake_summarize(content:str, compression_rate:float, lang:str = 'th', algorithm:str = 'text_rank', raise_errors:bool = False) -> str:
+    ''' Summarizer that sleep, fail or kill its worker process by content '''
+    if content.startswith('sleep'):
+        time.sleep(float(content.split()[1]))
+    if content == 'error':
+        raise ValueError('error')
+    if content == 'always crash' or (content == 'crash' and not path.exists(CRASH_MARKER)):
+        open(CRASH_MARKER, 'w').close()
+        os._exit(1)
+    return content.upper()
+
+class TestSummarizePool(unittest.TestCase):
+    ''' Unit test for SummarizePool class with a fake summarizer '''
+    def setUp(self):
+        patcher = mock.patch.object(summarize_pool, 'summarize', fake_summarize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def __pool(self, workers:int, chunk_size:int) -> SummarizePool:
+        pool = SummarizePool(workers, chunk_size=chunk_size).start()
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_inline(self):
+        pool = self.__pool(0, 2)
+        chunks = []
+        summarize_chunk = summarize_pool._summarize_chunk
+        with mock.patch.object(summarize_pool, '_summarize_chunk', lambda chunk, *args: chunks.append(len(chunk)) or summarize_chunk(chunk, *args)):
+            results = list(pool.map_unordered((index, 'news{}'.format(index)) for index in range(5)))
+        self.assertEqual(chunks, [2, 2, 1], 'News should be summarized in chunks')
+        self.assertEqual(sorted(results), [(index, 'NEWS{}'.format(index), None) for index in range(5)])
+
+    def test_error(self):
+        pool = self.__pool(0, 4)
+        results = {key: (content, error) for key, content, error in pool.map_unordered([('a', 'error'), ('b', 'news')])}
+        self.assertEqual(results['a'][0], 'error', 'Failed news should keep its content')
+        self.assertIn('ValueError', results['a'][1], 'Error of failed news should be reported')
+        self.assertEqual(results['b'], ('NEWS', None), 'Error should not fail other news of the chunk')
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'fake summarizer is inherited by forked workers only')
+    def test_out_of_order(self):
+        pool = self.__pool(2, 1)
+        keys = [key for key, _, _ in pool.map_unordered([('slow', 'sleep 1'), ('fast', 'news')])]
+        self.assertEqual(keys, ['fast', 'slow'], 'Results should be yielded as soon as their chunk is done')
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'fake summarizer is inherited by forked workers only')
+    def test_crash(self):
+        if path.exists(CRASH_MARKER):
+            os.remove(CRASH_MARKER)
+        pool = self.__pool(2, 1)
+        crashes = WORKERS_RECYCLED.value(reason='crash')
+        self.assertEqual(pool.submit([('a', 'crash')]).result(timeout=60), [('a', 'CRASH', None)], 'Chunk should be summarized by new workers')
+        self.assertGreater(WORKERS_RECYCLED.value(reason='crash'), crashes, 'Broken workers should be replaced')
+        [(key, content, error)] = pool.submit([('b', 'always crash')]).result(timeout=60)
+        self.assertIn('BrokenProcessPool', error, 'Chunk that always kill its worker should fail')
+        self.assertEqual(pool.submit([('c', 'news')]).result(timeout=60), [('c', 'NEWS', None)], 'Pool should work after crashes')
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'fake summarizer is inherited by forked workers only')
+    def test_recycle_generation(self):
+        pool = SummarizePool(2, chunk_size=1, recycle_after=2, recycle_memory=1).start()
+        self.addCleanup(pool.close)
+        old = [pool.submit([('a', 'sleep .5')]), pool.submit([('b', 'news')])]
+        slow = pool.submit([('c', 'sleep 3')]) # replace worker processes that have summarized 2 news
+        for future in old:
+            future.result(timeout=60)
+        recycled = WORKERS_RECYCLED.value(reason='memory')
+        self.assertEqual(pool.submit([('d', 'news')]).result(timeout=60), [('d', 'NEWS', None)])
+        self.assertEqual(WORKERS_RECYCLED.value(reason='memory'), recycled, 'Memory of old worker processes should not recycle new ones')
+        slow.result(timeout=60)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import threading
+import requests
+from newsScraper.scraper.Transport import Transport, CircuitBreaker, CircuitOpenError, RequestCancelled
+
+class FakeResponse:
+    def __init__(self, status_code:int, headers:dict = {}):
+        self.status_code = status_code
+        self.headers = headers
+
+class FakeSession:
+    ''' Session that return given status codes in order '''
+    def __init__(self, status_codes:list):
+        self.status_codes = list(status_codes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        status_code = self.status_codes.pop(0)
+        if status_code is None:
+            raise requests.ConnectionError('Connection refused')
+        return FakeResponse(status_code, {'Retry-After': '0'})
+
+class TestTransport(unittest.TestCase):
+    ''' Unit test for scraper Transport class '''
+    def test_retry(self):
+        session = FakeSession([503, None, 429, 200])
+        transport = Transport(rate=1000, backoff_base=0, session=session)
+        response = transport.get('https://graph.sanook.com')
+        self.assertEqual(response.status_code, 200, 'Unexpected status code after retries')
+        self.assertEqual(session.calls, 4, 'Unexpected number of attempts')
+
+    def test_give_up(self):
+        session = FakeSession([500, 500, 500])
+        transport = Transport(rate=1000, max_retries=2, backoff_base=0, failure_threshold=10, session=session)
+        response = transport.get('https://graph.sanook.com')
+        self.assertEqual(response.status_code, 500, 'Unexpected status code after all retries')
+        self.assertEqual(session.calls, 3, 'Unexpected number of attempts')
+
+    def test_circuit_open(self):
+        session = FakeSession([500, 500])
+        transport = Transport(rate=1000, max_retries=1, backoff_base=0, failure_threshold=2, session=session)
+        transport.get('https://graph.sanook.com')
+        self.assertEqual(transport.breaker.state, 'open', 'Circuit should be opened')
+        with self.assertRaises(CircuitOpenError):
+            transport.get('https://graph.sanook.com')
+        self.assertEqual(session.calls, 2, 'Request should not be sent while circuit is open')
+
+    def test_cancel(self):
+        cancelled = threading.Event()
+        session = FakeSession([503, 200])
+        session.request = lambda method, url, _request=session.request, **kwargs: (cancelled.set(), _request(method, url, **kwargs))[1]
+        transport = Transport(rate=1000, backoff_base=0, session=session)
+        with transport.cancel_on(cancelled):
+            with self.assertRaises(RequestCancelled):
+                transport.get('https://graph.sanook.com')
+        self.assertEqual(session.calls, 1, 'Request should not be retried after the call is cancelled')
+        self.assertEqual(transport.get('https://graph.sanook.com').status_code, 200, 'Other calls should not be cancelled')
+
+class TestCircuitBreaker(unittest.TestCase):
+    ''' Unit test for CircuitBreaker class '''
+    def test_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow(), 'Trial call should be allowed')
+        self.assertFalse(breaker.allow(), 'Only one trial call should be allowed')
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed', 'Circuit should be closed after success trial')
+
+if __name__ == "__main__":
+    unittest.main()